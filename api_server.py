@@ -0,0 +1,291 @@
+"""
+Headless HTTP API for the Activity Advisor
+Serves recommendations and extractions to other systems (such as the LMS
+integration) without Streamlit, using only the standard library. Worker
+processes share one listening socket, so a single instance uses every core
+and several instances can sit behind a load balancer.
+
+Endpoints (JSON bodies, JSON replies):
+    POST /recommend  StudentState fields      -> ranked recommendations
+    POST /parse      {"message": "..."}       -> extraction result
+    POST /advise     {"message": "..."}       -> extraction, then recommendations
+    GET  /health
+
+Usage:
+    python api_server.py serve [--host H] [--port P] [--workers N]
+"""
+import argparse
+import json
+import os
+import signal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from expert_system import warm_up
+from heuristic_extractor import DEFAULTS
+from recommendation_cache import cached_recommendations
+from state_schema import DEADLINE_OPTIONS, ENERGY_LEVELS, STRESS_LEVELS, TASK_COMPLEXITIES
+
+API_HOST = os.environ.get("ADVISOR_API_HOST", "127.0.0.1")
+API_PORT = int(os.environ.get("ADVISOR_API_PORT", 8000))
+API_WORKERS = int(os.environ.get("ADVISOR_API_WORKERS", os.cpu_count() or 1))
+
+# Largest request body accepted, in bytes
+MAX_BODY = 64 * 1024
+
+# Labels accepted for the categorical fields
+LABELS = {
+    'energy_level': ENERGY_LEVELS,
+    'stress_level': STRESS_LEVELS,
+    'deadline_urgency': DEADLINE_OPTIONS,
+    'task_complexity': TASK_COMPLEXITIES,
+}
+
+
+class RequestError(Exception):
+    """A request the API rejects, with the HTTP status to reply with"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def student_state(body):
+    """
+    StudentState from a /recommend body.
+
+    Fields that are left out take the same defaults the extraction prompt
+    uses; unknown fields, values of the wrong type and labels the UI does
+    not offer are rejected.
+    """
+    if not isinstance(body, dict):
+        raise RequestError(400, f"expected a JSON object, got {type(body).__name__}")
+    unknown = sorted(set(body) - set(DEFAULTS))
+    if unknown:
+        raise RequestError(400, f"unknown field(s): {', '.join(unknown)}")
+
+    state = dict(DEFAULTS)
+    for field, value in body.items():
+        default = DEFAULTS[field]
+        if isinstance(default, bool):
+            valid = isinstance(value, bool)
+        elif isinstance(default, int):
+            valid = isinstance(value, (int, float)) and not isinstance(value, bool)
+        else:
+            valid = isinstance(value, str)
+        if not valid or (field in LABELS and value not in LABELS[field]):
+            raise RequestError(400, f"invalid {field}: {value!r}")
+        state[field] = value
+    return state
+
+
+def _message(body):
+    if not isinstance(body, dict) or not isinstance(body.get("message"), str):
+        raise RequestError(400, 'expected {"message": "..."}')
+    if not body["message"].strip():
+        raise RequestError(400, "message is empty")
+    return body["message"]
+
+
+def _parse(message):
+    # The Groq client and its dependencies are only loaded by workers that parse
+    from llm_parser import parse_natural_language
+
+    result = parse_natural_language(message)
+    if not result['success']:
+        raise RequestError(502, f"extraction failed: {result['error']}")
+    return result
+
+
+class AdvisorRequestHandler(BaseHTTPRequestHandler):
+    """
+    Routes requests to the engine and parser modules.
+
+    Successful replies are streamed with chunked transfer encoding once the
+    request has been validated and evaluated: recommendations are written
+    one at a time instead of being joined into one document first.
+    """
+
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    server_version = "ActivityAdvisorAPI/1.0"
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send_json(200, {"status": "ok", "pid": os.getpid()})
+        else:
+            self._send_json(404, {"error": f"no route for GET {self.path}"})
+
+    def do_POST(self):
+        route = {
+            "/recommend": self._recommend,
+            "/parse": self._parse,
+            "/advise": self._advise,
+        }.get(self.path)
+        try:
+            body = self._read_json()
+            if route is None:
+                raise RequestError(404, f"no route for POST {self.path}")
+            route(body)
+        except RequestError as e:
+            self._send_json(e.status, {"error": str(e)})
+        except Exception as e:
+            self.log_error("%s failed: %r", self.path, e)
+            self._send_json(500, {"error": "internal error"})
+
+    def _recommend(self, body):
+        recommendations = cached_recommendations(student_state(body))
+        self._start_stream()
+        self._send_chunk("{")
+        self._stream_recommendations(recommendations)
+        self._send_chunk("}")
+        self._end_stream()
+
+    def _parse(self, body):
+        self._send_json(200, _parse(_message(body)))
+
+    def _advise(self, body):
+        result = _parse(_message(body))
+        # Validated before the 200 goes out, so a bad extraction is an error
+        # reply rather than a truncated stream. The client did not send these
+        # values, so a state the LLM got wrong is an upstream fault (502)
+        try:
+            state = student_state(result['data'])
+        except RequestError as e:
+            raise RequestError(502, f"extraction returned an invalid state: {e}")
+        recommendations = cached_recommendations(state)
+        self._start_stream()
+        self._send_chunk('{"extraction": ' + json.dumps(result) + ", ")
+        self._stream_recommendations(recommendations)
+        self._send_chunk("}")
+        self._end_stream()
+
+    def _stream_recommendations(self, recommendations):
+        self._send_chunk('"recommendations": [')
+        for position, recommendation in enumerate(recommendations):
+            self._send_chunk(("," if position else "") + json.dumps(recommendation))
+        self._send_chunk(f'], "count": {len(recommendations)}')
+
+    def _read_json(self):
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            # The body cannot be delimited, so neither can the next request
+            self.close_connection = True
+            raise RequestError(400, "invalid Content-Length")
+        if length > MAX_BODY:
+            self.close_connection = True
+            raise RequestError(413, f"request body over {MAX_BODY} bytes")
+        try:
+            return json.loads(self.rfile.read(length) or b"null")
+        except (UnicodeDecodeError, json.JSONDecodeError) as e:
+            raise RequestError(400, f"invalid JSON: {e}")
+
+    def _start_stream(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+    def _send_chunk(self, text):
+        data = text.encode()
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def _end_stream(self):
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+    def _send_json(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        if os.environ.get("ADVISOR_API_ACCESS_LOG") == "1":
+            super().log_message(format, *args)
+
+
+class AdvisorHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256
+
+
+def serve(host=API_HOST, port=API_PORT, workers=None, ready=None):
+    """
+    Serve the API until interrupted.
+
+    With more than one worker (API_WORKERS, one per core by default) the
+    listening socket is opened once and the process forks; each worker
+    accepts connections from the shared socket and answers them on its own
+    threads. Engines (or the decision table) are loaded before forking, so
+    every worker starts with them. Platforms without fork run a single worker. `ready` is called with
+    the bound (host, port) once connections are accepted.
+    """
+    workers = workers or API_WORKERS
+    warm_up()
+    server = AdvisorHTTPServer((host, port), AdvisorRequestHandler)
+    address = server.server_address[:2]
+
+    if workers <= 1 or not hasattr(os, "fork"):
+        if ready:
+            ready(address)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+        return
+
+    children = []
+    for _ in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            try:
+                server.serve_forever()
+            except KeyboardInterrupt:
+                pass
+            finally:
+                os._exit(0)
+        children.append(pid)
+
+    # Stop the workers along with the parent, whether interrupted or terminated
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    if ready:
+        ready(address)
+    try:
+        for pid in children:
+            os.waitpid(pid, 0)
+    except KeyboardInterrupt:
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+    finally:
+        server.server_close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless HTTP API for the Activity Advisor")
+    sub = parser.add_subparsers(dest="command", required=True)
+    serve_parser = sub.add_parser("serve", help="run the API server")
+    serve_parser.add_argument("--host", default=API_HOST)
+    serve_parser.add_argument("--port", type=int, default=API_PORT)
+    serve_parser.add_argument("--workers", type=int, default=API_WORKERS)
+    args = parser.parse_args(argv)
+
+    serve(args.host, args.port, args.workers,
+          ready=lambda address: print(
+              f"Activity Advisor API on http://{address[0]}:{address[1]} "
+              f"({args.workers} worker(s))", flush=True))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,21 @@
 """
 Streamlit UI for Daily Activity Recommendation System
-"""
-import fix_experta
 
+Startup only loads Streamlit and the recommendation cache. Experta is loaded
+and the engines are built on a background thread once the page is drawn,
+and the LLM parser is loaded when the first message is sent.
+
+The admin panels (rule metrics, profiling) are shown to everyone when
+ADVISOR_ADMIN=1 is set, or with ?admin=<token> when ADVISOR_ADMIN_TOKEN is.
+"""
+import csv
+import hmac
+import io
 import os
+import threading
 import streamlit as st
-import pandas as pd
 from datetime import datetime
-from expert_system import run_expert_system
+from recommendation_cache import cached_recommendations, canonical_key
 
 # Page configuration
 st.set_page_config(
@@ -16,6 +24,505 @@ st.set_page_config(
     layout="wide"
 )
 
+
+@st.cache_resource(show_spinner=False)
+def warm_engines_in_background():
+    """
+    Build the shared engines (or load the decision table in table mode) once
+    per process, off the page's critical path
+    """
+    def warm():
+        from expert_system import warm_up
+        warm_up()
+
+    thread = threading.Thread(target=warm, name="engine-warmup", daemon=True)
+    thread.start()
+    return thread
+
+
+def recommendations_csv(recommendations):
+    """CSV text of the recommendation dicts, one column per key"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=list(recommendations[0]), lineterminator="\n")
+    writer.writeheader()
+    writer.writerows(recommendations)
+    return buffer.getvalue()
+
+
+# ==================== RESULTS ====================
+# Reruns redraw results kept in st.session_state; the engine and the
+# formatting below run only when a submitted input differs from the last one
+
+def input_snapshot(user_inputs):
+    """
+    The recommendation cache's key for an input dict, so inputs the cache
+    treats as the same state (e.g. label case or spacing) do not count as a change
+    """
+    return canonical_key(user_inputs)
+
+
+def recommendation_cards_html(recommendations):
+    """HTML of all recommendation cards, drawn with one st.markdown call"""
+    cards = []
+    for idx, rec in enumerate(recommendations, 1):
+        priority_class = f"priority-{rec['priority']}"
+        confidence_bar = "🟢" * int(rec['confidence'] / 20)
+        cards.append(f"""
+        <div class="recommendation-box {priority_class}">
+            <h3>#{idx}. {rec['activity']}</h3>
+            <p><strong>What to do:</strong> {rec['description']}</p>
+            <p><strong>Duration:</strong> {rec['duration']}</p>
+            <p><strong>Why:</strong> {rec['reason']}</p>
+            <p><strong>Confidence:</strong> {confidence_bar} {rec['confidence']}%</p>
+            <p style="font-size: 0.8rem; color: #888;">Rule: {rec['rule_fired']}</p>
+        </div>
+        """)
+    return "".join(cards)
+
+
+def recommendations_view(recommendations, info_analysis):
+    """Figures and HTML shown with a non-empty recommendation list"""
+    total_fields = len(info_analysis['provided']) + len(info_analysis['assumed'])
+    return {
+        'info_analysis': info_analysis,
+        'completeness': len(info_analysis['provided']) / total_fields * 100,
+        'rec_count': len(recommendations),
+        'avg_conf': sum(r['confidence'] for r in recommendations) / len(recommendations),
+        'rules': len(set(r['rule_fired'] for r in recommendations)),
+        'cards_html': recommendation_cards_html(recommendations),
+    }
+
+
+def structured_info_analysis(user_inputs):
+    """Fields the student answered, and optional fields left at their defaults"""
+    info_analysis = {
+        'provided': [],
+        'assumed': []
+    }
+
+    # Core information (always provided)
+    info_analysis['provided'].extend([
+        f"Sleep hours: {user_inputs['sleep_hours']}h",
+        f"Energy level: {user_inputs['energy_level']}",
+        f"Stress level: {user_inputs['stress_level']}",
+        f"Study hours today: {user_inputs['study_hours_today']}h",
+        f"Deadline urgency: {user_inputs['deadline_urgency']}",
+        f"Break taken: {'Yes' if user_inputs['break_taken'] else 'No'}"
+    ])
+
+    # Check optional fields
+    if user_inputs['passive_learning_hours'] != 1.0:
+        info_analysis['provided'].append(f"Passive learning: {user_inputs['passive_learning_hours']}h")
+    else:
+        info_analysis['assumed'].append("Passive learning: 1h (default - moderate amount)")
+
+    if user_inputs['task_complexity'] != "Medium":
+        info_analysis['provided'].append(f"Task complexity: {user_inputs['task_complexity']}")
+    else:
+        info_analysis['assumed'].append("Task complexity: Medium (default)")
+
+    if user_inputs['sedentary_hours'] != 4.0:
+        info_analysis['provided'].append(f"Sedentary hours: {user_inputs['sedentary_hours']}h")
+    else:
+        info_analysis['assumed'].append("Sedentary hours: 4h (default - typical)")
+
+    if user_inputs['social_isolation_days'] != 1:
+        info_analysis['provided'].append(f"Social isolation: {user_inputs['social_isolation_days']} days")
+    else:
+        info_analysis['assumed'].append("Social isolation: 1 day (default - recent contact)")
+
+    if user_inputs['cramming']:
+        info_analysis['provided'].append("Cramming: Yes")
+    else:
+        info_analysis['assumed'].append("Cramming: No (default - normal pace)")
+
+    return info_analysis
+
+
+def structured_result(user_inputs):
+    """Everything the structured tab shows for one input snapshot"""
+    recommendations = cached_recommendations(user_inputs)
+    result = {'snapshot': input_snapshot(user_inputs), 'recommendations': recommendations}
+    if recommendations:
+        result.update(recommendations_view(recommendations, structured_info_analysis(user_inputs)))
+        result['csv'] = recommendations_csv(recommendations)
+        result['csv_name'] = f"recommendations_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+    return result
+
+
+def show_structured_result(result):
+    recommendations = result['recommendations']
+
+    # Display results
+    st.markdown("---")
+    st.markdown("## Your Personalized Recommendations")
+
+    if not recommendations:
+        st.warning("No specific recommendations matched your current state. You seem to be in a balanced condition!")
+        st.info("General advice: Continue with your planned activities and maintain your current routine.")
+        return
+
+    rec_count = result['rec_count']
+    info_analysis = result['info_analysis']
+    # Top recommendation highlighted
+    st.success(f"**Top Recommendation:** {recommendations[0]['activity']}")
+
+    # Show alternative solutions feature
+    if rec_count > 1:
+        st.info(f"**Alternative Solutions:** System generated {rec_count} ranked recommendations based on your situation.")
+
+    # Display information completeness - COLLAPSED BY DEFAULT
+    assumptions_count = len(info_analysis['assumed'])
+
+    if assumptions_count > 0:
+        # Show expander with count - user can click to expand
+        with st.expander(f"View Information Completeness Analysis ({assumptions_count} assumptions made)", expanded=False):
+
+            col1, col2 = st.columns(2)
+
+            with col1:
+                st.markdown("### Information Provided")
+                st.markdown("\n".join(f"- {item}" for item in info_analysis['provided']))
+
+            with col2:
+                st.markdown("### Assumptions Made")
+                st.markdown("\n".join(f"- {item}" for item in info_analysis['assumed']))
+
+            st.markdown("---")
+
+            st.metric("Information Completeness", f"{result['completeness']:.0f}%")
+
+            st.markdown(f"""
+            **ES Feature: Incomplete Information Handling**
+
+            The expert system successfully processed your request with **{assumptions_count} missing optional fields** by:
+
+            1. ✅ **Making conservative assumptions** based on typical student patterns
+            2. ✅ **Reducing confidence levels** by ~10-15% for rules using assumed data
+            3. ✅ **Providing useful recommendations** despite incomplete information
+            """)
+    else:
+        # If all fields provided, show a small success badge
+        with st.expander("✅ View Information Completeness Analysis (100% complete)", expanded=False):
+            st.success("""
+            **100% Information Completeness!**
+
+            All optional fields were provided. The expert system has maximum confidence in its recommendations.
+
+            **Information Provided:**
+            """)
+            st.markdown("\n".join(f"- {item}" for item in info_analysis['provided']))
+
+    # ES Features in action - metrics
+    metric_cols = st.columns(3)
+    with metric_cols[0]:
+        st.metric("Alternatives", rec_count, help="Different activity options provided")
+    with metric_cols[1]:
+        st.metric("Avg Confidence", f"{result['avg_conf']:.0f}%", help="Average confidence level")
+    with metric_cols[2]:
+        st.metric("Rules Fired", result['rules'], help="Number of expert rules applied")
+
+    st.markdown("---")
+
+    # Display all recommendations
+    st.markdown(result['cards_html'], unsafe_allow_html=True)
+
+    # Show rules fired (Explainability)
+    with st.expander("See Which Rules Were Fired (Explainability)"):
+        st.write("**Rules that matched your situation:**")
+        st.markdown("\n".join(f"- {rec['rule_fired']}" for rec in recommendations))
+
+        st.info("**Explainability**: Each recommendation is based on specific rules derived from research. "
+            "You can trace exactly why each suggestion was made.")
+
+    # Download recommendations
+    st.download_button(
+        label="Download Recommendations as CSV",
+        data=result['csv'],
+        file_name=result['csv_name'],
+        mime="text/csv"
+    )
+
+
+def nl_info_analysis(extracted_data):
+    """Fields the AI extracted, and fields that fell back to their defaults"""
+    info_analysis = {
+        'provided': [],
+        'assumed': []
+    }
+
+    # Check what was extracted vs defaults
+    if extracted_data.get('sleep_hours', 7) != 7:
+        info_analysis['provided'].append(f"Sleep hours: {extracted_data['sleep_hours']}h")
+    else:
+        info_analysis['assumed'].append("Sleep hours: 7h (default)")
+
+    if extracted_data.get('energy_level', 'Moderate') != 'Moderate':
+        info_analysis['provided'].append(f"Energy level: {extracted_data['energy_level']}")
+    else:
+        info_analysis['assumed'].append("Energy level: Moderate (default)")
+
+    if extracted_data.get('stress_level', 'Moderate') != 'Moderate':
+        info_analysis['provided'].append(f"Stress level: {extracted_data['stress_level']}")
+    else:
+        info_analysis['assumed'].append("Stress level: Moderate (default)")
+
+    if extracted_data.get('study_hours_today', 2) != 2:
+        info_analysis['provided'].append(f"Study hours: {extracted_data['study_hours_today']}h")
+    else:
+        info_analysis['assumed'].append("Study hours: 2h (default)")
+
+    if extracted_data.get('deadline_urgency', 'None') != 'None':
+        info_analysis['provided'].append(f"Deadline: {extracted_data['deadline_urgency']}")
+    else:
+        info_analysis['assumed'].append("Deadline: None (default)")
+
+    if extracted_data.get('break_taken', False):
+        info_analysis['provided'].append("Break taken: Yes")
+    else:
+        info_analysis['assumed'].append("Break taken: No (default)")
+
+    if extracted_data.get('passive_learning_hours', 1) != 1:
+        info_analysis['provided'].append(f"Passive learning: {extracted_data['passive_learning_hours']}h")
+    else:
+        info_analysis['assumed'].append("Passive learning: 1h (default)")
+
+    if extracted_data.get('task_complexity', 'Medium') != 'Medium':
+        info_analysis['provided'].append(f"Task complexity: {extracted_data['task_complexity']}")
+    else:
+        info_analysis['assumed'].append("Task complexity: Medium (default)")
+
+    if extracted_data.get('sedentary_hours', 4) != 4:
+        info_analysis['provided'].append(f"Sedentary hours: {extracted_data['sedentary_hours']}h")
+    else:
+        info_analysis['assumed'].append("Sedentary hours: 4h (default)")
+
+    if extracted_data.get('social_isolation_days', 1) != 1:
+        info_analysis['provided'].append(f"Social isolation: {extracted_data['social_isolation_days']} days")
+    else:
+        info_analysis['assumed'].append("Social isolation: 1 day (default)")
+
+    if extracted_data.get('cramming', False):
+        info_analysis['provided'].append("Cramming: Yes")
+    else:
+        info_analysis['assumed'].append("Cramming: No (default)")
+
+    return info_analysis
+
+
+def nl_result(user_input, result, recommendations):
+    """Everything the natural language tab shows for one submitted message"""
+    from llm_parser import get_extraction_explanation
+
+    stored = {'message': user_input.strip(), 'user_input': user_input, 'result': result}
+    if result['success']:
+        stored['explanation'] = get_extraction_explanation(user_input, result['data'])
+        stored['recommendations'] = recommendations
+        if recommendations:
+            stored.update(recommendations_view(recommendations, nl_info_analysis(result['data'])))
+    return stored
+
+
+def show_nl_result(stored):
+    result = stored['result']
+    if not result['success']:
+        st.error(f"Error processing input: {result['error']}")
+        st.info("Please check your API key is set correctly in .env file")
+        return
+
+    extracted_data = result['data']
+    recommendations = stored['recommendations']
+
+    # Show what was extracted
+    st.success("✅ Successfully extracted information from your input!")
+    if 'delta' in result:
+        changed = ", ".join(result['delta']) or "nothing"
+        st.info(f"Updated from your previous description: {changed}")
+
+    with st.expander("View What AI Extracted from Your Input", expanded=True):
+        col1, col2 = st.columns(2)
+
+        with col1:
+            st.markdown("**Your Input:**")
+            st.info(stored['user_input'])
+
+        with col2:
+            st.markdown("**Extracted Information:**")
+            st.markdown("\n".join(f"- {item}" for item in stored['explanation']))
+
+        # Show full structured data (expanders cannot be nested, so a collapsed JSON view)
+        st.markdown("**Full Structured Data (for Expert System):**")
+        st.json(extracted_data, expanded=False)
+
+    st.markdown("---")
+    st.markdown("### Expert System Processing...")
+
+    # Display results (SAME AS TAB 1)
+    st.markdown("## Your Personalized Recommendations")
+
+    if not recommendations:
+        st.info("No specific recommendations matched. You seem to be in good balance!")
+        return
+
+    rec_count = stored['rec_count']
+    info_analysis = stored['info_analysis']
+    st.success(f"**Top Recommendation:** {recommendations[0]['activity']}")
+
+    # Display information completeness
+    assumptions_count = len(info_analysis['assumed'])
+
+    if assumptions_count > 0:
+        with st.expander(f"View Information Completeness Analysis ({assumptions_count} assumptions made)", expanded=False):
+            col1, col2 = st.columns(2)
+
+            with col1:
+                st.markdown("### Information Extracted")
+                st.markdown("\n".join(f"- {item}" for item in info_analysis['provided']))
+
+            with col2:
+                st.markdown("### Assumptions Made")
+                st.markdown("\n".join(f"- {item}" for item in info_analysis['assumed']))
+
+            st.markdown("---")
+
+            st.metric("Information Completeness", f"{stored['completeness']:.0f}%")
+
+            st.markdown(f"""
+            **ES Feature: Incomplete Information Handling**
+
+            The expert system processed your natural language with **{assumptions_count} missing/default fields** by:
+
+            1. ✅ **AI extraction** - LLM extracted what it could
+            2. ✅ **Conservative assumptions** - Used defaults for missing info
+            3. ✅ **Confidence adjustment** - Reduced confidence appropriately
+            4. ✅ **Useful recommendations** - Still provides guidance
+
+            *Tip: Mentioning more details increases accuracy!*
+            """)
+    else:
+        with st.expander("View Information Completeness Analysis (100% complete)", expanded=False):
+            st.success("""
+            **100% Information Completeness!**
+
+            The AI extracted all necessary fields!
+
+            **Information Extracted:**
+            """)
+            st.markdown("\n".join(f"- {item}" for item in info_analysis['provided']))
+
+    metric_cols = st.columns(3)
+    with metric_cols[0]:
+        st.metric("Alternatives", rec_count, help="Different activity options")
+    with metric_cols[1]:
+        st.metric("Avg Confidence", f"{stored['avg_conf']:.0f}%", help="Average confidence level")
+    with metric_cols[2]:
+        st.metric("Rules Fired", stored['rules'], help="Expert rules applied")
+
+    st.markdown("---")
+
+    # Display recommendations
+    st.markdown(stored['cards_html'], unsafe_allow_html=True)
+
+    # Explainability section
+    with st.expander("See Which Rules Were Fired (Explainability)"):
+        st.write("**Rules that matched your situation:**")
+        st.markdown("\n".join(f"- {rec['rule_fired']}" for rec in recommendations))
+
+        st.info("**Full Explainability Maintained**: Even with AI input parsing, "
+               "all recommendations trace back to explicit expert system rules. "
+               "No black-box decisions!")
+
+
+def admin_mode():
+    """
+    Admin panels are shown when ADVISOR_ADMIN=1, or with ?admin=<token> in
+    the URL when ADVISOR_ADMIN_TOKEN is set. They switch process-wide metrics
+    and write profiles to disk, so the query parameter alone grants nothing.
+    """
+    if os.environ.get("ADVISOR_ADMIN", "0") == "1":
+        return True
+    token = os.environ.get("ADVISOR_ADMIN_TOKEN")
+    if not token:
+        return False
+    given = st.experimental_get_query_params().get("admin", [""])[0]
+    return hmac.compare_digest(given.encode(), token.encode())
+
+
+def rule_metrics_panel():
+    """Sidebar panel with per-rule firing counts and timings of the experta engine"""
+    import json
+    import rule_metrics
+
+    st.markdown("---")
+    st.markdown("### Admin: Rule Metrics")
+    enabled = st.checkbox("Record per-rule metrics", value=rule_metrics.ENABLED,
+                          help="Times every experta evaluation; off costs nothing")
+    if enabled != rule_metrics.ENABLED:
+        rule_metrics.enable() if enabled else rule_metrics.disable()
+
+    snapshot = rule_metrics.metrics.snapshot()
+    st.caption(f"{snapshot['requests']} instrumented evaluation(s). Recommendations served "
+               f"from the cache or by the compiled/table engines are not counted.")
+    if not snapshot['requests']:
+        return
+
+    st.dataframe([
+        {'phase': phase, 'mean ms': stats['mean_seconds'] * 1000, 'total ms': stats['seconds'] * 1000}
+        for phase, stats in snapshot['phases'].items()
+    ], hide_index=True, use_container_width=True)
+    st.dataframe([
+        {'rule': rule_id, 'fired': stats['activations'], 'rate': stats['firing_rate'],
+         'RHS mean us': stats['rhs_mean_seconds'] * 1e6, 'RHS max us': stats['rhs_max_seconds'] * 1e6,
+         'partial matches/req': stats['partial_matches_per_request']}
+        for rule_id, stats in snapshot['rules'].items()
+    ], hide_index=True, use_container_width=True)
+
+    st.download_button("Download JSON", json.dumps(snapshot, indent=2),
+                       file_name="rule_metrics.json", mime="application/json")
+    st.download_button("Download Prometheus text", rule_metrics.metrics.prometheus(),
+                       file_name="rule_metrics.prom", mime="text/plain")
+    if st.button("Reset metrics"):
+        rule_metrics.metrics.clear()
+        st.rerun()
+
+
+def profiling_panel():
+    """Sidebar panel to profile one rerun or engine call and browse the results"""
+    import profiling
+
+    st.markdown("---")
+    st.markdown("### Admin: Profiling")
+    if st.button("Profile next interaction"):
+        st.session_state.profile_next_rerun = True
+    if st.session_state.get("profile_next_rerun"):
+        st.caption("The rerun triggered by your next interaction will be profiled")
+    if st.button("Profile next engine call"):
+        profiling.arm_engine(1)
+    if profiling.engine_calls_armed:
+        st.caption("Waiting for a run_expert_system call (cached recommendations skip the engine)")
+
+    profiles = profiling.recent_profiles()
+    if not profiles:
+        st.caption(f"No profiles in {profiling.PROFILE_DIR}/ yet")
+        return
+    names = [profile['name'] for profile in profiles]
+    profile = profiles[names.index(st.selectbox("Recent profiles", names))]
+    st.dataframe(profiling.top_functions(profile['pstats'], 10),
+                 hide_index=True, use_container_width=True)
+    with open(profile['pstats'], "rb") as f:
+        st.download_button("Download .pstats", f.read(), file_name=f"{profile['name']}.pstats")
+    if profile['collapsed']:
+        with open(profile['collapsed']) as f:
+            st.download_button("Download collapsed stacks", f.read(),
+                               file_name=f"{profile['name']}.collapsed", mime="text/plain")
+
+# An admin can profile this whole rerun (?profile=1, or the panel's button)
+rerun_profiler = None
+if admin_mode() and (st.session_state.pop("profile_next_rerun", False)
+                     or st.experimental_get_query_params().get("profile", ["0"])[0] == "1"):
+    import profiling
+    rerun_profiler = profiling.Profiler("rerun").start()
+
 # Custom CSS
 st.markdown("""
     <style>
@@ -84,107 +591,111 @@ with tab1:
     # Get current hour
     current_hour = datetime.now().hour
 
-    # Input questions
-    col1, col2 = st.columns(2)
+    # Answers are sent together when the form is submitted, so moving a
+    # slider does not rerun the script
+    with st.form("structured_input"):
+        # Input questions
+        col1, col2 = st.columns(2)
 
-    with col1:
-        st.subheader("Sleep & Energy")
-    
-        sleep_hours = st.slider(
-            "How many hours did you sleep last night?",
-            min_value=0.0,
-            max_value=12.0,
-            value=7.0,
-            step=0.5,
-            help="Include any naps from yesterday"
-        )
-    
-        energy_level = st.select_slider(
-            "What is your current energy level?",
-            options=["Very Low", "Low", "Moderate", "High"],
-            value="Moderate"
-        )
-        
-        stress_level = st.select_slider(
-            "How stressed do you feel?",
-            options=["Low", "Moderate", "High", "Very High"],
-            value="Moderate"
-        )
-
-    with col2:
-        st.subheader("Study & Schedule")
-        
-        study_hours_today = st.slider(
-            "How many hours have you studied today?",
-            min_value=0.0,
-            max_value=12.0,
-            value=2.0,
-            step=0.5
-        )
+        with col1:
+            st.subheader("Sleep & Energy")
         
-        deadline_urgency = st.selectbox(
-            "Do you have any urgent deadlines?",
-            ["None", "This week", "Within 48 hours", "Urgent (within 24h)"],
-            help="Select your most urgent deadline"
-        )
-        
-        break_taken = st.checkbox(
-            "Have you taken a substantial break today? (15+ minutes)",
-            value=False
-        )
-
-    # Additional inputs in expandable section
-    with st.expander("Additional Information (Optional)"):
-        col3, col4 = st.columns(2)
+            sleep_hours = st.slider(
+                "How many hours did you sleep last night?",
+                min_value=0.0,
+                max_value=12.0,
+                value=7.0,
+                step=0.5,
+                help="Include any naps from yesterday"
+            )
         
-        with col3:
-            task_complexity = st.selectbox(
-                "Complexity of your current/next task",
-                ["Low", "Medium", "High"],
-                index=1
+            energy_level = st.select_slider(
+                "What is your current energy level?",
+                options=["Very Low", "Low", "Moderate", "High"],
+                value="Moderate"
             )
             
-            passive_learning_hours = st.slider(
-                "Hours of passive learning today (reading/watching)",
-                min_value=0.0,
-                max_value=8.0,
-                value=1.0,
-                step=0.5
+            stress_level = st.select_slider(
+                "How stressed do you feel?",
+                options=["Low", "Moderate", "High", "Very High"],
+                value="Moderate"
             )
+
+        with col2:
+            st.subheader("Study & Schedule")
             
-            social_isolation_days = st.slider(
-                "Days since last social interaction",
-                min_value=0,
-                max_value=7,
-                value=1
-            )
-        
-        with col4:
-            sedentary_hours = st.slider(
-                "Hours sitting/sedentary today",
+            study_hours_today = st.slider(
+                "How many hours have you studied today?",
                 min_value=0.0,
                 max_value=12.0,
-                value=4.0,
+                value=2.0,
                 step=0.5
             )
             
-            cramming = st.checkbox(
-                "Are you cramming (>6h on one subject today)?",
-                value=False
+            deadline_urgency = st.selectbox(
+                "Do you have any urgent deadlines?",
+                ["None", "This week", "Within 48 hours", "Urgent (within 24h)"],
+                help="Select your most urgent deadline"
             )
             
-            current_time = st.slider(
-                "Current time (hour)",
-                min_value=0,
-                max_value=23,
-                value=current_hour,
-                help="Automatically set to current time"
+            break_taken = st.checkbox(
+                "Have you taken a substantial break today? (15+ minutes)",
+                value=False
             )
 
-    # Run button
-    st.markdown("---")
-    if st.button("Get Personalized Recommendations", type="primary", use_container_width=True):
-        
+        # Additional inputs in expandable section
+        with st.expander("Additional Information (Optional)"):
+            col3, col4 = st.columns(2)
+            
+            with col3:
+                task_complexity = st.selectbox(
+                    "Complexity of your current/next task",
+                    ["Low", "Medium", "High"],
+                    index=1
+                )
+                
+                passive_learning_hours = st.slider(
+                    "Hours of passive learning today (reading/watching)",
+                    min_value=0.0,
+                    max_value=8.0,
+                    value=1.0,
+                    step=0.5
+                )
+                
+                social_isolation_days = st.slider(
+                    "Days since last social interaction",
+                    min_value=0,
+                    max_value=7,
+                    value=1
+                )
+            
+            with col4:
+                sedentary_hours = st.slider(
+                    "Hours sitting/sedentary today",
+                    min_value=0.0,
+                    max_value=12.0,
+                    value=4.0,
+                    step=0.5
+                )
+                
+                cramming = st.checkbox(
+                    "Are you cramming (>6h on one subject today)?",
+                    value=False
+                )
+                
+                current_time = st.slider(
+                    "Current time (hour)",
+                    min_value=0,
+                    max_value=23,
+                    value=current_hour,
+                    help="Automatically set to current time"
+                )
+
+        # Run button
+        st.markdown("---")
+        submitted = st.form_submit_button("Get Personalized Recommendations", type="primary", use_container_width=True)
+
+    if submitted:
         # Prepare inputs for expert system
         user_inputs = {
             'sleep_hours': sleep_hours,
@@ -201,176 +712,24 @@ with tab1:
             'current_time': current_time
         }
         
-        # Run expert system
-        with st.spinner("Analyzing your state and generating recommendations..."):
-            recommendations, engine = run_expert_system(user_inputs)
-        
-        # Display results
-        st.markdown("---")
-        st.markdown("## Your Personalized Recommendations")
-        
-        if recommendations:
-            # Show count of alternatives
-            rec_count = len(recommendations)
-            # Top recommendation highlighted
-            st.success(f"**Top Recommendation:** {recommendations[0]['activity']}")
-        
-            # Show alternative solutions feature
-            if rec_count > 1:
-                st.info(f"**Alternative Solutions:** System generated {rec_count} ranked recommendations based on your situation.")
-            
-            # Analyze information completeness
-            info_analysis = {
-                'provided': [],
-                'assumed': []
-            }
-        
-            # Core information (always provided)
-            info_analysis['provided'].extend([
-                f"Sleep hours: {sleep_hours}h",
-                f"Energy level: {energy_level}",
-                f"Stress level: {stress_level}",
-                f"Study hours today: {study_hours_today}h",
-                f"Deadline urgency: {deadline_urgency}",
-                f"Break taken: {'Yes' if break_taken else 'No'}"
-            ])
-        
-            # Check optional fields
-            if passive_learning_hours != 1.0:
-                info_analysis['provided'].append(f"Passive learning: {passive_learning_hours}h")
-            else:
-                info_analysis['assumed'].append("Passive learning: 1h (default - moderate amount)")
-        
-            if task_complexity != "Medium":
-                info_analysis['provided'].append(f"Task complexity: {task_complexity}")
-            else:
-                info_analysis['assumed'].append("Task complexity: Medium (default)")
-        
-            if sedentary_hours != 4.0:
-                info_analysis['provided'].append(f"Sedentary hours: {sedentary_hours}h")
-            else:
-                info_analysis['assumed'].append("Sedentary hours: 4h (default - typical)")
-        
-            if social_isolation_days != 1:
-                info_analysis['provided'].append(f"Social isolation: {social_isolation_days} days")
-            else:
-                info_analysis['assumed'].append("Social isolation: 1 day (default - recent contact)")
-        
-            if cramming:
-                info_analysis['provided'].append("Cramming: Yes")
-            else:
-                info_analysis['assumed'].append("Cramming: No (default - normal pace)")
-        
-            # Display information completeness - COLLAPSED BY DEFAULT
-            assumptions_count = len(info_analysis['assumed'])
-        
-            if assumptions_count > 0:
-                # Show expander with count - user can click to expand
-                with st.expander(f"View Information Completeness Analysis ({assumptions_count} assumptions made)", expanded=False):
-                
-                    col1, col2 = st.columns(2)
-                
-                    with col1:
-                        st.markdown("### Information Provided")
-                        for item in info_analysis['provided']:
-                            st.markdown(f"- {item}")
-                
-                    with col2:
-                        st.markdown("### Assumptions Made")
-                        for item in info_analysis['assumed']:
-                            st.markdown(f"- {item}")
-                
-                    st.markdown("---")
-                
-                    # Calculate completeness percentage
-                    total_fields = len(info_analysis['provided']) + len(info_analysis['assumed'])
-                    completeness = (len(info_analysis['provided']) / total_fields) * 100
-                
-                    st.metric("Information Completeness", f"{completeness:.0f}%")
-                
-                    st.markdown(f"""
-                    **ES Feature: Incomplete Information Handling**
-                
-                    The expert system successfully processed your request with **{assumptions_count} missing optional fields** by:
-                
-                    1. ✅ **Making conservative assumptions** based on typical student patterns
-                    2. ✅ **Reducing confidence levels** by ~10-15% for rules using assumed data
-                    3. ✅ **Providing useful recommendations** despite incomplete information
-                    """)
-            else:
-                # If all fields provided, show a small success badge
-                with st.expander("✅ View Information Completeness Analysis (100% complete)", expanded=False):
-                    st.success("""
-                    **100% Information Completeness!**
-                
-                    All optional fields were provided. The expert system has maximum confidence in its recommendations.
-                
-                    **Information Provided:**
-                    """)
-                    for item in info_analysis['provided']:
-                        st.markdown(f"- {item}")
-
-            # ES Features in action - metrics
-            metric_cols = st.columns(3)
-            with metric_cols[0]:
-                st.metric("Alternatives", rec_count, help="Different activity options provided")
-            with metric_cols[1]:
-                avg_conf = sum(r['confidence'] for r in recommendations) / len(recommendations)
-                st.metric("Avg Confidence", f"{avg_conf:.0f}%", help="Average confidence level")
-            with metric_cols[2]:
-                rules = len(set(r['rule_fired'] for r in recommendations))
-                st.metric("Rules Fired", rules, help="Number of expert rules applied")
-        
-            st.markdown("---")
+        # Run expert system only if the answers changed since the last submit
+        stored = st.session_state.get('structured_result')
+        if stored is None or stored['snapshot'] != input_snapshot(user_inputs):
+            with st.spinner("Analyzing your state and generating recommendations..."):
+                st.session_state.structured_result = structured_result(user_inputs)
 
-            # Display all recommendations
-            for idx, rec in enumerate(recommendations, 1):
-                priority_class = f"priority-{rec['priority']}"
-                
-                confidence_bar = "🟢" * int(rec['confidence'] / 20)
-                
-                st.markdown(f"""
-                <div class="recommendation-box {priority_class}">
-                    <h3>#{idx}. {rec['activity']}</h3>
-                    <p><strong>What to do:</strong> {rec['description']}</p>
-                    <p><strong>Duration:</strong> {rec['duration']}</p>
-                    <p><strong>Why:</strong> {rec['reason']}</p>
-                    <p><strong>Confidence:</strong> {confidence_bar} {rec['confidence']}%</p>
-                    <p style="font-size: 0.8rem; color: #888;">Rule: {rec['rule_fired']}</p>
-                </div>
-                """, unsafe_allow_html=True)
-            
-            # Show rules fired (Explainability)
-            with st.expander("See Which Rules Were Fired (Explainability)"):
-                rules_fired = [rec['rule_fired'] for rec in recommendations]
-                st.write("**Rules that matched your situation:**")
-                for rule in rules_fired:
-                    st.write(f"- {rule}")
-                
-                st.info("**Explainability**: Each recommendation is based on specific rules derived from research. "
-                    "You can trace exactly why each suggestion was made.")
-            
-            # Download recommendations
-            df = pd.DataFrame(recommendations)
-            csv = df.to_csv(index=False)
-            st.download_button(
-                label="Download Recommendations as CSV",
-                data=csv,
-                file_name=f"recommendations_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-                mime="text/csv"
-            )
-            
-        else:
-            st.warning("No specific recommendations matched your current state. You seem to be in a balanced condition!")
-            st.info("General advice: Continue with your planned activities and maintain your current routine.")
+    # The last results stay on screen across reruns
+    if 'structured_result' in st.session_state:
+        show_structured_result(st.session_state.structured_result)
 
 # ============== TAB 2: NEW NATURAL LANGUAGE INTERFACE ==============
 with tab2:
     st.markdown("### Natural Language Interface (LLM-Enhanced)")
     st.markdown("Describe your situation in your own words, and the AI will extract structured information for the Expert System.")
     
-    # Import LLM parser
-    from llm_parser import parse_natural_language, get_extraction_explanation
+    # Extracted state of this session, so follow-ups only send what changed.
+    # Created with the first message, which is when the LLM parser is loaded.
+    conversation = st.session_state.get('conversation')
     
     # Example prompts
     with st.expander("Example Inputs"):
@@ -391,207 +750,59 @@ with tab2:
         key="nl_input"
     )
     
+    follow_up = False
+    if conversation is not None and conversation.state is not None:
+        col_follow, col_reset = st.columns([3, 1])
+        with col_follow:
+            follow_up = st.checkbox(
+                "Update my previous description (only send what changed)",
+                value=True,
+                key="nl_follow_up"
+            )
+        with col_reset:
+            if st.button("Start over", key="nl_reset"):
+                conversation.reset()
+                st.session_state.pop('nl_result', None)
+                follow_up = False
+    
     # Process button
+    render = request_span = None
     if st.button("Get AI-Powered Recommendations", type="primary", use_container_width=True, key="nl_submit"):
         
+        stored = st.session_state.get('nl_result')
         if not user_input.strip():
             st.warning("⚠️ Please describe your situation first!")
-        else:
+        elif (stored is None or not stored['result']['success']
+              or stored['message'] != user_input.strip()):
+            # Only a successful extraction is reused; a failed one (e.g. a
+            # network error) is retried when the same text is submitted again
+            import tracing
+
+            # One trace per submit: parse, engine and render spans share its request ID
+            request_span = tracing.start_span("nl_request", kind=tracing.SPAN_KIND_SERVER,
+                                              follow_up=follow_up, message_chars=len(user_input))
             with st.spinner("AI is analyzing your input and extracting information..."):
-                # Parse with LLM
-                result = parse_natural_language(user_input)
-                
-                if result['success']:
-                    extracted_data = result['data']
-                    
-                    # Show what was extracted
-                    st.success("✅ Successfully extracted information from your input!")
-                    
-                    with st.expander("View What AI Extracted from Your Input", expanded=True):
-                        col1, col2 = st.columns(2)
-                        
-                        with col1:
-                            st.markdown("**Your Input:**")
-                            st.info(user_input)
-                        
-                        with col2:
-                            st.markdown("**Extracted Information:**")
-                            explanation = get_extraction_explanation(user_input, extracted_data)
-                            for item in explanation:
-                                st.markdown(f"- {item}")
-                        
-                        # Show full structured data
-                        with st.expander("Full Structured Data (for Expert System)"):
-                            st.json(extracted_data)
-                    
-                    st.markdown("---")
-                    st.markdown("### Expert System Processing...")
-                    
-                    # Feed to expert system (same as widget interface!)
-                    with st.spinner("Expert System is applying rules and generating recommendations..."):
-                        recommendations, engine = run_expert_system(extracted_data)
-                    
-                    # Display results (SAME AS TAB 1)
-                    st.markdown("## Your Personalized Recommendations")
-                    
-                    if recommendations:
-                        rec_count = len(recommendations)
-                        st.success(f"**Top Recommendation:** {recommendations[0]['activity']}")
-
-                        # Analyze information completeness
-                        info_analysis = {
-                            'provided': [],
-                            'assumed': []
-                        }
-                        
-                        # Check what was extracted vs defaults
-                        if extracted_data.get('sleep_hours', 7) != 7:
-                            info_analysis['provided'].append(f"Sleep hours: {extracted_data['sleep_hours']}h")
-                        else:
-                            info_analysis['assumed'].append("Sleep hours: 7h (default)")
-                        
-                        if extracted_data.get('energy_level', 'Moderate') != 'Moderate':
-                            info_analysis['provided'].append(f"Energy level: {extracted_data['energy_level']}")
-                        else:
-                            info_analysis['assumed'].append("Energy level: Moderate (default)")
-                        
-                        if extracted_data.get('stress_level', 'Moderate') != 'Moderate':
-                            info_analysis['provided'].append(f"Stress level: {extracted_data['stress_level']}")
-                        else:
-                            info_analysis['assumed'].append("Stress level: Moderate (default)")
-                        
-                        if extracted_data.get('study_hours_today', 2) != 2:
-                            info_analysis['provided'].append(f"Study hours: {extracted_data['study_hours_today']}h")
-                        else:
-                            info_analysis['assumed'].append("Study hours: 2h (default)")
-                        
-                        if extracted_data.get('deadline_urgency', 'None') != 'None':
-                            info_analysis['provided'].append(f"Deadline: {extracted_data['deadline_urgency']}")
-                        else:
-                            info_analysis['assumed'].append("Deadline: None (default)")
-                        
-                        if extracted_data.get('break_taken', False):
-                            info_analysis['provided'].append("Break taken: Yes")
-                        else:
-                            info_analysis['assumed'].append("Break taken: No (default)")
-                        
-                        if extracted_data.get('passive_learning_hours', 1) != 1:
-                            info_analysis['provided'].append(f"Passive learning: {extracted_data['passive_learning_hours']}h")
-                        else:
-                            info_analysis['assumed'].append("Passive learning: 1h (default)")
-                        
-                        if extracted_data.get('task_complexity', 'Medium') != 'Medium':
-                            info_analysis['provided'].append(f"Task complexity: {extracted_data['task_complexity']}")
-                        else:
-                            info_analysis['assumed'].append("Task complexity: Medium (default)")
-                        
-                        if extracted_data.get('sedentary_hours', 4) != 4:
-                            info_analysis['provided'].append(f"Sedentary hours: {extracted_data['sedentary_hours']}h")
-                        else:
-                            info_analysis['assumed'].append("Sedentary hours: 4h (default)")
-                        
-                        if extracted_data.get('social_isolation_days', 1) != 1:
-                            info_analysis['provided'].append(f"Social isolation: {extracted_data['social_isolation_days']} days")
-                        else:
-                            info_analysis['assumed'].append("Social isolation: 1 day (default)")
-                        
-                        if extracted_data.get('cramming', False):
-                            info_analysis['provided'].append("Cramming: Yes")
-                        else:
-                            info_analysis['assumed'].append("Cramming: No (default)")
-                        
-                        # Display information completeness
-                        assumptions_count = len(info_analysis['assumed'])
-                        
-                        if assumptions_count > 0:
-                            with st.expander(f"View Information Completeness Analysis ({assumptions_count} assumptions made)", expanded=False):
-                                col1, col2 = st.columns(2)
-                                
-                                with col1:
-                                    st.markdown("### Information Extracted")
-                                    for item in info_analysis['provided']:
-                                        st.markdown(f"- {item}")
-                                
-                                with col2:
-                                    st.markdown("### Assumptions Made")
-                                    for item in info_analysis['assumed']:
-                                        st.markdown(f"- {item}")
-                                
-                                st.markdown("---")
-                                
-                                total_fields = len(info_analysis['provided']) + len(info_analysis['assumed'])
-                                completeness = (len(info_analysis['provided']) / total_fields) * 100
-                                
-                                st.metric("Information Completeness", f"{completeness:.0f}%")
-                                
-                                st.markdown(f"""
-                                **ES Feature: Incomplete Information Handling**
-                                
-                                The expert system processed your natural language with **{assumptions_count} missing/default fields** by:
-                                
-                                1. ✅ **AI extraction** - LLM extracted what it could
-                                2. ✅ **Conservative assumptions** - Used defaults for missing info
-                                3. ✅ **Confidence adjustment** - Reduced confidence appropriately
-                                4. ✅ **Useful recommendations** - Still provides guidance
-                                
-                                *Tip: Mentioning more details increases accuracy!*
-                                """)
-                        else:
-                            with st.expander("View Information Completeness Analysis (100% complete)", expanded=False):
-                                st.success("""
-                                **100% Information Completeness!**
-                                
-                                The AI extracted all necessary fields!
-                                
-                                **Information Extracted:**
-                                """)
-                                for item in info_analysis['provided']:
-                                    st.markdown(f"- {item}")
-                        
-                        metric_cols = st.columns(3)
-                        with metric_cols[0]:
-                            st.metric("Alternatives", rec_count, help="Different activity options")
-                        with metric_cols[1]:
-                            avg_conf = sum(r['confidence'] for r in recommendations) / len(recommendations)
-                            st.metric("Avg Confidence", f"{avg_conf:.0f}%", help="Average confidence level")
-                        with metric_cols[2]:
-                            rules = len(set(r['rule_fired'] for r in recommendations))
-                            st.metric("Rules Fired", rules, help="Expert rules applied")
-                        
-                        st.markdown("---")
-
-                        # Display recommendations (reuse your existing code)
-                        for idx, rec in enumerate(recommendations, 1):
-                            priority_class = f"priority-{rec['priority']}"
-                            confidence_bar = "🟢" * int(rec['confidence'] / 20)
-                            
-                            st.markdown(f"""
-                            <div class="recommendation-box {priority_class}">
-                                <h3>#{idx}. {rec['activity']}</h3>
-                                <p><strong>What to do:</strong> {rec['description']}</p>
-                                <p><strong>Duration:</strong> {rec['duration']}</p>
-                                <p><strong>Why:</strong> {rec['reason']}</p>
-                                <p><strong>Confidence:</strong> {confidence_bar} {rec['confidence']}%</p>
-                                <p style="font-size: 0.8rem; color: #888;">Rule: {rec['rule_fired']}</p>
-                            </div>
-                            """, unsafe_allow_html=True)
-                        
-                        # Explainability section
-                        with st.expander("See Which Rules Were Fired (Explainability)"):
-                            rules_fired = [rec['rule_fired'] for rec in recommendations]
-                            st.write("**Rules that matched your situation:**")
-                            for rule in rules_fired:
-                                st.write(f"- {rule}")
-                            
-                            st.info("**Full Explainability Maintained**: Even with AI input parsing, "
-                                   "all recommendations trace back to explicit expert system rules. "
-                                   "No black-box decisions!")
-                    else:
-                        st.info("No specific recommendations matched. You seem to be in good balance!")
-                
-                else:
-                    st.error(f"Error processing input: {result['error']}")
-                    st.info("Please check your API key is set correctly in .env file")
+                from conversation import Conversation
+
+                if conversation is None:
+                    conversation = st.session_state.conversation = Conversation()
+
+                # Parse with LLM (follow-ups extract only the changed fields). The
+                # first message goes through the recommendation cache; follow-ups
+                # re-evaluate only the rules whose fields changed
+                result = conversation.send(user_input, follow_up=follow_up)
+                recommendations = [dict(rec) for rec in conversation.recommendations]
+                st.session_state.nl_result = nl_result(user_input, result, recommendations)
+
+            # The engine ran inside conversation.send; the rest is rendering
+            render = tracing.start_span("render")
+    
+    # The last results stay on screen across reruns
+    if 'nl_result' in st.session_state:
+        show_nl_result(st.session_state.nl_result)
+    if render is not None:
+        render.end()
+        request_span.end()
 
 
 
@@ -658,4 +869,14 @@ with st.sidebar:
     - Experta (Rule-based reasoning)
     - Streamlit (User interface)
     - 25 research-backed rules
-    """)
\ No newline at end of file
+    """)
+
+    if rerun_profiler is not None:
+        # Stopped here so the panel below already lists this rerun's profile
+        rerun_profiler.stop()
+    if admin_mode():
+        rule_metrics_panel()
+        profiling_panel()
+
+# Engines are built after the page is drawn, so the first render does not wait
+warm_engines_in_background()
@@ -0,0 +1,359 @@
+"""
+Streaming batch evaluation of student-state files
+Reads JSONL records one chunk at a time, evaluates structured states with
+the vectorized batch engine (or parses natural-language messages first) and
+writes ranked recommendations as JSONL or Parquet. Memory stays bounded by
+the chunk size, progress goes to stderr, and a checkpoint written after every
+chunk lets an interrupted run resume where it stopped.
+
+Input lines are JSON objects: StudentState fields for structured records, or
+{"message": "..."} for natural-language records. An optional "id" is copied
+to the output.
+
+Usage:
+    python -m expert_system batch in.jsonl -o out.jsonl [--resume]
+    python batch_cli.py in.jsonl -o out.parquet [--mode nl] [--chunk-size N]
+"""
+import argparse
+import contextlib
+import itertools
+import json
+import os
+import sys
+import time
+
+from expert_system import STUDENT_STATE_FIELDS, run_expert_system
+
+DEFAULT_CHUNK_SIZE = 1000
+
+# Seconds between progress lines
+PROGRESS_INTERVAL = 2.0
+
+# Fields of each recommendation written to the output, besides its rank
+OUTPUT_FIELDS = ('rule_fired', 'confidence', 'priority', 'activity', 'category')
+
+
+# ==================== PIPELINE ====================
+
+def read_records(path, offset=0, line_number=0):
+    """
+    Yield (line_number, end_offset, record, error) for each non-blank line,
+    starting at byte `offset`. Lines that are not JSON objects carry an error
+    instead of a record. end_offset is where the next line starts.
+    """
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        for line in f:
+            offset += len(line)
+            line_number += 1
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except (UnicodeDecodeError, json.JSONDecodeError) as e:
+                yield line_number, offset, None, f"invalid JSON: {e}"
+                continue
+            if not isinstance(record, dict):
+                yield line_number, offset, None, f"expected a JSON object, got {type(record).__name__}"
+                continue
+            yield line_number, offset, record, None
+
+
+def chunked(items, size):
+    """Lists of up to `size` consecutive items"""
+    iterator = iter(items)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _record_mode(record, mode):
+    if mode == "auto":
+        return "nl" if "message" in record else "structured"
+    return mode
+
+
+def _state(record):
+    return {field: record[field] for field in STUDENT_STATE_FIELDS if field in record}
+
+
+def _evaluate_states(states, engine):
+    """One recommendation list (or exception) per state"""
+    if engine == "batch":
+        from batch_engine import run_expert_system_batch
+        try:
+            return run_expert_system_batch(states)
+        except Exception:
+            # One malformed state fails the whole batch; find it row by row
+            engine = "compiled"
+
+    results = []
+    for state in states:
+        try:
+            results.append(run_expert_system(state, mode=engine)[0])
+        except Exception as e:
+            results.append(e)
+    return results
+
+
+def evaluate_chunk(chunk, mode="auto", engine="batch"):
+    """
+    Output records for a chunk of read_records items: natural-language
+    messages are extracted with parse_natural_language_batch, then every
+    state in the chunk is evaluated in one batch
+    """
+    outputs = []
+    states = []
+    evaluated = []
+    messages = []
+
+    for line_number, _, record, error in chunk:
+        output = {'line': line_number}
+        if record is not None and 'id' in record:
+            output['id'] = record['id']
+        outputs.append(output)
+        if error:
+            output['error'] = error
+        elif _record_mode(record, mode) == "nl":
+            if not isinstance(record.get('message'), str):
+                output['error'] = 'expected {"message": "..."}'
+            else:
+                messages.append((output, record['message']))
+        else:
+            states.append(_state(record))
+            evaluated.append(output)
+
+    if messages:
+        from llm_parser import parse_natural_language_batch
+        for (output, _), result in zip(messages, parse_natural_language_batch(
+                [message for _, message in messages])):
+            if result['success']:
+                output['extraction'] = result['data']
+                states.append(result['data'])
+                evaluated.append(output)
+            else:
+                output['error'] = f"extraction failed: {result['error']}"
+
+    for output, recommendations in zip(evaluated, _evaluate_states(states, engine)):
+        if isinstance(recommendations, Exception):
+            output['error'] = f"evaluation failed: {recommendations!r}"
+            continue
+        output['recommendations'] = [
+            dict({'rank': rank}, **{field: recommendation[field] for field in OUTPUT_FIELDS})
+            for rank, recommendation in enumerate(recommendations, 1)
+        ]
+    return outputs
+
+
+# ==================== OUTPUT ====================
+
+class JSONLWriter:
+    """Appends output records as JSON lines; the checkpoint stores the file size"""
+
+    def __init__(self, path, checkpoint=None):
+        self.path = path
+        self._file = open(path, 'r+b' if checkpoint else 'wb')
+        if checkpoint:
+            # Drop anything written after the last checkpoint
+            self._file.truncate(checkpoint['output_offset'])
+            self._file.seek(checkpoint['output_offset'])
+
+    def write(self, outputs):
+        self._file.write(b''.join(json.dumps(output).encode() + b'\n' for output in outputs))
+
+    def commit(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        return {'output_offset': self._file.tell()}
+
+    def close(self):
+        self._file.close()
+
+
+# Columns of the Parquet output and their pandas types
+PARQUET_COLUMNS = {
+    'line': 'int64',
+    'id': 'string',
+    'error': 'string',
+    'rank': 'Int64',
+    'rule_fired': 'string',
+    'confidence': 'Float64',
+    'priority': 'Int64',
+    'activity': 'string',
+    'category': 'string',
+}
+
+
+class ParquetWriter:
+    """
+    Writes one Parquet part file per chunk into a directory, one row per
+    recommendation, readable as a whole with pandas.read_parquet(path).
+    The checkpoint stores the number of finished parts.
+    """
+
+    def __init__(self, path, checkpoint=None):
+        try:
+            import pyarrow  # noqa: F401  (pandas needs it to write Parquet)
+        except ImportError:
+            raise SystemExit("Parquet output needs pyarrow: pip install pyarrow")
+        self.path = path
+        self.parts = checkpoint['parts'] if checkpoint else 0
+        os.makedirs(path, exist_ok=True)
+        for name in os.listdir(path):
+            if name.startswith("part-") and int(name[5:10]) >= self.parts:
+                os.remove(os.path.join(path, name))
+        self._rows = []
+
+    def write(self, outputs):
+        for output in outputs:
+            record_id = output.get('id')
+            base = {'line': output['line'],
+                    'id': None if record_id is None else str(record_id),
+                    'error': output.get('error')}
+            recommendations = output.get('recommendations') or [{}]
+            for recommendation in recommendations:
+                row = dict(base)
+                row['rank'] = recommendation.get('rank')
+                for field in OUTPUT_FIELDS:
+                    row[field] = recommendation.get(field)
+                self._rows.append(row)
+
+    def commit(self):
+        import pandas as pd
+
+        if self._rows:
+            frame = pd.DataFrame(self._rows, columns=list(PARQUET_COLUMNS))
+            # Fixed types, so parts whose column is all null still share one schema
+            frame = frame.astype(PARQUET_COLUMNS)
+            frame.to_parquet(os.path.join(self.path, f"part-{self.parts:05d}.parquet"), index=False)
+            self.parts += 1
+            self._rows = []
+        return {'parts': self.parts}
+
+    def close(self):
+        pass
+
+
+# ==================== CHECKPOINTS ====================
+
+def checkpoint_path(output):
+    return output.rstrip("/\\") + ".checkpoint"
+
+
+def load_checkpoint(input_path, output):
+    """The checkpoint of an unfinished run over the same input, or None"""
+    try:
+        with open(checkpoint_path(output)) as f:
+            checkpoint = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not os.path.exists(output):
+        return None
+    stat = os.stat(input_path)
+    if (checkpoint.get('input') != os.path.abspath(input_path)
+            or checkpoint.get('input_size') != stat.st_size
+            or checkpoint.get('input_mtime') != stat.st_mtime):
+        return None
+    return checkpoint
+
+
+def save_checkpoint(output, checkpoint):
+    """Replace the checkpoint atomically, so a crash never leaves half of one"""
+    path = checkpoint_path(output)
+    with open(path + ".tmp", 'w') as f:
+        json.dump(checkpoint, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(path + ".tmp", path)
+
+
+# ==================== DRIVER ====================
+
+def run_batch(input_path, output, mode="auto", engine="batch",
+              chunk_size=DEFAULT_CHUNK_SIZE, resume=False, progress=sys.stderr):
+    """
+    Evaluate every record of `input_path` and write the results to `output`
+    (a .parquet path writes a directory of Parquet parts, anything else JSONL).
+
+    With resume=True a run over an unchanged input continues after the last
+    checkpointed chunk. Returns the number of records written.
+    """
+    checkpoint = load_checkpoint(input_path, output) if resume else None
+    parquet = output.endswith(".parquet")
+    writer = (ParquetWriter if parquet else JSONLWriter)(output, checkpoint)
+    stat = os.stat(input_path)
+    state = checkpoint or {
+        'input': os.path.abspath(input_path),
+        'input_size': stat.st_size,
+        'input_mtime': stat.st_mtime,
+        'input_offset': 0,
+        'lines': 0,
+        'records': 0,
+        'errors': 0,
+    }
+    if checkpoint and progress:
+        print(f"Resuming after line {state['lines']} ({state['records']} records done)",
+              file=progress)
+
+    start = last_report = time.monotonic()
+    done_before = state['records']
+    try:
+        records = read_records(input_path, state['input_offset'], state['lines'])
+        for chunk in chunked(records, chunk_size):
+            outputs = evaluate_chunk(chunk, mode, engine)
+            writer.write(outputs)
+            state.update(writer.commit())
+            state['input_offset'] = chunk[-1][1]
+            state['lines'] = chunk[-1][0]
+            state['records'] += len(outputs)
+            state['errors'] += sum('error' in output for output in outputs)
+            save_checkpoint(output, state)
+
+            now = time.monotonic()
+            if progress and now - last_report >= PROGRESS_INTERVAL:
+                last_report = now
+                rate = (state['records'] - done_before) / (now - start)
+                print(f"{state['records']:>10} records  "
+                      f"{state['input_offset'] / max(stat.st_size, 1):6.1%}  "
+                      f"{rate:8.0f} records/s  {state['errors']} error(s)", file=progress)
+    finally:
+        writer.close()
+
+    # No checkpoint is written when the input has no records left to process
+    with contextlib.suppress(FileNotFoundError):
+        os.remove(checkpoint_path(output))
+    if progress:
+        elapsed = time.monotonic() - start
+        print(f"Done: {state['records']} records ({state['errors']} with errors) "
+              f"in {elapsed:.1f}s -> {output}", file=progress)
+    return state['records']
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m expert_system batch",
+        description="Evaluate a JSONL file of student states or messages")
+    parser.add_argument("input", help="JSONL file, one record per line")
+    parser.add_argument("-o", "--output", required=True,
+                        help="output path; *.parquet writes Parquet, anything else JSONL")
+    parser.add_argument("--mode", choices=("auto", "structured", "nl"), default="auto",
+                        help="structured states, natural-language messages, or decide "
+                             "per record by the presence of 'message' (default)")
+    parser.add_argument("--engine", choices=("batch", "experta", "compiled", "table"),
+                        default="batch",
+                        help="vectorized batch engine (default) or a run_expert_system mode")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE,
+                        help="records held in memory and written per checkpoint")
+    parser.add_argument("--resume", action="store_true",
+                        help="continue an interrupted run from its checkpoint")
+    parser.add_argument("--quiet", action="store_true", help="no progress output")
+    args = parser.parse_args(argv)
+
+    run_batch(args.input, args.output, args.mode, args.engine, args.chunk_size,
+              args.resume, None if args.quiet else sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
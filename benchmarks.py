@@ -0,0 +1,354 @@
+"""
+Benchmark suite for the Activity Advisor
+Measures engine latency per scenario, batch throughput, memory per
+evaluation, recommendation sorting, parsing against a local stub Groq server
+and the full message -> engine -> results path. Results are saved as JSON;
+comparing them with an earlier run flags regressions and exits non-zero.
+
+Usage:
+    python benchmarks.py [--quick] [--latency SECONDS] [--output results.json]
+    python benchmarks.py --compare baseline.json [--tolerance 0.25]
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from compiled_engine import random_student_state
+from expert_system import (
+    RECOMMENDATION_FIELDS,
+    engine_pool,
+    run_expert_system,
+    run_expert_system_batch,
+    sort_recommendations,
+    StudentState,
+)
+
+DEFAULT_OUTPUT = "benchmark_results.json"
+
+# Relative change allowed before a metric counts as a regression
+DEFAULT_TOLERANCE = 0.25
+
+SCENARIOS = {
+    'sleep_deprived_exam': {
+        'sleep_hours': 4.0, 'energy_level': "Very Low", 'stress_level': "High",
+        'study_hours_today': 3.0, 'deadline_urgency': "Urgent (within 24h)", 'break_taken': False,
+        'task_complexity': "High", 'passive_learning_hours': 1.0, 'social_isolation_days': 1,
+        'sedentary_hours': 5.0, 'cramming': True, 'current_time': 14,
+    },
+    'rested_morning': {
+        'sleep_hours': 8.0, 'energy_level': "High", 'stress_level': "Low",
+        'study_hours_today': 0.0, 'deadline_urgency': "None", 'break_taken': False,
+        'task_complexity': "High", 'passive_learning_hours': 0.0, 'social_isolation_days': 0,
+        'sedentary_hours': 1.0, 'cramming': False, 'current_time': 9,
+    },
+    'study_overload': {
+        'sleep_hours': 6.0, 'energy_level': "Low", 'stress_level': "Very High",
+        'study_hours_today': 9.0, 'deadline_urgency': "Within 48 hours", 'break_taken': False,
+        'task_complexity': "Medium", 'passive_learning_hours': 5.0, 'social_isolation_days': 5,
+        'sedentary_hours': 10.0, 'cramming': True, 'current_time': 23,
+    },
+    'balanced_afternoon': {
+        'sleep_hours': 7.0, 'energy_level': "Moderate", 'stress_level': "Moderate",
+        'study_hours_today': 2.0, 'deadline_urgency': "None", 'break_taken': False,
+        'task_complexity': "Medium", 'passive_learning_hours': 1.0, 'social_isolation_days': 1,
+        'sedentary_hours': 4.0, 'cramming': False, 'current_time': 14,
+    },
+}
+
+# Messages for the parser benchmarks; the stub replies the same to all
+MESSAGES = [
+    "had a rough night and my midterm is coming up",
+    "I'm so tired of this class, not sure what to do",
+    "feeling okay I guess, lots of reading left",
+    "my group project is a mess and I keep putting it off",
+]
+
+
+def _metric(value, unit, better="lower"):
+    return {'value': round(value, 3), 'unit': unit, 'better': better}
+
+
+def _samples(function, repeat):
+    """Seconds per call for `repeat` calls, after one warm-up call"""
+    function()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def _percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def _latency_metrics(prefix, samples, scale=1e6, unit="us"):
+    return {
+        f"{prefix}.median_{unit}": _metric(statistics.median(samples) * scale, unit),
+        f"{prefix}.p95_{unit}": _metric(_percentile(samples, 0.95) * scale, unit),
+    }
+
+
+# ==================== ENGINE ====================
+
+def bench_engine_latency(repeat):
+    """run_expert_system latency for each scenario and engine mode"""
+    metrics = {}
+    for mode in ("experta", "compiled"):
+        for name, state in SCENARIOS.items():
+            samples = _samples(lambda: run_expert_system(state, mode), repeat)
+            metrics.update(_latency_metrics(f"engine.{mode}.{name}", samples))
+    return metrics
+
+
+def bench_batch_throughput(sizes, seed=0):
+    """Students per second of run_expert_system_batch for each batch size"""
+    rng = random.Random(seed)
+    pool = [random_student_state(rng) for _ in range(max(sizes))]
+    metrics = {}
+    for size in sizes:
+        states = pool[:size]
+        rounds = max(1, 2000 // size)
+        elapsed = min(_samples(lambda: run_expert_system_batch(states), rounds))
+        metrics[f"batch.size_{size}.students_per_s"] = _metric(size / elapsed, "students/s", "higher")
+    return metrics
+
+
+def _allocated(function):
+    """Peak bytes traced while `function` runs"""
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        function()
+        return tracemalloc.get_traced_memory()[1] - baseline
+    finally:
+        tracemalloc.stop()
+
+
+def _retained(function):
+    """Blocks and bytes still allocated once `function` has returned (result dropped)"""
+    tracemalloc.start()
+    try:
+        ignore = [tracemalloc.Filter(False, tracemalloc.__file__)]
+        before = tracemalloc.take_snapshot().filter_traces(ignore)
+        function()
+        after = tracemalloc.take_snapshot().filter_traces(ignore)
+    finally:
+        tracemalloc.stop()
+    diff = after.compare_to(before, 'filename')
+    return sum(stat.count_diff for stat in diff), sum(stat.size_diff for stat in diff)
+
+
+def bench_memory(batch_size=1000, seed=0):
+    """
+    Peak memory allocated per evaluation, per mode, what the engine still
+    holds afterwards (a pooled experta engine keeps its facts until the
+    next reset), and peak memory per student in a batch
+    """
+    state = SCENARIOS['study_overload']
+    metrics = {}
+    for mode in ("experta", "compiled"):
+        run_expert_system(state, mode)
+        metrics[f"memory.{mode}.peak_kib_per_evaluation"] = _metric(
+            _allocated(lambda: run_expert_system(state, mode)) / 1024, "KiB")
+        blocks, size = _retained(lambda: run_expert_system(state, mode))
+        metrics[f"memory.{mode}.retained_blocks_per_evaluation"] = _metric(blocks, "blocks")
+        metrics[f"memory.{mode}.retained_kib_per_evaluation"] = _metric(size / 1024, "KiB")
+
+    rng = random.Random(seed)
+    states = [random_student_state(rng) for _ in range(batch_size)]
+    run_expert_system_batch(states[:10])
+    metrics["memory.batch.peak_kib_per_student"] = _metric(
+        _allocated(lambda: run_expert_system_batch(states)) / 1024 / batch_size, "KiB")
+    return metrics
+
+
+def bench_sorting(repeat, sizes=(5, 25, 100)):
+    """Cost of get_recommendations on a finished engine, and of sorting alone"""
+    metrics = {}
+    with engine_pool.engine() as engine:
+        engine.declare(StudentState(**SCENARIOS['study_overload']))
+        engine.run()
+        count = len(engine.get_recommendations())
+        samples = _samples(engine.get_recommendations, repeat)
+    metrics.update(_latency_metrics(f"sorting.get_recommendations_{count}_recs", samples))
+
+    rng = random.Random(0)
+    for size in sizes:
+        recommendations = [
+            dict({field: "" for field in RECOMMENDATION_FIELDS},
+                 priority=rng.randint(1, 3), confidence=rng.randint(60, 95),
+                 rule_fired=f"R{rng.randint(1, 25)}_RULE")
+            for _ in range(size)
+        ]
+        samples = _samples(lambda: sort_recommendations(list(recommendations)), repeat)
+        metrics.update(_latency_metrics(f"sorting.sort_{size}_recs", samples))
+    return metrics
+
+
+# ==================== PARSER ====================
+
+@contextlib.contextmanager
+def _stub_parser(latency):
+    """parse_natural_language wired to a local stub, with caches and local extraction off"""
+    import llm_parser
+    from groq_stub import StubGroqServer
+
+    with StubGroqServer(latency=latency) as stub, llm_parser._llm_cache_disabled():
+        shared, local = llm_parser._client, llm_parser.LOCAL_EXTRACTION
+        llm_parser._client = llm_parser.create_groq_client(api_key="stub", base_url=stub.base_url)
+        llm_parser.LOCAL_EXTRACTION = False
+        try:
+            yield llm_parser
+        finally:
+            llm_parser._client, llm_parser.LOCAL_EXTRACTION = shared, local
+
+
+def bench_parser(repeat, latency):
+    """parse_natural_language against the stub; overhead is latency above the stub's own"""
+    with _stub_parser(latency) as llm_parser:
+        messages = iter(MESSAGES * repeat * 2)
+        samples = _samples(lambda: llm_parser.parse_natural_language(next(messages)), repeat)
+    metrics = _latency_metrics("parser.parse_natural_language", samples, 1e3, "ms")
+    metrics["parser.overhead_ms"] = _metric((statistics.median(samples) - latency) * 1e3, "ms")
+    return metrics
+
+
+def bench_end_to_end(repeat, latency):
+    """Message -> extraction -> engine -> serialized results, with per-stage medians"""
+    stages = {'parse': [], 'engine': [], 'results': []}
+    with _stub_parser(latency) as llm_parser:
+        for position in range(repeat + 1):
+            message = MESSAGES[position % len(MESSAGES)]
+            start = time.perf_counter()
+            result = llm_parser.parse_natural_language(message)
+            parsed = time.perf_counter()
+            recommendations, _ = run_expert_system(result['data'])
+            evaluated = time.perf_counter()
+            json.dumps({
+                'explanation': llm_parser.get_extraction_explanation(message, result['data']),
+                'recommendations': recommendations,
+            })
+            done = time.perf_counter()
+            if position:  # the first pass warms up
+                stages['parse'].append(parsed - start)
+                stages['engine'].append(evaluated - parsed)
+                stages['results'].append(done - evaluated)
+
+    totals = [sum(parts) for parts in zip(*stages.values())]
+    metrics = _latency_metrics("end_to_end.total", totals, 1e3, "ms")
+    for stage, samples in stages.items():
+        metrics[f"end_to_end.{stage}.median_ms"] = _metric(statistics.median(samples) * 1e3, "ms")
+    return metrics
+
+
+# ==================== RESULTS ====================
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, cwd=os.path.dirname(os.path.abspath(__file__)),
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(quick=False, latency=0.05):
+    """Run every benchmark and return the results document"""
+    repeat = 20 if quick else 200
+    parser_repeat = 5 if quick else 30
+    sizes = (1, 10, 100, 1000) if quick else (1, 10, 100, 1000, 10000)
+
+    suites = [
+        ("engine latency", lambda: bench_engine_latency(repeat)),
+        ("batch throughput", lambda: bench_batch_throughput(sizes)),
+        ("memory", bench_memory),
+        ("sorting", lambda: bench_sorting(repeat)),
+        ("parser", lambda: bench_parser(parser_repeat, latency)),
+        ("end to end", lambda: bench_end_to_end(parser_repeat, latency)),
+    ]
+    metrics = {}
+    for name, suite in suites:
+        start = time.perf_counter()
+        metrics.update(suite())
+        print(f"{name:18} done in {time.perf_counter() - start:5.1f}s", file=sys.stderr)
+
+    return {
+        'meta': {
+            'commit': _git_commit(),
+            'timestamp': time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'quick': quick,
+            'stub_latency_s': latency,
+        },
+        'metrics': metrics,
+    }
+
+
+def compare(baseline, current, tolerance=DEFAULT_TOLERANCE):
+    """
+    Metrics that got slower by more than `tolerance` (0.25 means 25% more
+    time per call, or throughput divided by 1.25), as (name, old value,
+    new value, slowdown) tuples
+    """
+    regressions = []
+    for name, new in current['metrics'].items():
+        old = baseline['metrics'].get(name)
+        if old is None or old['value'] <= 0 or new['value'] <= 0:
+            continue
+        if new['better'] == "lower":
+            slowdown = new['value'] / old['value'] - 1
+        else:
+            slowdown = old['value'] / new['value'] - 1
+        if slowdown > tolerance:
+            regressions.append((name, old['value'], new['value'], slowdown))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the engine, parser and end-to-end paths")
+    parser.add_argument("--quick", action="store_true", help="fewer repetitions")
+    parser.add_argument("--latency", type=float, default=0.05,
+                        help="seconds the stub Groq server waits before replying")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="where to save the JSON results")
+    parser.add_argument("--compare", metavar="BASELINE",
+                        help="earlier results; exit with status 1 on regressions")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="relative slowdown allowed before a metric regresses")
+    args = parser.parse_args(argv)
+
+    results = run_suite(args.quick, args.latency)
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+
+    for name, metric in results['metrics'].items():
+        print(f"{name:55} {metric['value']:12,.3f} {metric['unit']}")
+    print(f"\nSaved to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, results, args.tolerance)
+        print(f"\nCompared with {args.compare} (commit {baseline['meta'].get('commit')}): "
+              f"{len(regressions)} regression(s) beyond {args.tolerance:.0%}")
+        for name, old, new, slowdown in regressions:
+            print(f"  {name:53} {old:12,.3f} -> {new:12,.3f} ({slowdown:.0%} worse)")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
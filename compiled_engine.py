@@ -0,0 +1,231 @@
+"""
+Compiled rule evaluator for the Activity Advisor
+Flattens the experta @Rule definitions of ActivityAdvisorES into plain
+predicate checks over a dictionary, so a student state can be evaluated
+without building a Rete network, declaring facts or running an agenda
+"""
+import fix_experta
+
+import inspect
+import random
+import time
+
+from experta import Rule, TEST
+from experta.fieldconstraint import FieldConstraint, L, W, ORFC
+
+from expert_system import (
+    ActivityAdvisorES,
+    ENERGY_LEVELS,
+    STRESS_LEVELS,
+    DEADLINE_OPTIONS,
+    TASK_COMPLEXITIES,
+    FiredRule,
+    StudentState,
+    render_recommendations,
+    run_expert_system,
+)
+
+
+class CompiledRule:
+    """A single @Rule reduced to literal checks, bindings and tests"""
+
+    def __init__(self, name, literals, bindings, tests, action, action_args):
+        self.name = name
+        self.literals = literals          # ((field, allowed_values), ...)
+        self.bindings = bindings          # ((field, variable), ...)
+        self.tests = tests                # ((function, argument_names), ...)
+        self.action = action
+        self.action_args = action_args
+        self.fields = frozenset(field for field, _ in literals + bindings)
+
+    def match(self, state):
+        """Return the variable bindings if the rule matches, otherwise None"""
+        for field, allowed in self.literals:
+            if field not in state or state[field] not in allowed:
+                return None
+
+        context = {}
+        for field, variable in self.bindings:
+            if field not in state:
+                return None
+            if variable in context and context[variable] != state[field]:
+                return None
+            context[variable] = state[field]
+
+        for function, names in self.tests:
+            if not function(**{name: context[name] for name in names}):
+                return None
+
+        return context
+
+    def fire(self, context):
+        """Run the rule's right-hand side and return the FiredRule records it made"""
+        collector = _RecommendationCollector()
+        self.action(collector, **{name: context[name] for name in self.action_args})
+        return collector.recommendations
+
+    def recommend(self, context):
+        """Run the rule's right-hand side and return its recommendations as dicts"""
+        return [record.to_dict() for record in self.fire(context)]
+
+
+class _RecommendationCollector:
+    """Stands in for the engine while a rule's right-hand side runs"""
+
+    def __init__(self):
+        self.recommendations = []
+
+    def recommend(self, rule_id, **values):
+        self.recommendations.append(FiredRule(rule_id, values))
+
+
+class _AnyValue:
+    """Allowed-values placeholder for an unbound wildcard: accepts anything"""
+
+    def __contains__(self, value):
+        return True
+
+
+def _compile_constraint(field, value, literals, bindings):
+    """Translate one field constraint of a StudentState pattern"""
+    if isinstance(value, W):
+        if value.__bind__ is not None:
+            bindings.append((field, value.__bind__))
+        else:
+            literals.append((field, _AnyValue()))
+    elif isinstance(value, L):
+        literals.append((field, (value.value,)))
+        if value.__bind__ is not None:
+            bindings.append((field, value.__bind__))
+    elif isinstance(value, ORFC):
+        if not all(isinstance(option, L) and option.__bind__ is None
+                   for option in value):
+            raise TypeError(f"Unsupported OR constraint on '{field}': {value!r}")
+        literals.append((field, tuple(option.value for option in value)))
+    elif isinstance(value, FieldConstraint):
+        raise TypeError(f"Unsupported constraint on '{field}': {value!r}")
+    else:
+        literals.append((field, (value,)))
+
+
+def compile_rule(name, rule):
+    """Compile an experta Rule into a CompiledRule"""
+    literals = []
+    bindings = []
+    tests = []
+
+    for pattern in rule:
+        if isinstance(pattern, TEST):
+            function = pattern[0]
+            names = tuple(inspect.signature(function).parameters)
+            tests.append((function, names))
+        elif isinstance(pattern, StudentState):
+            for field, value in pattern.items():
+                _compile_constraint(field, value, literals, bindings)
+        else:
+            raise TypeError(f"Rule '{name}' uses an unsupported pattern: {pattern!r}")
+
+    action_args = tuple(arg for arg in rule._wrapped_args if arg != 'self')
+
+    bound = {variable for _, variable in bindings}
+    for function, names in tests:
+        missing = set(names) - bound
+        if missing:
+            raise TypeError(f"Rule '{name}' tests unbound variables: {sorted(missing)}")
+
+    return CompiledRule(name, tuple(literals), tuple(bindings), tuple(tests),
+                        rule._wrapped, action_args)
+
+
+def compile_rules(engine_class=ActivityAdvisorES):
+    """Compile every @Rule of an engine class, in definition order"""
+    return [
+        compile_rule(name, value)
+        for name, value in vars(engine_class).items()
+        if isinstance(value, Rule)
+    ]
+
+
+class CompiledAdvisor:
+    """Evaluates student states against the compiled rule set"""
+
+    def __init__(self, engine_class=ActivityAdvisorES):
+        self.rules = compile_rules(engine_class)
+
+    def get_recommendations(self, user_inputs):
+        """Return recommendations sorted exactly like ActivityAdvisorES does"""
+        fired = []
+        for rule in self.rules:
+            context = rule.match(user_inputs)
+            if context is not None:
+                fired.extend(rule.fire(context))
+        return render_recommendations(fired)
+
+
+_advisor = None
+
+
+def get_compiled_advisor():
+    """Return the process-wide CompiledAdvisor, compiling the rules on first use"""
+    global _advisor
+    if _advisor is None:
+        _advisor = CompiledAdvisor()
+    return _advisor
+
+
+# ==================== LATENCY CHECK ====================
+
+def random_student_state(rng):
+    """
+    Generate a random student state covering the widget grid, off-grid
+    values (as the LLM may return) and occasionally missing fields
+    """
+    def hours(maximum):
+        if rng.random() < 0.7:
+            return rng.randint(0, int(maximum * 2)) / 2
+        return round(rng.uniform(0, maximum), rng.choice([0, 1, 2]))
+
+    state = {
+        'sleep_hours': hours(12),
+        'energy_level': rng.choice(ENERGY_LEVELS),
+        'stress_level': rng.choice(STRESS_LEVELS),
+        'study_hours_today': hours(12),
+        'deadline_urgency': rng.choice(DEADLINE_OPTIONS + ("Urgent",)),
+        'break_taken': rng.random() < 0.5,
+        'task_complexity': rng.choice(TASK_COMPLEXITIES),
+        'passive_learning_hours': hours(8),
+        'social_isolation_days': rng.randint(0, 7),
+        'sedentary_hours': hours(12),
+        'cramming': rng.random() < 0.5,
+        'current_time': rng.randint(0, 23),
+    }
+
+    if rng.random() < 0.05:
+        del state[rng.choice(list(state))]
+
+    return state
+
+
+def compare_latency(cases=1000, seed=0):
+    """Print the average per-state latency of both evaluation paths"""
+    rng = random.Random(seed)
+    states = [random_student_state(rng) for _ in range(cases)]
+    advisor = CompiledAdvisor()
+
+    start = time.perf_counter()
+    for state in states:
+        run_expert_system(state, mode="experta")
+    experta_time = (time.perf_counter() - start) / cases
+
+    start = time.perf_counter()
+    for state in states:
+        advisor.get_recommendations(state)
+    compiled_time = (time.perf_counter() - start) / cases
+
+    print(f"experta:  {experta_time * 1e6:9.1f} us per state")
+    print(f"compiled: {compiled_time * 1e6:9.1f} us per state")
+    print(f"speedup:  {experta_time / compiled_time:9.1f}x")
+
+
+if __name__ == "__main__":
+    compare_latency()
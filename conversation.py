@@ -0,0 +1,114 @@
+"""
+Multi-turn natural language sessions
+The first message is extracted in full and evaluated like any other
+request: with ENGINE_MODE, through the shared recommendation cache.
+Follow-ups only extract the fields they change, which are merged into the
+stored state and re-evaluated incrementally by a SessionAdvisor (the
+compiled rules, whatever ENGINE_MODE is).
+"""
+import json
+import time
+
+from incremental_advisor import SessionAdvisor
+from llm_parser import parse_delta, parse_natural_language
+from recommendation_cache import cached_recommendations
+
+
+class Conversation:
+    """
+    Extracted student state and recommendations for one chat session.
+
+    send() returns the parser's result dict with 'data' holding the full
+    merged state and, for follow-ups, 'delta' holding the changed fields.
+    """
+
+    def __init__(self, advisor=None):
+        self.advisor = SessionAdvisor(advisor=advisor)
+        self.state = None
+        self.turns = 0
+        self.recommendations = []
+        # Whether self.advisor holds self.state; it is only needed for follow-ups
+        self._advisor_current = False
+
+    def reset(self):
+        """Forget the state; the next message is extracted in full"""
+        self.state = None
+        self.turns = 0
+        self.recommendations = []
+        self._advisor_current = False
+
+    def send(self, user_message, follow_up=True):
+        """Extract a message, as a follow-up if a state exists and follow_up is set"""
+        if self.state is None or not follow_up:
+            result = parse_natural_language(user_message)
+            if result['success']:
+                self.state = dict(result['data'])
+                self.recommendations = cached_recommendations(self.state)
+                self._advisor_current = False
+                self.turns = 1
+            return result
+
+        result = parse_delta(user_message, self.state)
+        if result['success']:
+            delta = result['data']
+            self.state.update(delta)
+            if self._advisor_current:
+                self.advisor.update_state(delta)
+            else:
+                self.advisor.set_state(self.state)
+                self._advisor_current = True
+            self.recommendations = self.advisor.recommendations
+            self.turns += 1
+            result = dict(result, data=dict(self.state), delta=delta)
+        return result
+
+
+# ==================== BENCHMARK ====================
+
+def benchmark_followups(turns=20, latency=0.05):
+    """
+    Compare re-extracting every follow-up in full with delta extraction,
+    against a local stub: prompt size, time per turn and rules re-evaluated
+    """
+    import llm_parser
+    from groq_stub import DEFAULT_EXTRACTION, StubGroqServer
+
+    prompt_chars = []
+
+    def reply(payload):
+        # Each follow-up flips the stress level
+        prompt = payload["messages"][0]["content"]
+        prompt_chars.append(len(prompt))
+        stress = ("High", "Very High")[len(prompt_chars) % 2]
+        if prompt.startswith("A student is updating"):
+            return json.dumps({"stress_level": stress})
+        return json.dumps(dict(DEFAULT_EXTRACTION, stress_level=stress))
+
+    first = "had a rough night and my midterm is coming up"
+    follow_up = "hmm, thinking about it more, it's getting to me"
+
+    with StubGroqServer(latency=latency, content=reply) as stub, \
+            llm_parser._llm_cache_disabled():
+        client = llm_parser.create_groq_client(api_key="stub", base_url=stub.base_url)
+        shared, llm_parser._client = llm_parser._client, client
+        try:
+            for name, is_follow_up in (("full re-extraction", False), ("delta extraction", True)):
+                conversation = Conversation()
+                conversation.send(first)
+                del prompt_chars[:]
+                evaluated = 0
+                start = time.perf_counter()
+                for _ in range(turns):
+                    conversation.send(follow_up, follow_up=is_follow_up)
+                    # Full extractions evaluate every rule (through the cache)
+                    evaluated += (conversation.advisor.rules_evaluated if is_follow_up
+                                  else len(conversation.advisor.advisor.rules))
+                elapsed = (time.perf_counter() - start) / turns
+                print(f"{name:20} {sum(prompt_chars) / turns:6.0f} prompt chars, "
+                      f"{elapsed * 1000:6.1f} ms and {evaluated / turns:4.1f} rules per turn")
+        finally:
+            llm_parser._client = shared
+
+
+if __name__ == "__main__":
+    benchmark_followups()
@@ -0,0 +1,269 @@
+"""
+Precomputed decision table for the Activity Advisor
+Enumerates rule outcomes over the discrete widget grid so recommendations
+can be looked up without evaluating any rule
+
+Rules only share fields within a few groups (e.g. sleep, energy and time
+of day), so the table is split into one sub-table per group of connected
+fields. Each sub-table is indexed by the packed grid position of its fields
+and stores a bitset of the rules that fire; the bitsets of all groups are
+OR-ed together at lookup time.
+"""
+import hashlib
+import json
+import os
+import random
+import time
+import types
+import warnings
+
+import numpy as np
+
+from batch_engine import StudentBatch, rule_matches
+from compiled_engine import get_compiled_advisor
+from expert_system import (
+    STUDENT_STATE_FIELDS,
+    ENERGY_LEVELS,
+    STRESS_LEVELS,
+    DEADLINE_OPTIONS,
+    TASK_COMPLEXITIES,
+    render_recommendations,
+    run_expert_system,
+)
+
+
+def _half_steps(maximum):
+    return tuple(step / 2 for step in range(int(maximum * 2) + 1))
+
+
+# Values the app.py widgets can produce for each field
+GRID = {
+    'sleep_hours': _half_steps(12),
+    'energy_level': ENERGY_LEVELS,
+    'stress_level': STRESS_LEVELS,
+    'study_hours_today': _half_steps(12),
+    'deadline_urgency': DEADLINE_OPTIONS,
+    'break_taken': (False, True),
+    'task_complexity': TASK_COMPLEXITIES,
+    'passive_learning_hours': _half_steps(8),
+    'social_isolation_days': tuple(range(8)),
+    'sedentary_hours': _half_steps(12),
+    'cramming': (False, True),
+    'current_time': tuple(range(24)),
+}
+
+DEFAULT_PATH = os.environ.get(
+    "ADVISOR_DECISION_TABLE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "decision_table"))
+
+
+def _code_spec(code):
+    """What a compiled function computes, without its name, file or line numbers"""
+    return (code.co_code, code.co_names, code.co_varnames,
+            tuple(_code_spec(const) if isinstance(const, types.CodeType) else repr(const)
+                  for const in code.co_consts))
+
+
+def _rule_spec(rule):
+    """
+    The conditions of a compiled rule: its literal checks, bindings and the
+    code and constants (thresholds) of its tests. The table stores which
+    rules fire, so their right-hand sides, docstrings and decorators such
+    as @rule_id do not matter.
+    """
+    return (
+        rule.name,
+        tuple((field, allowed if isinstance(allowed, tuple) else '*')
+              for field, allowed in rule.literals),
+        rule.bindings,
+        tuple((names, _code_spec(function.__code__), repr(function.__defaults__))
+              for function, names in rule.tests),
+    )
+
+
+def rules_fingerprint(rules=None):
+    """Hash of the compiled rule conditions and grid, used to detect a stale table"""
+    rules = get_compiled_advisor().rules if rules is None else rules
+    digest = hashlib.sha256(repr([_rule_spec(rule) for rule in rules]).encode())
+    digest.update(repr(sorted(GRID.items())).encode())
+    return digest.hexdigest()
+
+
+def field_groups(rules):
+    """
+    Split the fields into groups that no rule spans.
+
+    Returns a list of (fields, rule indices), fields in STUDENT_STATE_FIELDS order.
+    """
+    parent = {}
+
+    def find(field):
+        parent.setdefault(field, field)
+        while parent[field] != field:
+            parent[field] = parent[parent[field]]
+            field = parent[field]
+        return field
+
+    for rule in rules:
+        fields = sorted(rule.fields)
+        for field in fields:
+            find(field)
+        for field in fields[1:]:
+            parent[find(field)] = find(fields[0])
+
+    groups = {}
+    for index, rule in enumerate(rules):
+        root = find(next(iter(rule.fields)))
+        groups.setdefault(root, []).append(index)
+
+    order = {field: position for position, field in enumerate(STUDENT_STATE_FIELDS)}
+    result = []
+    for root, indices in groups.items():
+        fields = sorted((field for field in parent if find(field) == root),
+                        key=lambda field: order.get(field, len(order)))
+        result.append((tuple(fields), tuple(indices)))
+    return result
+
+
+def build_decision_table(path=DEFAULT_PATH):
+    """Enumerate all rule outcomes over GRID and save the table to path.npy/path.json"""
+    rules = get_compiled_advisor().rules
+    if len(rules) > 64:
+        raise ValueError("The decision table supports at most 64 rules")
+    dtype = np.uint32 if len(rules) <= 32 else np.uint64
+
+    tables = []
+    groups = []
+    offset = 0
+    for fields, indices in field_groups(rules):
+        missing = [field for field in fields if field not in GRID]
+        if missing:
+            raise ValueError(f"No grid defined for fields: {missing}")
+
+        sizes = tuple(len(GRID[field]) for field in fields)
+        positions = np.unravel_index(np.arange(int(np.prod(sizes))), sizes)
+        columns = {field: np.asarray(GRID[field])[position]
+                   for field, position in zip(fields, positions)}
+
+        batch = StudentBatch(columns)
+        table = np.zeros(len(positions[0]), dtype=dtype)
+        for index in indices:
+            table[rule_matches(rules[index], batch)] |= dtype(1 << index)
+
+        tables.append(table)
+        groups.append({'fields': list(fields), 'sizes': list(sizes), 'offset': offset})
+        offset += len(table)
+
+    np.save(path + ".npy", np.concatenate(tables))
+    with open(path + ".json", "w") as f:
+        json.dump({
+            'fingerprint': rules_fingerprint(rules),
+            'rules': [rule.name for rule in rules],
+            'groups': groups,
+        }, f, indent=2)
+
+    return offset
+
+
+class DecisionTable:
+    """Memory-mapped decision table with O(1) lookups"""
+
+    def __init__(self, path=DEFAULT_PATH):
+        with open(path + ".json") as f:
+            meta = json.load(f)
+
+        self.rules = get_compiled_advisor().rules
+        if (meta['fingerprint'] != rules_fingerprint(self.rules)
+                or meta['rules'] != [rule.name for rule in self.rules]):
+            raise ValueError(f"Decision table at {path} is stale, rebuild it")
+
+        self.table = np.load(path + ".npy", mmap_mode='r')
+        self.positions = {field: {value: index for index, value in enumerate(values)}
+                          for field, values in GRID.items()}
+        self.groups = []
+        for group in meta['groups']:
+            strides = np.cumprod([1] + group['sizes'][:0:-1])[::-1].tolist()
+            self.groups.append((group['offset'],
+                                tuple(zip(group['fields'], strides))))
+
+    def lookup(self, user_inputs):
+        """Rule-firing bitset for a student state, or None if it is off the grid"""
+        bits = 0
+        try:
+            for offset, fields in self.groups:
+                index = offset
+                for field, stride in fields:
+                    index += self.positions[field][user_inputs[field]] * stride
+                bits |= int(self.table[index])
+        except (KeyError, TypeError):
+            return None
+        return bits
+
+    def get_recommendations(self, user_inputs):
+        """Recommendations from the table, falling back to live evaluation off the grid"""
+        bits = self.lookup(user_inputs)
+        if bits is None:
+            return run_expert_system(user_inputs, mode="compiled")[0]
+
+        fired = []
+        for index, rule in enumerate(self.rules):
+            if bits >> index & 1:
+                context = {variable: user_inputs[field] for field, variable in rule.bindings}
+                fired.extend(rule.fire(context))
+        return render_recommendations(fired)
+
+
+_table = None
+
+
+def get_decision_table():
+    """
+    Return the process-wide DecisionTable, loading it on first use
+    (expert_system.warm_up loads it at startup in table mode).
+
+    If the table file is missing or stale, every lookup falls back to
+    live evaluation until it is rebuilt.
+    """
+    global _table
+    if _table is None:
+        try:
+            _table = DecisionTable()
+        except (OSError, ValueError) as e:
+            warnings.warn(f"Decision table unavailable ({e}); using live evaluation")
+            _table = _LiveEvaluation()
+    return _table
+
+
+class _LiveEvaluation:
+    """Stand-in used when no decision table can be loaded"""
+
+    def lookup(self, user_inputs):
+        return None
+
+    def get_recommendations(self, user_inputs):
+        return run_expert_system(user_inputs, mode="compiled")[0]
+
+
+# ==================== LOOKUP CHECK ====================
+
+def random_grid_state(rng):
+    """Random student state drawn from the widget grid"""
+    return {field: rng.choice(values) for field, values in GRID.items()}
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) > 1 and sys.argv[1] == "build":
+        start = time.perf_counter()
+        entries = build_decision_table()
+        print(f"Built {entries:,} entries in {time.perf_counter() - start:.1f}s "
+              f"-> {DEFAULT_PATH}.npy")
+    else:
+        table = DecisionTable()
+        rng = random.Random(1)
+        states = [random_grid_state(rng) for _ in range(10000)]
+        start = time.perf_counter()
+        for state in states:
+            table.lookup(state)
+        print(f"lookup: {(time.perf_counter() - start) / len(states) * 1e6:.1f} us per state")
@@ -4,17 +4,269 @@ Using Experta for rule-based reasoning
 """
 import fix_experta
 
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
 from experta import *
+from experta.matchers.rete.nodes import ConflictSetNode
 from datetime import datetime
 
+import profiling
+import rule_metrics
+import tracing
+
+from state_schema import (
+    STUDENT_STATE_FIELDS,
+    ENERGY_LEVELS,
+    STRESS_LEVELS,
+    DEADLINE_OPTIONS,
+    TASK_COMPLEXITIES,
+    RECOMMENDATION_FIELDS,
+)
+
 # Define Facts
 class StudentState(Fact):
     """Represents the current state of the student"""
     pass
 
-class Recommendation(Fact):
-    """Represents a recommendation with confidence"""
-    pass
+
+# Static text of each rule's recommendation, keyed by rule ID and stored once
+# per process. A fired rule keeps only its ID and the values its reason
+# mentions; 'reason' is a str.format template over those values.
+RECOMMENDATION_TEMPLATES = {
+    # SLEEP RULES
+    "R1_CRITICAL_SLEEP_DEFICIT": {
+        'activity': "Rest Priority",
+        'description': "Take a 30-90 minute rest/nap before studying",
+        'confidence': 90,
+        'reason': ("Critical sleep deficit detected ({sleep}h). Research shows severe "
+                   "cognitive impairment below 5 hours. Rest will improve study efficiency "
+                   "even with deadline pressure."),
+        'priority': 1,
+        'duration': "30-90 minutes",
+        'category': "rest",
+        'rule_fired': "R1_CRITICAL_SLEEP_DEFICIT",
+    },
+    "R2_MODERATE_SLEEP_DEFICIT": {
+        'activity': "Short Rest",
+        'description': "Take a 30-60 minute rest before demanding tasks",
+        'confidence': 75,
+        'reason': ("Moderate sleep deficit ({sleep}h) with low energy. "
+                   "Short rest can help recover cognitive capacity."),
+        'priority': 2,
+        'duration': "30-60 minutes",
+        'category': "rest",
+        'rule_fired': "R2_MODERATE_SLEEP_DEFICIT",
+    },
+    "R3_POWER_NAP": {
+        'activity': "Power Nap",
+        'description': "Take a 20-30 minute power nap",
+        'confidence': 85,
+        'reason': ("Sleep deficit with afternoon timing (current time: {time}:00). "
+                   "Short naps improve alertness for 2-3 hours without disrupting night sleep."),
+        'priority': 1,
+        'duration': "20-30 minutes",
+        'category': "rest",
+        'rule_fired': "R3_POWER_NAP",
+    },
+    "R4_ADEQUATE_SLEEP": {
+        'activity': "Challenging Study",
+        'description': "Tackle your most difficult subjects/topics now",
+        'confidence': 85,
+        'reason': ("Well-rested state ({sleep}h sleep) with good energy. "
+                   "Optimal conditions for cognitively demanding tasks."),
+        'priority': 1,
+        'duration': "60-90 minutes",
+        'category': "study",
+        'rule_fired': "R4_ADEQUATE_SLEEP",
+    },
+    # STUDY DURATION & BREAKS
+    "R5_MANDATORY_BREAK": {
+        'activity': "Mandatory Break",
+        'description': "Take a 15-30 minute break immediately",
+        'confidence': 80,
+        'reason': ("You've studied {hours} hours today without a substantial break. "
+                   "Attention and cognitive performance decline after 4 hours continuous work."),
+        'priority': 1,
+        'duration': "15-30 minutes",
+        'category': "break",
+        'rule_fired': "R5_MANDATORY_BREAK",
+    },
+    "R15_HIGH_STRESS": {
+        'activity': "Stress Reduction",
+        'description': "Stop studying and do a stress-reduction activity",
+        'confidence': 80,
+        'reason': ("Very high study hours ({hours}h) combined with high stress. "
+                   "Continuing will be counterproductive. Take a real break."),
+        'priority': 1,
+        'duration': "30-60 minutes",
+        'category': "wellness",
+        'rule_fired': "R15_HIGH_STRESS",
+    },
+    "R7_ANTI_CRAMMING": {
+        'activity': "Distributed Practice",
+        'description': "Break your study into multiple shorter sessions over time",
+        'confidence': 90,
+        'reason': ("Cramming (massed practice) is significantly less effective than "
+                   "distributed practice. Plan to study in spaced intervals."),
+        'priority': 2,
+        'duration': "Multiple sessions",
+        'category': "study_strategy",
+        'rule_fired': "R7_ANTI_CRAMMING",
+    },
+    # TIME OF DAY
+    "R9_MORNING_PEAK": {
+        'activity': "Challenging Study",
+        'description': "Focus on your most difficult subjects during morning hours",
+        'confidence': 75,
+        'reason': ("Morning time ({time}:00) with adequate rest and energy. "
+                   "Most people show peak cognitive performance in late morning."),
+        'priority': 1,
+        'duration': "90-120 minutes",
+        'category': "study",
+        'rule_fired': "R9_MORNING_PEAK",
+    },
+    "R11_EVENING_STOP": {
+        'activity': "Prepare for Sleep",
+        'description': "Stop studying and prepare for bed",
+        'confidence': 80,
+        'reason': ("Late evening ({time}:00) with existing sleep debt ({sleep}h previous night). "
+                   "Sleep should be prioritized over late-night studying."),
+        'priority': 1,
+        'duration': "Begin sleep routine",
+        'category': "rest",
+        'rule_fired': "R11_EVENING_STOP",
+    },
+    # ENERGY & COGNITIVE LOAD
+    "R12_ENERGY_TASK_MISMATCH": {
+        'activity': "Rest or Switch Task",
+        'description': "Either rest, or switch to simpler tasks (review notes, organize)",
+        'confidence': 85,
+        'reason': ("Very low energy with high complexity task. Cognitive load theory "
+                   "indicates this will be ineffective. Rest or simplify tasks."),
+        'priority': 1,
+        'duration': "20-30 min rest OR switch tasks",
+        'category': "rest",
+        'rule_fired': "R12_ENERGY_TASK_MISMATCH",
+    },
+    "R14_HIGH_ENERGY_USE": {
+        'activity': "Tackle Hardest Tasks",
+        'description': "Use this high-energy state for your most challenging work",
+        'confidence': 80,
+        'reason': ("High energy with good sleep. Cognitive resources are at peak. "
+                   "Tackle the most demanding tasks before resources deplete."),
+        'priority': 1,
+        'duration': "90-120 minutes",
+        'category': "study",
+        'rule_fired': "R14_HIGH_ENERGY_USE",
+    },
+    # STRESS & MENTAL HEALTH
+    "R16_SOCIAL_ISOLATION": {
+        'activity': "Social Activity",
+        'description': "Connect with friends - study group, meal together, or casual hangout",
+        'confidence': 75,
+        'reason': ("You haven't had social interaction in {days} days with elevated stress. "
+                   "Social connection buffers stress and improves well-being."),
+        'priority': 2,
+        'duration': "1-2 hours",
+        'category': "social",
+        'rule_fired': "R16_SOCIAL_ISOLATION",
+    },
+    # PHYSICAL ACTIVITY
+    "R18_EXERCISE_BOOST": {
+        'activity': "Light Exercise",
+        'description': "Take a 10-20 minute walk or do light stretching",
+        'confidence': 80,
+        'reason': ("Low energy but adequate sleep with {sed}h sedentary time. "
+                   "Light physical activity can boost alertness and focus."),
+        'priority': 2,
+        'duration': "10-20 minutes",
+        'category': "exercise",
+        'rule_fired': "R18_EXERCISE_BOOST",
+    },
+    # DEADLINE MANAGEMENT
+    "R20_URGENT_GOOD_STATE": {
+        'activity': "Focused Study Session",
+        'description': "Use Pomodoro technique: 25 min focused work + 5 min breaks",
+        'confidence': 80,
+        'reason': ("Urgent deadline with adequate rest and energy. "
+                   "You're in good condition for productive focused work."),
+        'priority': 1,
+        'duration': "Multiple 25-min sessions",
+        'category': "study",
+        'rule_fired': "R20_URGENT_GOOD_STATE",
+    },
+    "R21_URGENT_POOR_STATE": {
+        'activity': "Strategic Rest Then Study",
+        'description': "Take 20-30 min power nap, THEN study",
+        'confidence': 75,
+        'reason': ("Urgent deadline but severe sleep deficit ({sleep}h). "
+                   "Even with time pressure, short rest will improve efficiency more than tired studying."),
+        'priority': 1,
+        'duration': "20-30 min nap + focused study",
+        'category': "rest",
+        'rule_fired': "R21_URGENT_POOR_STATE",
+    },
+    # TASK VARIETY
+    "R24_ACTIVE_LEARNING": {
+        'activity': "Active Learning",
+        'description': "Switch to active learning: practice problems, teach concept, or write summary",
+        'confidence': 85,
+        'reason': ("You've done {hours}h of passive learning (reading/watching). "
+                   "Research shows active learning is significantly more effective."),
+        'priority': 2,
+        'duration': "30-60 minutes",
+        'category': "study_strategy",
+        'rule_fired': "R24_ACTIVE_LEARNING",
+    },
+}
+
+
+class FiredRule:
+    """
+    A recommendation as the engine keeps it: the rule ID and the values
+    (sleep, hours, time, days, sed) its reason mentions. The texts come from
+    RECOMMENDATION_TEMPLATES when it is turned into a dict.
+    """
+    __slots__ = ('rule_id', 'values')
+
+    def __init__(self, rule_id, values):
+        self.rule_id = rule_id
+        self.values = values
+
+    def sort_key(self):
+        """Same ordering as sort_recommendations"""
+        return _SORT_KEYS[self.rule_id]
+
+    def reason(self):
+        """The reason text, rendered on each call"""
+        template = RECOMMENDATION_TEMPLATES[self.rule_id]['reason']
+        return template.format(**self.values) if self.values else template
+
+    def to_dict(self):
+        """A recommendation dict with the RECOMMENDATION_FIELDS"""
+        recommendation = dict(RECOMMENDATION_TEMPLATES[self.rule_id])
+        recommendation['reason'] = self.reason()
+        return recommendation
+
+    def __repr__(self):
+        return f"FiredRule({self.rule_id!r}, {self.values!r})"
+
+
+def render_recommendations(fired):
+    """Sort FiredRule records like sort_recommendations and render them as dicts"""
+    return [record.to_dict() for record in sorted(fired, key=FiredRule.sort_key)]
+
+
+def rule_id(identifier):
+    """Tag a rule's right-hand side with the ID of the recommendation it makes"""
+    def tag(function):
+        function.rule_id = identifier
+        return function
+    return tag
+
 
 # Main Expert System
 class ActivityAdvisorES(KnowledgeEngine):
@@ -22,6 +274,14 @@ class ActivityAdvisorES(KnowledgeEngine):
     def __init__(self):
         super().__init__()
         self.recommendations = []
+    
+    def reset(self, **kwargs):
+        super().reset(**kwargs)
+        self.recommendations = []
+    
+    def recommend(self, rule_id, **values):
+        """Record a fired rule; `values` fill in its reason when it is displayed"""
+        self.recommendations.append(FiredRule(rule_id, values))
         
     @DefFacts()
     def initial_facts(self):
@@ -35,45 +295,26 @@ class ActivityAdvisorES(KnowledgeEngine):
         TEST(lambda sleep: sleep < 5),
         StudentState(deadline_urgency=MATCH.deadline)
     )
+    @rule_id("R1_CRITICAL_SLEEP_DEFICIT")
     def critical_sleep_deficit(self, sleep, deadline):
         """
         Rule 1: Critical Sleep Deficit
         Source: Pilcher & Huffcutt (1996), Curcio et al. (2006)
         """
-        self.declare(Recommendation(
-            activity="Rest Priority",
-            description=f"Take a 30-90 minute rest/nap before studying",
-            confidence=90,
-            reason=f"Critical sleep deficit detected ({sleep}h). Research shows severe "
-                   f"cognitive impairment below 5 hours. Rest will improve study efficiency "
-                   f"even with deadline pressure.",
-            priority=1,
-            duration="30-90 minutes",
-            category="rest",
-            rule_fired="R1_CRITICAL_SLEEP_DEFICIT"
-        ))
+        self.recommend("R1_CRITICAL_SLEEP_DEFICIT", sleep=sleep)
     
     @Rule(
         StudentState(sleep_hours=MATCH.sleep),
         TEST(lambda sleep: 5 <= sleep < 6.5),
         StudentState(energy_level=L("Low") | L("Very Low"))
     )
+    @rule_id("R2_MODERATE_SLEEP_DEFICIT")
     def moderate_sleep_deficit(self, sleep):
         """
         Rule 2: Moderate Sleep Deficit
         Source: Lim & Dinges (2010)
         """
-        self.declare(Recommendation(
-            activity="Short Rest",
-            description="Take a 30-60 minute rest before demanding tasks",
-            confidence=75,
-            reason=f"Moderate sleep deficit ({sleep}h) with low energy. "
-                   f"Short rest can help recover cognitive capacity.",
-            priority=2,
-            duration="30-60 minutes",
-            category="rest",
-            rule_fired="R2_MODERATE_SLEEP_DEFICIT"
-        ))
+        self.recommend("R2_MODERATE_SLEEP_DEFICIT", sleep=sleep)
     
     @Rule(
         StudentState(sleep_hours=MATCH.sleep),
@@ -81,44 +322,26 @@ class ActivityAdvisorES(KnowledgeEngine):
         StudentState(current_time=MATCH.time),
         TEST(lambda time: 13 <= time < 16)
     )
+    @rule_id("R3_POWER_NAP")
     def power_nap_recommendation(self, sleep, time):
         """
         Rule 3: Power Nap Effectiveness
         Source: Mednick et al. (2003)
         """
-        self.declare(Recommendation(
-            activity="Power Nap",
-            description="Take a 20-30 minute power nap",
-            confidence=85,
-            reason=f"Sleep deficit with afternoon timing (current time: {time}:00). "
-                   f"Short naps improve alertness for 2-3 hours without disrupting night sleep.",
-            priority=1,
-            duration="20-30 minutes",
-            category="rest",
-            rule_fired="R3_POWER_NAP"
-        ))
+        self.recommend("R3_POWER_NAP", time=time)
     
     @Rule(
         StudentState(sleep_hours=MATCH.sleep),
         TEST(lambda sleep: sleep >= 7),
         StudentState(energy_level=L("High") | L("Moderate"))
     )
+    @rule_id("R4_ADEQUATE_SLEEP")
     def adequate_sleep_state(self, sleep):
         """
         Rule 4: Adequate Sleep - Optimal for Challenging Tasks
         Source: National Sleep Foundation (2015)
         """
-        self.declare(Recommendation(
-            activity="Challenging Study",
-            description="Tackle your most difficult subjects/topics now",
-            confidence=85,
-            reason=f"Well-rested state ({sleep}h sleep) with good energy. "
-                   f"Optimal conditions for cognitively demanding tasks.",
-            priority=1,
-            duration="60-90 minutes",
-            category="study",
-            rule_fired="R4_ADEQUATE_SLEEP"
-        ))
+        self.recommend("R4_ADEQUATE_SLEEP", sleep=sleep)
     
     # ==================== CATEGORY 2: STUDY DURATION & BREAKS ====================
     
@@ -127,64 +350,37 @@ class ActivityAdvisorES(KnowledgeEngine):
         TEST(lambda hours: hours >= 4),
         StudentState(break_taken=False)
     )
+    @rule_id("R5_MANDATORY_BREAK")
     def mandatory_break_rule(self, hours):
         """
         Rule 5: Maximum Continuous Study
         Source: Ariga & Lleras (2011), Ericsson et al. (1993)
         """
-        self.declare(Recommendation(
-            activity="Mandatory Break",
-            description="Take a 15-30 minute break immediately",
-            confidence=80,
-            reason=f"You've studied {hours} hours today without a substantial break. "
-                   f"Attention and cognitive performance decline after 4 hours continuous work.",
-            priority=1,
-            duration="15-30 minutes",
-            category="break",
-            rule_fired="R5_MANDATORY_BREAK"
-        ))
+        self.recommend("R5_MANDATORY_BREAK", hours=hours)
     
     @Rule(
         StudentState(study_hours_today=MATCH.hours),
         TEST(lambda hours: hours > 6),
         StudentState(stress_level=L("High") | L("Very High"))
     )
+    @rule_id("R15_HIGH_STRESS")
     def study_overload_detection(self, hours):
         """
         Rule 15: High Stress with Excessive Study
         Source: Schneiderman et al. (2005)
         """
-        self.declare(Recommendation(
-            activity="Stress Reduction",
-            description="Stop studying and do a stress-reduction activity",
-            confidence=80,
-            reason=f"Very high study hours ({hours}h) combined with high stress. "
-                   f"Continuing will be counterproductive. Take a real break.",
-            priority=1,
-            duration="30-60 minutes",
-            category="wellness",
-            rule_fired="R15_HIGH_STRESS"
-        ))
+        self.recommend("R15_HIGH_STRESS", hours=hours)
     
     @Rule(
         StudentState(cramming=True)
     )
+    @rule_id("R7_ANTI_CRAMMING")
     def anti_cramming_rule(self):
         """
         Rule 7: Discourage Cramming
         Source: Cepeda et al. (2006), Kelley & Whatson (2013)
         """
-        self.declare(Recommendation(
-            activity="Distributed Practice",
-            description="Break your study into multiple shorter sessions over time",
-            confidence=90,
-            reason="Cramming (massed practice) is significantly less effective than "
-                   "distributed practice. Plan to study in spaced intervals.",
-            priority=2,
-            duration="Multiple sessions",
-            category="study_strategy",
-            rule_fired="R7_ANTI_CRAMMING"
-        ))
+        self.recommend("R7_ANTI_CRAMMING")
     
     # ==================== CATEGORY 3: TIME OF DAY ====================
     
@@ -195,22 +391,13 @@ class ActivityAdvisorES(KnowledgeEngine):
         StudentState(sleep_hours=MATCH.sleep),
         TEST(lambda sleep: sleep >= 6)
     )
+    @rule_id("R9_MORNING_PEAK")
     def morning_peak_rule(self, time):
         """
         Rule 9: Morning Cognitive Peak
         Source: Schmidt et al. (2007)
         """
-        self.declare(Recommendation(
-            activity="Challenging Study",
-            description="Focus on your most difficult subjects during morning hours",
-            confidence=75,
-            reason=f"Morning time ({time}:00) with adequate rest and energy. "
-                   f"Most people show peak cognitive performance in late morning.",
-            priority=1,
-            duration="90-120 minutes",
-            category="study",
-            rule_fired="R9_MORNING_PEAK"
-        ))
+        self.recommend("R9_MORNING_PEAK", time=time)
     
     @Rule(
         StudentState(current_time=MATCH.time),
@@ -218,22 +405,13 @@ class ActivityAdvisorES(KnowledgeEngine):
         StudentState(sleep_hours=MATCH.sleep),
         TEST(lambda sleep: sleep < 7)
     )
+    @rule_id("R11_EVENING_STOP")
     def late_evening_stop_rule(self, time, sleep):
         """
         Rule 11: Evening Study Caution
         Source: Czeisler et al. (1999), NSF guidelines
         """
-        self.declare(Recommendation(
-            activity="Prepare for Sleep",
-            description="Stop studying and prepare for bed",
-            confidence=80,
-            reason=f"Late evening ({time}:00) with existing sleep debt ({sleep}h previous night). "
-                   f"Sleep should be prioritized over late-night studying.",
-            priority=1,
-            duration="Begin sleep routine",
-            category="rest",
-            rule_fired="R11_EVENING_STOP"
-        ))
+        self.recommend("R11_EVENING_STOP", time=time, sleep=sleep)
     
     # ==================== CATEGORY 4: ENERGY & COGNITIVE LOAD ====================
     
@@ -241,44 +419,26 @@ class ActivityAdvisorES(KnowledgeEngine):
         StudentState(energy_level="Very Low"),
         StudentState(task_complexity="High")
     )
+    @rule_id("R12_ENERGY_TASK_MISMATCH")
     def low_energy_complex_task_rule(self):
         """
         Rule 12: Low Energy + Complex Task Mismatch
         Source: Sweller (1988), Kahneman (2011)
         """
-        self.declare(Recommendation(
-            activity="Rest or Switch Task",
-            description="Either rest, or switch to simpler tasks (review notes, organize)",
-            confidence=85,
-            reason="Very low energy with high complexity task. Cognitive load theory "
-                   "indicates this will be ineffective. Rest or simplify tasks.",
-            priority=1,
-            duration="20-30 min rest OR switch tasks",
-            category="rest",
-            rule_fired="R12_ENERGY_TASK_MISMATCH"
-        ))
+        self.recommend("R12_ENERGY_TASK_MISMATCH")
     
     @Rule(
         StudentState(energy_level="High"),
         StudentState(sleep_hours=MATCH.sleep),
         TEST(lambda sleep: sleep >= 7)
     )
+    @rule_id("R14_HIGH_ENERGY_USE")
     def high_energy_utilization_rule(self):
         """
         Rule 14: High Energy Utilization
         Source: Baumeister et al. (1998)
         """
-        self.declare(Recommendation(
-            activity="Tackle Hardest Tasks",
-            description="Use this high-energy state for your most challenging work",
-            confidence=80,
-            reason="High energy with good sleep. Cognitive resources are at peak. "
-                   "Tackle the most demanding tasks before resources deplete.",
-            priority=1,
-            duration="90-120 minutes",
-            category="study",
-            rule_fired="R14_HIGH_ENERGY_USE"
-        ))
+        self.recommend("R14_HIGH_ENERGY_USE")
     
     # ==================== CATEGORY 5: STRESS & MENTAL HEALTH ====================
     
@@ -287,22 +447,13 @@ class ActivityAdvisorES(KnowledgeEngine):
         TEST(lambda days: days > 3),
         StudentState(stress_level=L("Moderate") | L("High") | L("Very High"))
     )
+    @rule_id("R16_SOCIAL_ISOLATION")
     def social_isolation_rule(self, days):
         """
         Rule 16: Social Isolation Red Flag
         Source: Cacioppo & Patrick (2008)
         """
-        self.declare(Recommendation(
-            activity="Social Activity",
-            description="Connect with friends - study group, meal together, or casual hangout",
-            confidence=75,
-            reason=f"You haven't had social interaction in {days} days with elevated stress. "
-                   f"Social connection buffers stress and improves well-being.",
-            priority=2,
-            duration="1-2 hours",
-            category="social",
-            rule_fired="R16_SOCIAL_ISOLATION"
-        ))
+        self.recommend("R16_SOCIAL_ISOLATION", days=days)
     
     # ==================== CATEGORY 6: PHYSICAL ACTIVITY ====================
     
@@ -313,22 +464,13 @@ class ActivityAdvisorES(KnowledgeEngine):
         StudentState(sedentary_hours=MATCH.sed),
         TEST(lambda sed: sed > 4)
     )
+    @rule_id("R18_EXERCISE_BOOST")
     def exercise_for_energy_rule(self, sed):
         """
         Rule 18: Exercise for Focus
         Source: Hillman et al. (2008)
         """
-        self.declare(Recommendation(
-            activity="Light Exercise",
-            description="Take a 10-20 minute walk or do light stretching",
-            confidence=80,
-            reason=f"Low energy but adequate sleep with {sed}h sedentary time. "
-                   f"Light physical activity can boost alertness and focus.",
-            priority=2,
-            duration="10-20 minutes",
-            category="exercise",
-            rule_fired="R18_EXERCISE_BOOST"
-        ))
+        self.recommend("R18_EXERCISE_BOOST", sed=sed)
     
     # ==================== CATEGORY 7: DEADLINE MANAGEMENT ====================
     
@@ -338,44 +480,26 @@ class ActivityAdvisorES(KnowledgeEngine):
         TEST(lambda sleep: sleep >= 6),
         StudentState(energy_level=L("Moderate") | L("High"))
     )
+    @rule_id("R20_URGENT_GOOD_STATE")
     def urgent_deadline_good_state_rule(self):
         """
         Rule 20: Urgent Deadline + Good State
         Source: Steel (2007), Cirillo (2006)
         """
-        self.declare(Recommendation(
-            activity="Focused Study Session",
-            description="Use Pomodoro technique: 25 min focused work + 5 min breaks",
-            confidence=80,
-            reason="Urgent deadline with adequate rest and energy. "
-                   "You're in good condition for productive focused work.",
-            priority=1,
-            duration="Multiple 25-min sessions",
-            category="study",
-            rule_fired="R20_URGENT_GOOD_STATE"
-        ))
+        self.recommend("R20_URGENT_GOOD_STATE")
     
     @Rule(
         StudentState(deadline_urgency="Urgent"),  # Within 24h
         StudentState(sleep_hours=MATCH.sleep),
         TEST(lambda sleep: sleep < 5)
     )
+    @rule_id("R21_URGENT_POOR_STATE")
     def urgent_deadline_poor_state_rule(self, sleep):
         """
         Rule 21: Urgent Deadline + Poor State
         Source: Pilcher & Huffcutt (1996), Mednick et al. (2003)
         """
-        self.declare(Recommendation(
-            activity="Strategic Rest Then Study",
-            description="Take 20-30 min power nap, THEN study",
-            confidence=75,
-            reason=f"Urgent deadline but severe sleep deficit ({sleep}h). "
-                   f"Even with time pressure, short rest will improve efficiency more than tired studying.",
-            priority=1,
-            duration="20-30 min nap + focused study",
-            category="rest",
-            rule_fired="R21_URGENT_POOR_STATE"
-        ))
+        self.recommend("R21_URGENT_POOR_STATE", sleep=sleep)
     
     # ==================== CATEGORY 8: TASK VARIETY ====================
     
@@ -383,68 +507,337 @@ class ActivityAdvisorES(KnowledgeEngine):
         StudentState(passive_learning_hours=MATCH.hours),
         TEST(lambda hours: hours > 2)
     )
+    @rule_id("R24_ACTIVE_LEARNING")
     def active_learning_rule(self, hours):
         """
         Rule 24: Active vs Passive Learning
         Source: Freeman et al. (2014), Chi & Wylie (2014)
         """
-        self.declare(Recommendation(
-            activity="Active Learning",
-            description="Switch to active learning: practice problems, teach concept, or write summary",
-            confidence=85,
-            reason=f"You've done {hours}h of passive learning (reading/watching). "
-                   f"Research shows active learning is significantly more effective.",
-            priority=2,
-            duration="30-60 minutes",
-            category="study_strategy",
-            rule_fired="R24_ACTIVE_LEARNING"
-        ))
+        self.recommend("R24_ACTIVE_LEARNING", hours=hours)
     
     # ==================== GET RECOMMENDATIONS ====================
     
     def get_recommendations(self):
-        """Extract all recommendations sorted by priority and confidence"""
-        recommendations = []
-        for fact in self.facts.values():
-            if isinstance(fact, Recommendation):
-                recommendations.append({
-                    'activity': fact.get('activity'),
-                    'description': fact.get('description'),
-                    'confidence': fact.get('confidence'),
-                    'reason': fact.get('reason'),
-                    'priority': fact.get('priority'),
-                    'duration': fact.get('duration'),
-                    'category': fact.get('category'),
-                    'rule_fired': fact.get('rule_fired')
-                })
+        """All recommendations as dicts, sorted by priority and confidence"""
+        return render_recommendations(self.recommendations)
+    
+    # ==================== INSTRUMENTATION ====================
+    
+    _rule_ids = None
+    
+    @classmethod
+    def rule_ids(cls):
+        """Rule method name -> the ID given to it with @rule_id"""
+        if cls._rule_ids is None:
+            cls._rule_ids = {
+                name: getattr(member._wrapped, 'rule_id', name)
+                for klass in reversed(cls.__mro__)
+                for name, member in vars(klass).items()
+                if isinstance(member, Rule)
+            }
+        return cls._rule_ids
+    
+    def run_instrumented(self):
+        """
+        Same as run(), timing each right-hand side.
+        Returns (rule ID, seconds) per firing, in firing order.
+        """
+        rule_ids = self.rule_ids()
+        firings = []
+        self.running = True
+        while self.running:
+            added, removed = self.get_activations()
+            self.strategy.update_agenda(self.agenda, added, removed)
+            activation = self.agenda.get_next()
+            if activation is None:
+                break
+            context = {k: v for k, v in activation.context.items() if not k.startswith('__')}
+            start = time.perf_counter()
+            activation.rule(self, **context)
+            name = activation.rule._wrapped.__name__
+            firings.append((rule_ids.get(name, name), time.perf_counter() - start))
+        self.running = False
+        return firings
+    
+    def partial_matches(self):
+        """
+        Rule ID -> tokens currently held in the memories of the join nodes
+        leading to that rule (a node shared by several rules counts for each)
+        """
+        if getattr(self, '_join_paths', None) is None:
+            # The network is fixed once built, so the paths are found once per engine
+            paths = {}
+            rule_ids = self.rule_ids()
+            
+            def walk(node, joins):
+                if isinstance(node, ConflictSetNode):
+                    name = node.rule._wrapped.__name__
+                    paths.setdefault(rule_ids.get(name, name), set()).update(joins)
+                    return
+                if hasattr(node, 'left_memory'):
+                    joins = joins + (node,)
+                for child in node.children:
+                    walk(child.node, joins)
+            
+            walk(self.matcher.root_node, ())
+            self._join_paths = paths
         
-        # Sort by priority (lower number = higher priority), then by confidence
-        recommendations.sort(key=lambda x: (x['priority'], -x['confidence']))
-        
-        return recommendations
+        return {
+            rule_id: sum(len(node.left_memory) + len(node.right_memory) for node in joins)
+            for rule_id, joins in self._join_paths.items()
+        }
+
 
+def rule_number(rule_id):
+    """Numeric part of a rule ID, e.g. 'R15_HIGH_STRESS' -> 15"""
+    return int(rule_id.split('_', 1)[0][1:])
 
-def run_expert_system(user_inputs):
+
+# (priority, -confidence, rule number) of each rule, for FiredRule.sort_key
+_SORT_KEYS = {
+    rule_id: (template['priority'], -template['confidence'], rule_number(rule_id))
+    for rule_id, template in RECOMMENDATION_TEMPLATES.items()
+}
+
+
+def sort_recommendations(recommendations):
+    """
+    Sort recommendations in place by priority (lower number = higher priority),
+    then by confidence, then by rule number.
+
+    The rule number only breaks ties: the order in which experta fires
+    equally ranked rules depends on hash seeds, so without it the ranking
+    could differ between processes.
+    """
+    recommendations.sort(key=lambda x: (x['priority'], -x['confidence'],
+                                        rule_number(x['rule_fired'])))
+    return recommendations
+
+
+class EnginePool:
+    """
+    Thread-safe pool of warm ActivityAdvisorES engines.
+
+    Building an engine compiles the Rete network, which costs far more than
+    an evaluation, so engines are reset and reused instead. Each checked-out
+    engine is reset first, so no facts or recommendations carry over
+    between requests.
+    """
+
+    def __init__(self, size=4, factory=ActivityAdvisorES):
+        self.size = size
+        self.factory = factory
+        self._idle = []
+        self._created = 0
+        # Guards _idle and _created; waiters are woken whenever an engine is
+        # released or a slot frees up because an engine was discarded
+        self._available = threading.Condition()
+
+    @property
+    def created(self):
+        """Number of engines built so far (idle or checked out)"""
+        return self._created
+
+    def warm(self, count=None):
+        """Build engines up front so the first requests skip construction"""
+        count = self.size if count is None else min(count, self.size)
+        while True:
+            with self._available:
+                if self._created >= count:
+                    return
+                self._created += 1
+            try:
+                engine = self.factory()
+            except BaseException:
+                self.discard(None)
+                raise
+            self.release(engine)
+
+    def acquire(self, timeout=None):
+        """
+        Check out a freshly reset engine, blocking while all are in use.
+        Raises queue.Empty if none is free within timeout seconds.
+        """
+        with self._available:
+            if not self._available.wait_for(
+                    lambda: self._idle or self._created < self.size, timeout):
+                raise queue.Empty
+            if self._idle:
+                engine = self._idle.pop()
+            else:
+                self._created += 1
+                engine = None
+
+        try:
+            if engine is None:
+                engine = self.factory()
+            engine.reset()
+        except BaseException:
+            self.discard(engine)
+            raise
+        return engine
+
+    def release(self, engine):
+        """Return an engine to the pool"""
+        with self._available:
+            self._idle.append(engine)
+            self._available.notify()
+
+    def discard(self, engine):
+        """Drop an engine that may be in a broken state, freeing its slot"""
+        with self._available:
+            self._created -= 1
+            self._available.notify()
+
+    @contextmanager
+    def engine(self, timeout=None):
+        engine = self.acquire(timeout)
+        try:
+            yield engine
+        except BaseException:
+            self.discard(engine)
+            raise
+        else:
+            self.release(engine)
+
+
+# Evaluation engine used by run_expert_system: "experta", "compiled" or "table"
+ENGINE_MODE = os.environ.get("ADVISOR_ENGINE_MODE", "experta")
+
+engine_pool = EnginePool(
+    size=int(os.environ.get("ADVISOR_ENGINE_POOL_SIZE", os.cpu_count() or 4)))
+
+
+def warm_up(mode=None):
+    """
+    Prepare what run_expert_system needs in `mode` (defaults to ENGINE_MODE)
+    so the first request does not pay for it: the pooled engines, the
+    compiled rules or the decision table
+    """
+    mode = mode or ENGINE_MODE
+    if mode == "compiled":
+        from compiled_engine import get_compiled_advisor
+        get_compiled_advisor()
+    elif mode == "table":
+        from decision_table import get_decision_table
+        get_decision_table()
+    else:
+        engine_pool.warm()
+
+
+def run_expert_system(user_inputs, mode=None):
     """
     Run the expert system with user inputs
     
     Args:
         user_inputs: Dictionary containing student state information
+        mode: "experta" to run the Rete engine, "compiled" to use the
+              compiled rule evaluator, "table" to look up the precomputed
+              decision table (defaults to ENGINE_MODE)
     
     Returns:
-        List of recommendations sorted by priority
+        List of recommendations sorted by priority, and None in every mode
+        (experta engines go back to engine_pool, the compiled advisor and
+        decision table are shared)
+    """
+    mode = mode or ENGINE_MODE
+    
+    if profiling.engine_calls_armed and profiling.take_engine_call():
+        return profiling.profile_call(f"engine-{mode}", run_expert_system, user_inputs, mode)
+    
+    if mode == "compiled":
+        from compiled_engine import get_compiled_advisor
+        advisor = get_compiled_advisor()
+        with tracing.span("engine.run", mode=mode):
+            return advisor.get_recommendations(user_inputs), None
+    elif mode == "table":
+        from decision_table import get_decision_table
+        table = get_decision_table()
+        with tracing.span("engine.run", mode=mode):
+            return table.get_recommendations(user_inputs), None
+    elif mode != "experta":
+        raise ValueError(f"Unknown engine mode: {mode}")
+    
+    if rule_metrics.ENABLED:
+        return _run_instrumented(user_inputs), None
+    
+    # Check out a warm engine (already reset)
+    with tracing.span("engine.reset", mode=mode):
+        engine = engine_pool.acquire()
+    try:
+        with tracing.span("engine.run", mode=mode):
+            # Declare the student state facts
+            engine.declare(StudentState(**user_inputs))
+            
+            # Run the inference engine
+            engine.run()
+        
+        # Get recommendations
+        with tracing.span("engine.sort"):
+            recommendations = engine.get_recommendations()
+    except BaseException:
+        engine_pool.discard(engine)
+        raise
+    engine_pool.release(engine)
+    
+    return recommendations, None
+
+
+def _run_instrumented(user_inputs):
+    """run_expert_system's experta path, recording into rule_metrics.metrics"""
+    start = time.perf_counter()
+    with engine_pool.engine() as engine:
+        reset = time.perf_counter()
+        engine.declare(StudentState(**user_inputs))
+        declared = time.perf_counter()
+        firings = engine.run_instrumented()
+        ran = time.perf_counter()
+        recommendations = engine.get_recommendations()
+        done = time.perf_counter()
+        partial_matches = engine.partial_matches()
+    
+    rule_metrics.metrics.record(
+        {'reset': reset - start, 'declare': declared - reset,
+         'run': ran - declared, 'get_recommendations': done - ran},
+        firings, partial_matches)
+    return recommendations
+
+
+def run_expert_system_batch(user_inputs):
     """
-    # Create and reset the engine
-    engine = ActivityAdvisorES()
-    engine.reset()
+    Run the expert system over a whole cohort at once
     
-    # Declare the student state facts
-    engine.declare(StudentState(**user_inputs))
+    Args:
+        user_inputs: list of dicts, pandas DataFrame or dict of NumPy arrays
+                     with the same fields as run_expert_system takes
     
-    # Run the inference engine
-    engine.run()
+    Returns:
+        One recommendation list per student, in input order
+    """
+    from batch_engine import run_expert_system_batch as evaluate_batch
+    return evaluate_batch(user_inputs)
+
+
+def run_expert_system_parallel(user_inputs, workers=None, chunk_size=None, mode=None):
+    """
+    Run the expert system over a cohort in a pool of worker processes
     
-    # Get recommendations
-    recommendations = engine.get_recommendations()
+    Args:
+        user_inputs: iterable of dicts, as run_expert_system takes
+        workers: worker processes (defaults to one per core)
+        chunk_size: students per task (defaults to about four chunks per worker)
+        mode: engine mode used by each worker (defaults to ENGINE_MODE)
     
-    return recommendations, engine
\ No newline at end of file
+    Returns:
+        One recommendation list per student, in input order
+    """
+    from parallel_engine import run_expert_system_parallel as evaluate_parallel
+    return evaluate_parallel(user_inputs, workers, chunk_size, mode)
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) > 1 and sys.argv[1] == "batch":
+        from batch_cli import main
+        main(sys.argv[2:])
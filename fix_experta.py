@@ -1,15 +1,26 @@
 """
 Compatibility patch for experta with Python 3.10+
 Fixes the collections.Mapping AttributeError
+
+Importing this module applies the patch. It is silent, adds only the aliases
+the running Python lacks, and is imported by the modules that import experta
+themselves (expert_system, compiled_engine), so it runs when experta is
+first needed rather than at app startup.
 """
 
-import sys
 import collections
 import collections.abc
 
-# Fix for Python 3.10+ where collections.Mapping was moved to collections.abc
-for type_name in ['Mapping', 'MutableMapping', 'Iterable', 'MutableSet', 'Callable']:
-    if not hasattr(collections, type_name):
-        setattr(collections, type_name, getattr(collections.abc, type_name))
+# ABCs experta still looks up on collections; they moved to collections.abc in 3.10
+MOVED_ABCS = ('Mapping', 'MutableMapping', 'Iterable', 'MutableSet', 'Callable')
+
+
+def apply():
+    """Alias the moved ABCs on collections; returns the names that were missing"""
+    missing = [name for name in MOVED_ABCS if not hasattr(collections, name)]
+    for name in missing:
+        setattr(collections, name, getattr(collections.abc, name))
+    return missing
+
 
-print("✓ Experta compatibility patch applied")
\ No newline at end of file
+apply()
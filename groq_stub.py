@@ -0,0 +1,194 @@
+"""
+Local stub of the Groq chat completions API
+Serves canned extraction replies with configurable latency so the parser
+can be benchmarked without network access or API quota
+"""
+import json
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Reply used when no response is configured: the prompt's default values
+DEFAULT_EXTRACTION = {
+    "sleep_hours": 7,
+    "energy_level": "Moderate",
+    "stress_level": "Moderate",
+    "study_hours_today": 2,
+    "deadline_urgency": "None",
+    "break_taken": False,
+    "task_complexity": "Medium",
+    "passive_learning_hours": 1,
+    "social_isolation_days": 1,
+    "sedentary_hours": 4,
+    "cramming": False,
+    "current_time": 14,
+}
+
+
+class _QuietServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients that hit a deadline hang up mid-reply; that is expected
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class StubGroqServer:
+    """
+    HTTP/1.1 server answering POST /openai/v1/chat/completions.
+
+    Use as a context manager; base_url can be passed to Groq(base_url=...).
+    Counts requests and TCP connections so connection reuse can be checked.
+    `errors` is a list of HTTP status codes (e.g. [429, 503]) returned, in
+    order, to the first requests before normal replies resume.
+    `token_delay` simulates generation: streamed replies (stream=True) send
+    one server-sent event per token at that pace, and plain replies wait
+    for the whole content to be "generated". tokens_sent counts streamed
+    tokens, so a client that stops reading early shows up.
+    """
+
+    def __init__(self, latency=0.0, content=None, errors=(), token_delay=0.0,
+                 host="127.0.0.1", port=0):
+        self.latency = latency
+        self.content = content if content is not None else json.dumps(DEFAULT_EXTRACTION)
+        self.errors = list(errors)
+        self.token_delay = token_delay
+        self.requests = 0
+        self.connections = 0
+        self.tokens_sent = 0
+        self._lock = threading.Lock()
+        self._server = _QuietServer((host, port), self._handler_class())
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def reply(self, payload):
+        """Content of the completion returned for a request payload"""
+        return self.content(payload) if callable(self.content) else self.content
+
+    def _next_error(self):
+        with self._lock:
+            return self.errors.pop(0) if self.errors else None
+
+    def _count(self, attribute):
+        with self._lock:
+            setattr(self, attribute, getattr(self, attribute) + 1)
+
+    def _handler_class(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def setup(self):
+                super().setup()
+                stub._count("connections")
+
+            def do_POST(self):
+                stub._count("requests")
+                length = int(self.headers.get("Content-Length", 0))
+                payload = json.loads(self.rfile.read(length) or b"{}")
+                if stub.latency:
+                    time.sleep(stub.latency)
+                status = stub._next_error()
+                if status is not None:
+                    self._send_json(status, {"error": {"message": f"stub error {status}"}},
+                                    {"Retry-After": "0"} if status == 429 else {})
+                    return
+                content = stub.reply(payload)
+                if payload.get("stream"):
+                    self._send_stream(payload.get("model", "stub"), content)
+                    return
+                time.sleep(stub.token_delay * len(tokenize(content)))
+                self._send_json(200, completion(payload.get("model", "stub"), content))
+
+            def _send_stream(self, model, content):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for token in tokenize(content):
+                    time.sleep(stub.token_delay)
+                    self._send_chunk(f"data: {json.dumps(chunk(model, token))}\n\n")
+                    stub._count("tokens_sent")
+                self._send_chunk(f"data: {json.dumps(chunk(model, None, 'stop'))}\n\n")
+                self._send_chunk("data: [DONE]\n\n")
+                self.wfile.write(b"0\r\n\r\n")
+
+            def _send_chunk(self, text):
+                data = text.encode()
+                self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                self.wfile.flush()
+
+            def _send_json(self, status, body, headers=None):
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def tokenize(content):
+    """Split content into roughly token-sized pieces"""
+    return re.findall(r"\s+|\w+|[^\w\s]", content)
+
+
+def chunk(model, content, finish_reason=None):
+    """OpenAI-style streamed chat completion chunk"""
+    return {
+        "id": "chatcmpl-stub",
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "delta": {"role": "assistant", "content": content},
+            "finish_reason": finish_reason,
+        }],
+    }
+
+
+def completion(model, content):
+    """OpenAI-style chat completion body"""
+    return {
+        "id": "chatcmpl-stub",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop",
+        }],
+        "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+    }
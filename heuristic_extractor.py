@@ -0,0 +1,320 @@
+"""
+Local heuristic extractor for student messages
+Applies the cues listed in the LLM extraction prompt ("exhausted" -> energy,
+"exam tomorrow" -> urgent deadline, "slept 4 hours" -> sleep, ...) with
+regular expressions and a keyword index, and reports a confidence per field.
+The LLM is only needed when some field stays ambiguous.
+"""
+import re
+import time
+
+# Values the extraction prompt tells the LLM to use when nothing is mentioned
+DEFAULTS = {
+    "sleep_hours": 7,
+    "energy_level": "Moderate",
+    "stress_level": "Moderate",
+    "study_hours_today": 2,
+    "deadline_urgency": "None",
+    "break_taken": False,
+    "task_complexity": "Medium",
+    "passive_learning_hours": 1,
+    "social_isolation_days": 1,
+    "sedentary_hours": 4,
+    "cramming": False,
+    "current_time": 14,
+}
+
+# Fields below this confidence are ambiguous and need the LLM
+CONFIDENCE_THRESHOLD = 0.75
+
+# Confidence of a field the message does not talk about at all. Defaults
+# only count when at least one cue was recognized; a message with no known
+# cue at all is left to the LLM.
+DEFAULT_CONFIDENCE = 0.8
+
+# Confidence when cues disagree or are negated
+CONFLICT_CONFIDENCE = 0.4
+
+# Confidence of a field the message talks about without a usable cue
+UNRESOLVED_CONFIDENCE = 0.3
+
+# phrase -> (field, value, confidence). Longer phrases win over the words
+# they contain, so "not stressed" is matched before "stressed".
+KEYWORD_CUES = {
+    # Energy
+    "exhausted": ("energy_level", "Very Low", 0.85),
+    "drained": ("energy_level", "Very Low", 0.85),
+    "wiped out": ("energy_level", "Very Low", 0.85),
+    "dead tired": ("energy_level", "Very Low", 0.85),
+    "tired": ("energy_level", "Low", 0.85),
+    # "tired of this class" means fed up, which says little about energy
+    "tired of": ("energy_level", "Low", UNRESOLVED_CONFIDENCE),
+    "sick of": ("energy_level", "Low", UNRESOLVED_CONFIDENCE),
+    "sleepy": ("energy_level", "Low", 0.8),
+    "low energy": ("energy_level", "Low", 0.9),
+    "feeling great": ("energy_level", "High", 0.85),
+    "feel great": ("energy_level", "High", 0.85),
+    "energized": ("energy_level", "High", 0.9),
+    "energetic": ("energy_level", "High", 0.9),
+    "full of energy": ("energy_level", "High", 0.9),
+    "refreshed": ("energy_level", "High", 0.85),
+    # Stress
+    "super stressed": ("stress_level", "Very High", 0.9),
+    "very stressed": ("stress_level", "Very High", 0.9),
+    "extremely stressed": ("stress_level", "Very High", 0.9),
+    "so stressed": ("stress_level", "Very High", 0.85),
+    "overwhelmed": ("stress_level", "Very High", 0.85),
+    "panicking": ("stress_level", "Very High", 0.85),
+    "stressed": ("stress_level", "High", 0.85),
+    "anxious": ("stress_level", "High", 0.85),
+    "nervous": ("stress_level", "High", 0.8),
+    "worried": ("stress_level", "High", 0.8),
+    "not stressed": ("stress_level", "Low", 0.85),
+    "relaxed": ("stress_level", "Low", 0.85),
+    "calm": ("stress_level", "Low", 0.8),
+    # Deadlines
+    "exam tomorrow": ("deadline_urgency", "Urgent (within 24h)", 0.95),
+    "test tomorrow": ("deadline_urgency", "Urgent (within 24h)", 0.95),
+    "quiz tomorrow": ("deadline_urgency", "Urgent (within 24h)", 0.95),
+    "due tomorrow": ("deadline_urgency", "Urgent (within 24h)", 0.95),
+    "due today": ("deadline_urgency", "Urgent (within 24h)", 0.95),
+    "due tonight": ("deadline_urgency", "Urgent (within 24h)", 0.95),
+    "exam today": ("deadline_urgency", "Urgent (within 24h)", 0.95),
+    "deadline tomorrow": ("deadline_urgency", "Urgent (within 24h)", 0.95),
+    "deadline today": ("deadline_urgency", "Urgent (within 24h)", 0.95),
+    "assignment due": ("deadline_urgency", "Urgent (within 24h)", 0.8),
+    "in 2 days": ("deadline_urgency", "Within 48 hours", 0.9),
+    "in two days": ("deadline_urgency", "Within 48 hours", 0.9),
+    "day after tomorrow": ("deadline_urgency", "Within 48 hours", 0.9),
+    "within 48 hours": ("deadline_urgency", "Within 48 hours", 0.95),
+    "this week": ("deadline_urgency", "This week", 0.85),
+    "in a few days": ("deadline_urgency", "This week", 0.85),
+    "later this week": ("deadline_urgency", "This week", 0.9),
+    "no deadlines": ("deadline_urgency", "None", 0.9),
+    "nothing due": ("deadline_urgency", "None", 0.9),
+    # Sleep without numbers
+    "all-nighter": ("sleep_hours", 1, 0.85),
+    "all nighter": ("sleep_hours", 1, 0.85),
+    "didn't sleep": ("sleep_hours", 1, 0.85),
+    "did not sleep": ("sleep_hours", 1, 0.85),
+    "barely slept": ("sleep_hours", 4, 0.8),
+    "haven't slept much": ("sleep_hours", 4, 0.8),
+    "good night's sleep": ("sleep_hours", 8, 0.8),
+    # Study load
+    "studying all day": ("study_hours_today", 7, 0.8),
+    "been studying all day": ("study_hours_today", 7, 0.8),
+    "studied all day": ("study_hours_today", 7, 0.8),
+    "studied for hours": ("study_hours_today", 7, 0.8),
+    # Breaks
+    "took a break": ("break_taken", True, 0.85),
+    "taken a break": ("break_taken", True, 0.85),
+    "had a break": ("break_taken", True, 0.85),
+    "haven't taken a break": ("break_taken", False, 0.9),
+    "no break": ("break_taken", False, 0.85),
+    "without a break": ("break_taken", False, 0.9),
+    "hours straight": ("break_taken", False, 0.8),
+    # Task complexity
+    "hardest": ("task_complexity", "High", 0.85),
+    "difficult": ("task_complexity", "High", 0.8),
+    "complex": ("task_complexity", "High", 0.8),
+    "challenging": ("task_complexity", "High", 0.8),
+    "easy": ("task_complexity", "Low", 0.8),
+    "simple": ("task_complexity", "Low", 0.8),
+    # Cramming
+    "cramming": ("cramming", True, 0.9),
+    "cram": ("cramming", True, 0.85),
+    "studying non-stop": ("cramming", True, 0.9),
+    "non-stop": ("cramming", True, 0.8),
+    # Social isolation without numbers
+    "isolated": ("social_isolation_days", 4, 0.6),
+    "lonely": ("social_isolation_days", 4, 0.6),
+    # Time of day
+    "midnight": ("current_time", 0, 0.85),
+    "noon": ("current_time", 12, 0.85),
+}
+
+NUMBER = r"(\d+(?:\.\d+)?|an?|one|two|three|four|five|six|seven|eight|nine|ten|eleven|twelve)"
+HOURS = r"(?:hours?|hrs?|h)\b"
+
+NUMBER_WORDS = {
+    "a": 1, "an": 1, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6,
+    "seven": 7, "eight": 8, "nine": 9, "ten": 10, "eleven": 11, "twelve": 12,
+}
+
+# (field, pattern, confidence); group 1 is the number
+NUMERIC_CUES = [
+    # "got"/"had" only count with "sleep" after the hours (next pattern): "got 2
+    # hours of studying done" or "had 3 hours of lectures" says nothing about sleep
+    ("sleep_hours", rf"\b(?:slept|sleep)\s+(?:only\s+|just\s+|about\s+|around\s+|like\s+)?{NUMBER}\s*(?:\.5\s*)?{HOURS}", 0.95),
+    ("sleep_hours", rf"\b{NUMBER}\s*{HOURS}\s+(?:of\s+)?sleep", 0.95),
+    ("study_hours_today", rf"\bstud(?:y|ied|ying)\s+(?:for\s+)?(?:about\s+|around\s+)?{NUMBER}\s*{HOURS}", 0.9),
+    ("study_hours_today", rf"\b{NUMBER}\s*{HOURS}\s+(?:of\s+)?(?:studying|study)", 0.9),
+    ("passive_learning_hours", rf"\b(?:reading|watching\s+\w+|lectures?)\s+for\s+{NUMBER}\s*{HOURS}", 0.9),
+    ("sedentary_hours", rf"\b(?:sitting|sat)\s+(?:for\s+)?(?:about\s+|around\s+)?{NUMBER}\s*{HOURS}", 0.9),
+    ("social_isolation_days", rf"\b(?:talked|spoken|spoke|seen)\s+(?:to\s+|with\s+)?(?:anyone|anybody|friends|people)\s+(?:in|for)\s+{NUMBER}\s+days?", 0.9),
+]
+
+# Messages that talk about a field in a way the cues above may not resolve
+TOPIC_HINTS = {
+    "sleep_hours": r"\b(sleep|slept|asleep|bed|nap|napped|all-?nighter)\b",
+    "energy_level": r"\b(energy|energetic|tired|exhausted|fatigued?|drained|sleepy|wiped)\b",
+    "stress_level": r"\b(stress\w*|anxi\w*|overwhelm\w*|panic\w*|worr\w*|nervous|pressure|calm|relax\w*)\b",
+    "study_hours_today": r"\bstud(y|ied|ying)\b[^.,;!?]*\b(hours?|hrs?|all day|long)\b",
+    "deadline_urgency": r"\b(exams?|tests?|deadlines?|due|assignments?|quiz\w*|midterms?|finals?|submissions?)\b",
+    "break_taken": r"\bbreaks?\b",
+    "task_complexity": r"\b(hard\w*|difficult|complex|challenging|tough|easy|simple)\b",
+    "passive_learning_hours": r"\b(reading|watching|lectures?|videos?)\b",
+    "social_isolation_days": r"\b(talk\w*|spoke|spoken|friends?|alone|isolat\w*|lonely|social\w*)\b",
+    "sedentary_hours": r"\b(sitting|sat|sedentary|desk|exercis\w*)\b",
+    "current_time": r"\b(\d{1,2}(:\d\d)?\s*(am|pm|a\.m\.|p\.m\.)|o'?clock|right now|tonight|late at night)\b",
+}
+
+CLOCK = re.compile(r"\b(\d{1,2})(?::(\d\d))?\s*(am|pm|a\.m\.|p\.m\.)")
+# A clock time right after these is when the student slept or woke, not the time now
+SLEEP_CLOCK = re.compile(r"\b(slept|sleep|asleep|bed|woke(\s+up)?|wake(\s+up)?|up)\s+((at|around|by|until|till)\s+)+$")
+# Sleep hours stated as a habit, a need or a wish rather than what happened
+SLEEP_QUALIFIER = re.compile(r"\b(need|needs|needed|usually|normally|typically|generally|"
+                             r"should|supposed|want|wanted|wish|ideally|recommended|aim)\b")
+# Any number; one no cue accounts for may belong to a sleep contrast ("but only got 5")
+STRAY_NUMBER = re.compile(r"\b(\d+(?:\.\d+)?|one|two|three|four|five|six|seven|eight|nine|ten|eleven|twelve)\b")
+NEGATION = re.compile(r"\b(not|no|never|isn't|aren't|don't|didn't|am not|n't)\s+(\w+\s+)?$")
+
+_KEYWORD_PATTERN = re.compile(
+    r"(?<![\w-])(" + "|".join(re.escape(phrase) for phrase in
+                               sorted(KEYWORD_CUES, key=len, reverse=True)) + r")(?![\w-])")
+_NUMERIC_PATTERNS = [(field, re.compile(pattern), confidence)
+                     for field, pattern, confidence in NUMERIC_CUES]
+_TOPIC_PATTERNS = {field: re.compile(pattern) for field, pattern in TOPIC_HINTS.items()}
+
+
+def _number(text):
+    value = NUMBER_WORDS.get(text)
+    if value is None:
+        value = float(text)
+        if value.is_integer():
+            value = int(value)
+    return value
+
+
+def extract_locally(user_message):
+    """
+    Extract the 12 StudentState fields without calling the LLM.
+
+    Returns a dict with:
+        data: extracted values (defaults where nothing was mentioned)
+        confidence: per-field confidence between 0 and 1
+        ambiguous: fields below CONFIDENCE_THRESHOLD, which need the LLM
+        mentioned: fields set from a cue in the message rather than a default
+    """
+    text = " ".join(user_message.lower().replace("’", "'").split())
+    candidates = {}
+    # (start, end) of the text the cues below account for
+    consumed = []
+
+    def add(field, value, confidence):
+        candidates.setdefault(field, []).append((value, confidence))
+
+    for match in _KEYWORD_PATTERN.finditer(text):
+        field, value, confidence = KEYWORD_CUES[match.group(1)]
+        if NEGATION.search(text[:match.start()]) and not match.group(1).startswith("not "):
+            confidence = CONFLICT_CONFIDENCE
+        add(field, value, confidence)
+        consumed.append(match.span())
+
+    for field, pattern, confidence in _NUMERIC_PATTERNS:
+        for match in pattern.finditer(text):
+            add(field, _number(match.group(1)), confidence)
+            consumed.append(match.span())
+
+    for match in CLOCK.finditer(text):
+        consumed.append(match.span())
+        if SLEEP_CLOCK.search(text[:match.start()]):
+            continue
+        hour = int(match.group(1)) % 12
+        if match.group(3).startswith("p"):
+            hour += 12
+        if hour < 24:
+            add("current_time", hour, 0.9)
+
+    if "sleep_hours" in candidates and (
+            SLEEP_QUALIFIER.search(text)
+            or any(not any(start <= match.start() < end for start, end in consumed)
+                   for match in STRAY_NUMBER.finditer(text))):
+        # "I need 8 hours of sleep but only got 5": which number is last night's?
+        add("sleep_hours", candidates["sleep_hours"][0][0], CONFLICT_CONFIDENCE)
+
+    default_confidence = DEFAULT_CONFIDENCE if candidates else UNRESOLVED_CONFIDENCE
+    data = {}
+    confidence = {}
+    for field, default in DEFAULTS.items():
+        found = candidates.get(field)
+        if found:
+            values = {(type(value), value) for value, _ in found}
+            if len(values) == 1:
+                data[field] = found[0][0]
+                confidence[field] = min(score for _, score in found)
+            else:
+                # Numbers beat keywords for the same field; otherwise the cues disagree
+                best = max(found, key=lambda item: item[1])
+                data[field] = best[0]
+                confidence[field] = CONFLICT_CONFIDENCE
+        else:
+            data[field] = default
+            confidence[field] = (UNRESOLVED_CONFIDENCE
+                                 if _TOPIC_PATTERNS.get(field) and _TOPIC_PATTERNS[field].search(text)
+                                 else default_confidence)
+
+    ambiguous = [field for field, score in confidence.items() if score < CONFIDENCE_THRESHOLD]
+    mentioned = [field for field in DEFAULTS if field in candidates]
+    return {'data': data, 'confidence': confidence, 'ambiguous': ambiguous,
+            'mentioned': mentioned}
+
+
+# ==================== COVERAGE REPORT ====================
+
+SAMPLE_MESSAGES = [
+    "I slept 4 hours, feeling exhausted, have exam tomorrow",
+    "Got 8 hours sleep, feeling great, ready to study my hardest subject",
+    "Super stressed, been studying for 7 hours straight, haven't talked to anyone in 5 days",
+    "I only slept 4 hours last night, feeling exhausted, and I have a big exam tomorrow morning",
+    "Feeling pretty good today, got 8 hours of sleep, but I've been studying for 5 hours straight",
+    "I'm super stressed, haven't talked to anyone in 4 days, and I have three assignments due this week",
+    "Just woke up after a good night's sleep, it's 9 AM and I'm ready to tackle my hardest subject",
+    "I slept only 5 hours, feeling tired, have an exam in 2 days, and studied for 3 hours already",
+    "pulled an all-nighter, cramming for my exam tomorrow",
+    "feeling okay I guess",
+    "had a rough night and my midterm is coming up",
+    "I'm so tired of this class, not sure what to do",
+    "been sitting for 6 hours and watching lectures for 3 hours",
+    # Hours that are not sleep
+    "I got 2 hours of studying done",
+    "had an hour break before class",
+    "had 3 hours of lectures today",
+    # Cues that must not resolve locally
+    "I need 8 hours of sleep but only got 5",
+    "I usually sleep 8 hours but last night only 3",
+    "I slept at 2 am",
+    "so tired of this class",
+]
+
+
+def coverage_report(messages=SAMPLE_MESSAGES):
+    """Print which messages resolve locally, and the local hit rate and latency"""
+    served = 0
+    start = time.perf_counter()
+    results = [extract_locally(message) for message in messages]
+    elapsed = (time.perf_counter() - start) / len(messages)
+
+    for message, result in zip(messages, results):
+        if not result['ambiguous']:
+            served += 1
+        status = ("local" if not result['ambiguous']
+                  else f"LLM, {len(result['ambiguous'])} ambiguous field(s)")
+        print(f"{status:30} {message[:70]}")
+
+    print(f"\n{served}/{len(messages)} messages ({served / len(messages):.0%}) served locally, "
+          f"{elapsed * 1e6:.0f} us per message")
+
+
+if __name__ == "__main__":
+    coverage_report()
@@ -0,0 +1,116 @@
+"""
+Import-time budget for the advisor's entry points
+Imports each module in a fresh interpreter with `python -X importtime`,
+compares its cumulative import time with a budget, checks that heavy
+dependencies it should load lazily stay unloaded and that importing it
+prints nothing. Exits with status 1 if any check fails;
+tests/test_import_budget.py runs the same checks under pytest.
+
+Usage:
+    python import_budget.py [--repeat N] [--scale FACTOR]
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+# module -> (budget in ms, modules that importing it must not load).
+# Budgets leave about 3x headroom over a typical laptop; scale them with
+# --scale or IMPORT_BUDGET_SCALE on slower machines.
+BUDGETS = {
+    'state_schema': (5, ('experta',)),
+    'recommendation_cache': (30, ('experta', 'numpy', 'pandas')),
+    'heuristic_extractor': (50, ('numpy',)),
+    'llm_parser': (150, ('groq', 'httpx', 'dotenv', 'asyncio', 'numpy', 'experta', 'pandas')),
+    'expert_system': (200, ('pandas', 'numpy', 'groq')),
+    'conversation': (400, ('groq', 'httpx', 'dotenv', 'pandas')),
+    # Mostly Streamlit itself; importing outside `streamlit run` renders the
+    # page once in bare mode. The parser loads with the first message.
+    'app': (3000, ('groq', 'httpx', 'dotenv')),
+}
+
+IMPORT_LINE = re.compile(r"^import time:\s*(\d+) \|\s*(\d+) \| (\s*)(\S+)$")
+
+_PROBE = """
+import sys
+import {module}
+print(" ".join(sorted(name for name in {forbidden!r} if name in sys.modules)))
+"""
+
+
+def measure(module, forbidden=()):
+    """
+    Import `module` in a fresh interpreter. Returns its cumulative import
+    time in ms, the forbidden modules that got loaded, and anything the
+    import wrote to stdout.
+    """
+    here = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(
+        filter(None, [here, os.environ.get("PYTHONPATH")])))
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _PROBE.format(module=module, forbidden=forbidden)],
+        capture_output=True, text=True, env=env, cwd=here)
+    if completed.returncode != 0:
+        raise RuntimeError(f"importing {module} failed:\n{completed.stderr[-2000:]}")
+
+    cumulative = None
+    for line in completed.stderr.splitlines():
+        # A module is imported once, so its line is the one to read. Its
+        # nesting is not checked: imports on other threads (app.py warms
+        # engines in the background) shift the indentation
+        match = IMPORT_LINE.match(line)
+        if match and match.group(4) == module:
+            cumulative = int(match.group(2)) / 1000
+    *output, loaded = completed.stdout.split("\n")[:-1] or [""]
+    return cumulative, loaded.split(), "\n".join(output)
+
+
+def problems(module, repeat=3, scale=1.0):
+    """
+    Import `module` `repeat` times and check it against its budget.
+    Returns the fastest import time in ms and a list of failed checks.
+    """
+    budget, forbidden = BUDGETS[module]
+    runs = [measure(module, forbidden) for _ in range(repeat)]
+    elapsed = min(run[0] for run in runs)
+    _, loaded, output = runs[0]
+    limit = budget * scale
+
+    failed = []
+    if elapsed > limit:
+        failed.append(f"over budget by {elapsed - limit:.1f} ms")
+    if loaded:
+        failed.append(f"loads {', '.join(loaded)}")
+    if output:
+        failed.append(f"prints {output.splitlines()[0]!r}")
+    return elapsed, failed
+
+
+def check(modules=BUDGETS, repeat=3, scale=1.0):
+    """Print one line per module and return the number of failed checks"""
+    failures = 0
+    for module in modules:
+        elapsed, failed = problems(module, repeat, scale)
+        failures += len(failed)
+        print(f"{'FAIL' if failed else 'ok':4}  {module:22} {elapsed:7.1f} ms "
+              f"(budget {BUDGETS[module][0] * scale:5.0f} ms)  {'; '.join(failed)}")
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check import times against their budgets")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="imports per module; the fastest counts")
+    parser.add_argument("--scale", type=float,
+                        default=float(os.environ.get("IMPORT_BUDGET_SCALE", 1.0)),
+                        help="multiply every budget, e.g. 2 on a slow CI runner")
+    args = parser.parse_args(argv)
+
+    failures = check(repeat=args.repeat, scale=args.scale)
+    print(f"\n{failures} failed check(s)" if failures else "\nAll import budgets met")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Incremental re-evaluation for the Activity Advisor
+Keeps a per-session student state and, when only a few fields change,
+re-evaluates just the rules that depend on them
+"""
+import random
+import time
+
+from compiled_engine import get_compiled_advisor, random_student_state
+from expert_system import STUDENT_STATE_FIELDS, run_expert_system, sort_recommendations
+import tracing
+
+
+def field_dependencies(rules):
+    """
+    Map each StudentState field to the indices of the rules whose patterns
+    use it, e.g. sleep_hours -> R1, R2, R3, R4, R9, R11, ...
+    """
+    dependencies = {}
+    for index, rule in enumerate(rules):
+        for field in rule.fields:
+            dependencies.setdefault(field, []).append(index)
+    return {field: tuple(indices) for field, indices in dependencies.items()}
+
+
+def _changed(old, new):
+    # 4 and 4.0 compare equal but render differently in reason texts
+    return type(old) is not type(new) or old != new
+
+
+class SessionAdvisor:
+    """
+    Per-session advisor that patches its recommendation list as the
+    student state changes, one or a few fields at a time.
+    """
+
+    def __init__(self, state=None, advisor=None):
+        self.advisor = advisor or get_compiled_advisor()
+        self.dependencies = field_dependencies(self.advisor.rules)
+        self.state = {}
+        self.recommendations = []
+        self.rules_evaluated = 0
+        self._fired = [[] for _ in self.advisor.rules]
+        if state is not None:
+            self.set_state(state)
+
+    def set_state(self, state):
+        """Replace the whole state and re-evaluate every rule"""
+        self.state = dict(state)
+        return self._evaluate(range(len(self.advisor.rules)))
+
+    def update_state(self, delta):
+        """
+        Apply changed fields and re-evaluate only the rules that depend on them.
+
+        Returns the updated, sorted recommendation list.
+        """
+        changed = [field for field, value in delta.items()
+                   if field not in self.state or _changed(self.state[field], value)]
+        self.state.update(delta)
+
+        affected = set()
+        for field in changed:
+            affected.update(self.dependencies.get(field, ()))
+        if not affected:
+            self.rules_evaluated = 0
+            return self.recommendations
+        return self._evaluate(sorted(affected))
+
+    def _evaluate(self, indices):
+        rules = self.advisor.rules
+        with tracing.span("engine.run", mode="incremental", rules=len(indices)):
+            for index in indices:
+                context = rules[index].match(self.state)
+                self._fired[index] = [] if context is None else rules[index].recommend(context)
+        self.rules_evaluated = len(indices)
+
+        with tracing.span("engine.sort"):
+            self.recommendations = sort_recommendations(
+                [recommendation for fired in self._fired for recommendation in fired])
+        return self.recommendations
+
+
+# ==================== BENCHMARK ====================
+
+def benchmark_updates(updates=5000, seed=0):
+    """
+    Simulate one-slider-at-a-time edits and compare update_state with full
+    re-evaluation. Returns the number of updates whose results differ.
+    """
+    rng = random.Random(seed)
+    advisor = get_compiled_advisor()
+    session = SessionAdvisor(random_student_state(rng))
+
+    deltas = []
+    for _ in range(updates):
+        source = random_student_state(rng)
+        field = rng.choice([field for field in STUDENT_STATE_FIELDS if field in source])
+        deltas.append({field: source[field]})
+
+    states = []
+    evaluated = 0
+    start = time.perf_counter()
+    for delta in deltas:
+        session.update_state(delta)
+        evaluated += session.rules_evaluated
+        states.append((dict(session.state), list(session.recommendations)))
+    incremental_time = (time.perf_counter() - start) / updates
+
+    start = time.perf_counter()
+    for state, _ in states:
+        advisor.get_recommendations(state)
+    full_time = (time.perf_counter() - start) / updates
+
+    mismatches = sum(1 for state, recommendations in states
+                     if recommendations != run_expert_system(state, mode="compiled")[0])
+
+    print(f"full re-evaluation: {full_time * 1e6:7.1f} us per update "
+          f"({len(advisor.rules)} rules)")
+    print(f"update_state:       {incremental_time * 1e6:7.1f} us per update "
+          f"({evaluated / updates:.1f} rules on average)")
+    return mismatches
+
+
+if __name__ == "__main__":
+    for field, indices in field_dependencies(get_compiled_advisor().rules).items():
+        print(f"{field}: {', '.join(get_compiled_advisor().rules[i].name for i in indices)}")
+    print(f"{benchmark_updates()} mismatches against full re-evaluation")
@@ -0,0 +1,206 @@
+"""
+Two-level cache for LLM extractions
+An in-memory LRU in front of a local SQLite store, keyed by a hash of the
+normalized message, the prompt version and the model name
+
+Usage:
+    python llm_cache.py stats
+    python llm_cache.py list [--limit N]
+    python llm_cache.py purge [--expired | --stale | --all]
+"""
+import argparse
+import copy
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import warnings
+
+from lru_cache import LRUCache, MISSING
+
+DEFAULT_PATH = os.environ.get(
+    "LLM_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "llm_cache.sqlite3"))
+DEFAULT_TTL = float(os.environ.get("LLM_CACHE_TTL", 7 * 24 * 3600)) or None
+DEFAULT_MAX_ENTRIES = int(os.environ.get("LLM_CACHE_MAX_ENTRIES", 10000))
+DEFAULT_MEMORY_SIZE = int(os.environ.get("LLM_CACHE_MEMORY_SIZE", 256))
+ENABLED = os.environ.get("LLM_CACHE", "1") != "0"
+
+
+def normalize_message(message):
+    """Collapse whitespace and case so trivially different messages share an entry"""
+    return " ".join(message.split()).casefold()
+
+
+def cache_key(message, prompt_version, model):
+    """Hash of the normalized message, prompt version and model"""
+    payload = json.dumps([normalize_message(message), prompt_version, model])
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class LLMCache:
+    """In-memory LRU backed by a SQLite file, with TTL and size-based eviction"""
+
+    def __init__(self, path=DEFAULT_PATH, ttl=DEFAULT_TTL,
+                 max_entries=DEFAULT_MAX_ENTRIES, memory_size=DEFAULT_MEMORY_SIZE):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.memory = LRUCache(maxsize=memory_size, ttl=ttl)
+        self.disk_hits = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS extractions (
+                key TEXT PRIMARY KEY,
+                message TEXT NOT NULL,
+                prompt_version TEXT NOT NULL,
+                model TEXT NOT NULL,
+                result TEXT NOT NULL,
+                created REAL NOT NULL,
+                accessed REAL NOT NULL
+            )""")
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS extractions_accessed ON extractions (accessed)")
+        self._db.commit()
+
+    def get(self, message, prompt_version, model):
+        """Return the cached result dict, or None"""
+        key = cache_key(message, prompt_version, model)
+        result = self.memory.get(key)
+        if result is not MISSING:
+            return copy.deepcopy(result)
+
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT result, created FROM extractions WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if self.ttl and row[1] + self.ttl <= now:
+                self._db.execute("DELETE FROM extractions WHERE key = ?", (key,))
+                self._db.commit()
+                return None
+            self._db.execute("UPDATE extractions SET accessed = ? WHERE key = ?", (now, key))
+            self._db.commit()
+            self.disk_hits += 1
+
+        result = json.loads(row[0])
+        self.memory.put(key, result)
+        return copy.deepcopy(result)
+
+    def put(self, message, prompt_version, model, result):
+        """Store a result dict in both levels, evicting the least recently used rows"""
+        key = cache_key(message, prompt_version, model)
+        self.memory.put(key, copy.deepcopy(result))
+
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO extractions VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, message, prompt_version, model, json.dumps(result), now, now))
+            self._db.execute(
+                "DELETE FROM extractions WHERE key IN ("
+                "  SELECT key FROM extractions ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,))
+            self._db.commit()
+
+    def purge(self, expired=False, keep_prompt_version=None):
+        """
+        Delete entries: all of them, only expired ones, or those made with a
+        prompt version other than keep_prompt_version. Returns the count.
+        """
+        with self._lock:
+            if expired:
+                cursor = self._db.execute(
+                    "DELETE FROM extractions WHERE created <= ?",
+                    (time.time() - (self.ttl or float('inf')),))
+            elif keep_prompt_version is not None:
+                cursor = self._db.execute(
+                    "DELETE FROM extractions WHERE prompt_version != ?",
+                    (keep_prompt_version,))
+            else:
+                cursor = self._db.execute("DELETE FROM extractions")
+            self._db.commit()
+        self.memory.clear()
+        return cursor.rowcount
+
+    def entries(self, limit=20):
+        """Most recently used entries as (message, prompt_version, model, created, accessed)"""
+        with self._lock:
+            return self._db.execute(
+                "SELECT message, prompt_version, model, created, accessed FROM extractions "
+                "ORDER BY accessed DESC LIMIT ?", (limit,)).fetchall()
+
+    def stats(self):
+        """Entry counts and hit counters of both levels"""
+        with self._lock:
+            total, size = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(result)), 0) FROM extractions").fetchone()
+            versions = self._db.execute(
+                "SELECT prompt_version, model, COUNT(*) FROM extractions "
+                "GROUP BY prompt_version, model").fetchall()
+        return {
+            'disk_entries': total,
+            'disk_bytes': size,
+            'disk_hits': self.disk_hits,
+            'by_prompt_version': [
+                {'prompt_version': version, 'model': model, 'entries': count}
+                for version, model, count in versions
+            ],
+            'memory': self.memory.stats(),
+        }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_llm_cache():
+    """Return the process-wide LLMCache, or None if caching is disabled or unavailable"""
+    global _cache, ENABLED
+    if not ENABLED:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            try:
+                _cache = LLMCache()
+            except (OSError, sqlite3.Error) as e:
+                warnings.warn(f"LLM cache unavailable ({e}); caching disabled")
+                ENABLED = False
+                return None
+    return _cache
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect or purge the LLM extraction cache")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("stats", help="show entry counts per prompt version")
+    listing = sub.add_parser("list", help="show the most recently used entries")
+    listing.add_argument("--limit", type=int, default=20)
+    purge = sub.add_parser("purge", help="delete entries")
+    which = purge.add_mutually_exclusive_group(required=True)
+    which.add_argument("--expired", action="store_true", help="entries older than the TTL")
+    which.add_argument("--stale", action="store_true",
+                       help="entries made with another prompt version")
+    which.add_argument("--all", action="store_true", help="every entry")
+    args = parser.parse_args(argv)
+
+    cache = LLMCache()
+    if args.command == "stats":
+        print(json.dumps(cache.stats(), indent=2))
+    elif args.command == "list":
+        for message, version, model, created, accessed in cache.entries(args.limit):
+            print(f"{time.strftime('%Y-%m-%d %H:%M', time.localtime(accessed))}  "
+                  f"[{version} / {model}]  {message[:70]}")
+    elif args.stale:
+        from llm_parser import PROMPT_VERSION
+        print(f"Purged {cache.purge(keep_prompt_version=PROMPT_VERSION)} stale entries")
+    else:
+        print(f"Purged {cache.purge(expired=args.expired)} entries")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,32 +3,30 @@ LLM-based Natural Language Parser using Groq (FREE!)
 Converts user's natural language input into structured facts for the Expert System
 """
 
-from groq import Groq
 import os
-from dotenv import load_dotenv
+import contextlib
+import hashlib
 import json
+import random
+import re
+import threading
+import time
+import weakref
 
-load_dotenv()
+# The Groq SDK, httpx, asyncio and the near-duplicate cache (NumPy) are
+# imported where they are used, since together they take several times
+# longer to load than this module and most messages never need them
+from heuristic_extractor import DEFAULTS, extract_locally
+from llm_cache import cache_key, get_llm_cache
+from single_flight import SingleFlight
+import tracing
 
-def parse_natural_language(user_message):
-    """
-    Parse natural language input using Groq API (FREE)
-    Returns structured data for the expert system
-    """
-    
-    try:
-        client = Groq(
-            api_key=os.environ.get("GROQ_API_KEY")
-        )
-        
-        # Prompt for LLM to extract structured information
-        extraction_prompt = f"""You are helping extract structured information from a student's description of their current state.
+MODEL_NAME = "llama-3.3-70b-versatile"
+MODEL_LABEL = "Llama 3.3 70B (via Groq)"
+LOCAL_MODEL_LABEL = "Local heuristics"
 
-The student said: "{user_message}"
-
-Extract the following information and return ONLY a valid JSON object with these exact fields:
-
-{{
+# Fields and extraction rules shared by the single and batch prompts
+EXTRACTION_FIELDS = """{{
     "sleep_hours": <number between 0-12, default 7>,
     "energy_level": <"Very Low" | "Low" | "Moderate" | "High", default "Moderate">,
     "stress_level": <"Low" | "Moderate" | "High" | "Very High", default "Moderate">,
@@ -41,9 +39,9 @@ Extract the following information and return ONLY a valid JSON object with these
     "sedentary_hours": <number between 0-12, default 4>,
     "cramming": <true | false, default false>,
     "current_time": <number between 0-23 for hour of day, use 14 if not mentioned>
-}}
+}}"""
 
-Rules for extraction:
+EXTRACTION_RULES = """Rules for extraction:
 - If information is not mentioned, use the default value
 - Be conservative with estimates
 - "tired", "exhausted", "drained" → energy_level: "Low" or "Very Low"
@@ -53,46 +51,792 @@ Rules for extraction:
 - "all-nighter", "didn't sleep" → sleep_hours: 0-2
 - "been studying all day", "studied for hours" → study_hours_today: 6-8
 - "cramming", "studying non-stop" → cramming: true
-- "haven't talked to anyone", "isolated" → social_isolation_days: 3-7
+- "haven't talked to anyone", "isolated" → social_isolation_days: 3-7"""
+
+# Prompt for LLM to extract structured information
+EXTRACTION_PROMPT = """You are helping extract structured information from a student's description of their current state.
+
+The student said: "{user_message}"
+
+Extract the following information and return ONLY a valid JSON object with these exact fields:
+
+""" + EXTRACTION_FIELDS + """
+
+""" + EXTRACTION_RULES + """
 
 Return ONLY the JSON object, no explanation or markdown formatting."""
+
+# Prompt for extracting many messages in one completion; {messages} is a
+# one-line JSON array of {"index": ..., "message": ...} objects
+BATCH_EXTRACTION_PROMPT = """You are helping extract structured information from several students' descriptions of their current state.
+
+Each message below has an index:
+{messages}
+
+For EACH message, extract the following information as a JSON object with an "index" field equal to the message's index and these exact fields:
+
+""" + EXTRACTION_FIELDS + """
+
+""" + EXTRACTION_RULES + """
+
+Return ONLY a JSON array with one object per message, no explanation or markdown formatting."""
+
+# Prompt for follow-up messages: only the fields that change are returned
+DELTA_EXTRACTION_PROMPT = """A student is updating the description of their current state.
+
+Current state: {state}
+
+The student now says: "{user_message}"
+
+Return ONLY a JSON object with the fields this message changes, using the field names and value formats of the current state, e.g. {{"sleep_hours": 8}}. Labels: energy_level "Very Low"|"Low"|"Moderate"|"High"; stress_level "Low"|"Moderate"|"High"|"Very High"; deadline_urgency "None"|"This week"|"Within 48 hours"|"Urgent (within 24h)"; task_complexity "Low"|"Medium"|"High". Return {{}} if nothing changes. No explanation or markdown formatting."""
+
+# Changes whenever either prompt changes, so cached extractions made with
+# an older prompt are never reused. Batch results share the cache.
+PROMPT_VERSION = hashlib.sha256(
+    (EXTRACTION_PROMPT + BATCH_EXTRACTION_PROMPT).encode()).hexdigest()[:12]
+
+
+def _read_settings():
+    """Settings taken from environment variables, by module-level name"""
+    env = os.environ.get
+    return {
+        # Try the regex/keyword extractor before calling Groq (set to 0 to always use the LLM)
+        'LOCAL_EXTRACTION': env("LOCAL_EXTRACTION", "1") != "0",
+        # Connection pool and timeouts of the shared Groq client
+        'GROQ_TIMEOUT': float(env("GROQ_TIMEOUT", 30)),
+        'GROQ_CONNECT_TIMEOUT': float(env("GROQ_CONNECT_TIMEOUT", 5)),
+        'GROQ_MAX_CONNECTIONS': int(env("GROQ_MAX_CONNECTIONS", 20)),
+        'GROQ_MAX_KEEPALIVE': int(env("GROQ_MAX_KEEPALIVE", 10)),
+        'GROQ_KEEPALIVE_EXPIRY': float(env("GROQ_KEEPALIVE_EXPIRY", 60)),
+        # Stream completions and stop reading once every field has been parsed
+        'GROQ_STREAMING': env("GROQ_STREAMING", "1") != "0",
+        # Messages packed into one batch completion
+        'GROQ_BATCH_SIZE': int(env("GROQ_BATCH_SIZE", 20)),
+        # Overall time budget of one async extraction, retries included
+        'GROQ_DEADLINE': float(env("GROQ_DEADLINE", 30)),
+        'GROQ_RETRY_ATTEMPTS': int(env("GROQ_RETRY_ATTEMPTS", 5)),
+        'GROQ_BACKOFF_BASE': float(env("GROQ_BACKOFF_BASE", 0.5)),
+        'GROQ_BACKOFF_MAX': float(env("GROQ_BACKOFF_MAX", 8)),
+        'GROQ_CONCURRENCY': int(env("GROQ_CONCURRENCY", 8)),
+    }
+
+
+# LOCAL_EXTRACTION, GROQ_TIMEOUT, ... as module globals. They are read again
+# once .env is loaded (see _load_env), since that happens on first use
+_import_settings = _read_settings()
+globals().update(_import_settings)
+
+_client = None
+_client_lock = threading.Lock()
+_env_loaded = False
+
+
+def _load_env():
+    """
+    Load .env once, on first use rather than at import, and apply the
+    settings it holds. A setting code has reassigned since import (e.g. a
+    benchmark turning LOCAL_EXTRACTION off) is left alone.
+    """
+    global _env_loaded
+    if not _env_loaded:
+        from dotenv import load_dotenv
+        load_dotenv()
+        module = globals()
+        for name, value in _read_settings().items():
+            if module[name] == _import_settings[name]:
+                module[name] = value
+        _env_loaded = True
+
+
+def create_groq_client(api_key=None, base_url=None):
+    """
+    Build a Groq client on a keep-alive HTTP connection pool, so calls reuse
+    open TCP/TLS connections instead of handshaking every time
+    """
+    # The SDK and httpx take longer to import than the rest of the app;
+    # messages resolved locally or from a cache never load them
+    import httpx
+    from groq import Groq
+
+    _load_env()
+    http_client = httpx.Client(
+        timeout=httpx.Timeout(GROQ_TIMEOUT, connect=GROQ_CONNECT_TIMEOUT),
+        limits=httpx.Limits(
+            max_connections=GROQ_MAX_CONNECTIONS,
+            max_keepalive_connections=GROQ_MAX_KEEPALIVE,
+            keepalive_expiry=GROQ_KEEPALIVE_EXPIRY,
+        ),
+    )
+    return Groq(
+        api_key=api_key or os.environ.get("GROQ_API_KEY"),
+        base_url=base_url,
+        http_client=http_client,
+    )
+
+
+def get_groq_client():
+    """Return the process-wide Groq client, creating it on first use"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = create_groq_client()
+    return _client
+
+
+# How each extraction was served: local heuristics, the LLM cache, the
+# near-duplicate cache, Groq, or by waiting for an identical in-flight request
+_source_counts = {'local': 0, 'cache': 0, 'semantic': 0, 'llm': 0}
+_source_lock = threading.Lock()
+
+# Identical messages extracted concurrently share one Groq request
+_inflight = SingleFlight()
+
+
+def _count_source(source):
+    with _source_lock:
+        _source_counts[source] += 1
+
+
+def extraction_stats():
+    """Counts of extractions per source and the fraction served locally"""
+    with _source_lock:
+        counts = dict(_source_counts)
+    counts['coalesced'] = _inflight.stats()['coalesced']
+    total = sum(counts.values())
+    counts['total'] = total
+    counts['local_fraction'] = counts['local'] / total if total else 0.0
+    return counts
+
+
+def _semantic_cache():
+    """The near-duplicate cache, imported on first use since it loads NumPy"""
+    from semantic_cache import get_semantic_cache
+    return get_semantic_cache()
+
+
+def _extract_locally(user_message):
+    """Result dict from the local extractor, or None if some field is ambiguous"""
+    if not LOCAL_EXTRACTION:
+        return None
+    local = extract_locally(user_message)
+    if local['ambiguous']:
+        return None
+    return {
+        'success': True,
+        'data': local['data'],
+        'confidence': local['confidence'],
+        'raw_response': json.dumps(local['data']),
+        'model_used': LOCAL_MODEL_LABEL
+    }
+
+
+def parse_natural_language(user_message):
+    """
+    Parse natural language input using Groq API (FREE)
+    Returns structured data for the expert system
+
+    Messages the local heuristic extractor resolves with confidence never
+    reach the API. Successful extractions are cached (see llm_cache.py),
+    so repeated messages skip the API call, paraphrases of earlier messages
+    are served from the near-duplicate index (see semantic_cache.py), and
+    identical messages sent
+    while a request is in flight wait for it. With GROQ_STREAMING the reply
+    is parsed as it streams and the stream is closed once all fields are in
+    """
+    _load_env()
+    with tracing.span("parse") as stage:
+        return _parse_natural_language(user_message, stage)
+
+
+def _parse_natural_language(user_message, stage):
+    local = _extract_locally(user_message)
+    if local is not None:
+        _count_source('local')
+        stage.set(source='local')
+        return local
+
+    cache = get_llm_cache()
+    if cache is not None:
+        cached = cache.get(user_message, PROMPT_VERSION, MODEL_NAME)
+        if cached is not None:
+            _count_source('cache')
+            stage.set(source='cache')
+            cached['cached'] = True
+            return cached
+
+    semantic = _semantic_cache()
+    if semantic is not None:
+        similar = semantic.get(user_message)
+        if similar is not None:
+            _count_source('semantic')
+            stage.set(source='semantic')
+            similar['cached'] = True
+            return similar
+
+    def extract():
+        _count_source('llm')
+        stage.set(source='llm')
+        if GROQ_STREAMING:
+            result = _extract_with_groq_stream(user_message)
+        else:
+            result = _extract_with_groq(user_message)
+        if result['success']:
+            if cache is not None:
+                cache.put(user_message, PROMPT_VERSION, MODEL_NAME, result)
+            if semantic is not None:
+                semantic.put(user_message, result)
+        return result
+
+    return _inflight.do(cache_key(user_message, PROMPT_VERSION, MODEL_NAME), extract)
+
+
+def _extract_with_groq(user_message, client=None):
+    """Send the extraction prompt to Groq and parse the JSON reply"""
+    
+    try:
+        client = client or get_groq_client()
         
         # Call Groq API - using Llama 3.1
-        chat_completion = client.chat.completions.create(
-            messages=[
-                {
-                    "role": "user",
-                    "content": extraction_prompt,
-                }
-            ],
-            model="llama-3.3-70b-versatile",  # Fast and good at structured output
-            temperature=0.1,  # Low temperature for consistent extraction
-            max_tokens=1024,
-        )
+        with tracing.span("llm.call", model=MODEL_NAME):
+            chat_completion = client.chat.completions.create(
+                **_completion_request(user_message)
+            )
         
-        # Extract response
-        response_text = chat_completion.choices[0].message.content.strip()
-        
-        # Sometimes LLM wraps in ```json, remove that
-        if response_text.startswith("```json"):
-            response_text = response_text.replace("```json", "").replace("```", "").strip()
-        elif response_text.startswith("```"):
-            response_text = response_text.replace("```", "").strip()
+        with tracing.span("llm.json_cleanup"):
+            return _result_from_reply(chat_completion.choices[0].message.content)
         
+    except Exception as e:
+        return {
+            'success': False,
+            'error': str(e),
+            'data': None
+        }
+
+
+def _completion_request(user_message):
+    """Arguments of the chat completion call for one message"""
+    # Prompt for LLM to extract structured information
+    extraction_prompt = EXTRACTION_PROMPT.format(user_message=user_message)
+    
+    return dict(
+        messages=[
+            {
+                "role": "user",
+                "content": extraction_prompt,
+            }
+        ],
+        model=MODEL_NAME,  # Fast and good at structured output
+        temperature=0.1,  # Low temperature for consistent extraction
+        max_tokens=1024,
+    )
+
+
+def _strip_code_fences(response_text):
+    response_text = response_text.strip()
+    
+    # Sometimes LLM wraps in ```json, remove that
+    if response_text.startswith("```json"):
+        response_text = response_text.replace("```json", "").replace("```", "").strip()
+    elif response_text.startswith("```"):
+        response_text = response_text.replace("```", "").strip()
+    return response_text
+
+
+def _result_from_reply(response_text):
+    """Clean up the LLM reply and parse it into the result dict"""
+    response_text = _strip_code_fences(response_text)
+    
+    try:
         # Parse JSON
         extracted_data = json.loads(response_text)
-        
+    except json.JSONDecodeError as e:
         return {
-            'success': True,
-            'data': extracted_data,
-            'raw_response': response_text,
-            'model_used': 'Llama 3.3 70B (via Groq)'
+            'success': False,
+            'error': f'Failed to parse JSON: {str(e)}. Response was: {response_text[:200]}',
+            'data': None
         }
-        
+    
+    return {
+        'success': True,
+        'data': extracted_data,
+        'raw_response': response_text,
+        'model_used': MODEL_LABEL
+    }
+
+
+# ==================== STREAMING ====================
+
+class IncrementalJSONFields:
+    """
+    Collects the top-level "key": value pairs of a JSON object while its
+    text arrives in pieces. A value is accepted only once the delimiter
+    after it has arrived, so "7" is not taken for a streaming "7.5".
+    """
+
+    _KEY = re.compile(r'\s*[{,]?\s*"((?:[^"\\]|\\.)*)"\s*:\s*')
+
+    def __init__(self):
+        self.text = ""
+        self.fields = {}
+        self._position = None
+        self._decoder = json.JSONDecoder()
+
+    def feed(self, chunk):
+        """Add streamed text; returns the fields parsed so far"""
+        self.text += chunk
+        if self._position is None:
+            # Skip anything before the object, e.g. a ```json fence
+            start = self.text.find("{")
+            if start < 0:
+                return self.fields
+            self._position = start
+
+        while True:
+            match = self._KEY.match(self.text, self._position)
+            if match is None:
+                break
+            try:
+                value, end = self._decoder.raw_decode(self.text, match.end())
+            except json.JSONDecodeError:
+                break
+            rest = self.text[end:].lstrip()
+            if not rest or rest[0] not in ",}":
+                break
+            self.fields[json.loads(f'"{match.group(1)}"')] = value
+            self._position = end
+        return self.fields
+
+
+def _extract_with_groq_stream(user_message, client=None, required=None):
+    """
+    Stream the extraction and return as soon as the `required` fields (all
+    StudentState fields by default) are parsed, closing the rest of the
+    stream. Fields outside a smaller `required` set that have not arrived
+    yet get their default values. Falls back to parsing the whole reply if
+    the stream ends first.
+    """
+    required = tuple(DEFAULTS) if required is None else tuple(required)
+    parser = IncrementalJSONFields()
+
+    try:
+        client = client or get_groq_client()
+        with tracing.span("llm.call", model=MODEL_NAME, streamed=True) as call:
+            stream = client.chat.completions.create(stream=True, **_completion_request(user_message))
+            with stream:
+                for chunk in stream:
+                    if chunk.choices:
+                        parser.feed(chunk.choices[0].delta.content or "")
+                    if all(field in parser.fields for field in required):
+                        call.set(closed_early=True)
+                        break
+                else:
+                    call.end()
+                    with tracing.span("llm.json_cleanup"):
+                        return _result_from_reply(parser.text)
+    except Exception as e:
+        return {
+            'success': False,
+            'error': str(e),
+            'data': None
+        }
+
+    data = {field: parser.fields.get(field, default) for field, default in DEFAULTS.items()}
+    data.update(parser.fields)
+    return {
+        'success': True,
+        'data': data,
+        'raw_response': json.dumps(data),
+        'model_used': MODEL_LABEL,
+        'streamed': True
+    }
+
+
+# ==================== BATCH API ====================
+
+# Completion tokens reserved per message in a batch (one JSON object each)
+BATCH_TOKENS_PER_MESSAGE = 200
+
+
+def _field_error(field, value):
+    """Error message if value has the wrong type for a StudentState field, else None"""
+    default = DEFAULTS[field]
+    if isinstance(default, bool):
+        valid = isinstance(value, bool)
+    elif isinstance(default, int):
+        valid = isinstance(value, (int, float)) and not isinstance(value, bool)
+    else:
+        valid = isinstance(value, str)
+    return None if valid else f'invalid {field}: {value!r}'
+
+
+def _validate_extraction(data):
+    """Error message if an extracted object lacks a field or has a wrong type, else None"""
+    if not isinstance(data, dict):
+        return f'expected a JSON object, got {type(data).__name__}'
+    for field in DEFAULTS:
+        if field not in data:
+            return f'missing field {field}'
+        error = _field_error(field, data[field])
+        if error:
+            return error
+    return None
+
+
+def _batch_completion_request(user_messages):
+    """Arguments of the chat completion call for a batch of messages"""
+    messages = json.dumps([{"index": index, "message": message}
+                           for index, message in enumerate(user_messages)],
+                          ensure_ascii=False)
+    return dict(
+        messages=[
+            {
+                "role": "user",
+                "content": BATCH_EXTRACTION_PROMPT.format(messages=messages),
+            }
+        ],
+        model=MODEL_NAME,
+        temperature=0.1,
+        max_tokens=min(BATCH_TOKENS_PER_MESSAGE * len(user_messages) + 100, 8000),
+    )
+
+
+def _batch_results_from_reply(response_text, count):
+    """
+    Parse a batch reply into one result dict per message. Each element is
+    validated on its own, so one malformed object only fails its message.
+    """
+    failure = lambda error: {'success': False, 'error': error, 'data': None}
+    response_text = _strip_code_fences(response_text)
+
+    try:
+        elements = json.loads(response_text)
     except json.JSONDecodeError as e:
+        error = f'Failed to parse JSON: {str(e)}. Response was: {response_text[:200]}'
+        return [failure(error) for _ in range(count)]
+    if isinstance(elements, dict):
+        # Some replies wrap the array, e.g. {"results": [...]}
+        elements = next((value for value in elements.values() if isinstance(value, list)), [])
+    if not isinstance(elements, list):
+        return [failure('Expected a JSON array of extractions') for _ in range(count)]
+
+    results = [failure('No extraction returned for this message') for _ in range(count)]
+    for element in elements:
+        index = element.get('index') if isinstance(element, dict) else None
+        if not isinstance(index, int) or isinstance(index, bool) or not 0 <= index < count:
+            continue
+        data = {field: value for field, value in element.items() if field != 'index'}
+        error = _validate_extraction(data)
+        if error:
+            results[index] = failure(error)
+        else:
+            results[index] = {
+                'success': True,
+                'data': data,
+                'raw_response': json.dumps(data),
+                'model_used': MODEL_LABEL,
+                'batch_size': count
+            }
+    return results
+
+
+def _extract_batch_with_groq(user_messages, client=None):
+    """
+    One batch completion for several messages; one result dict per message.
+    Request errors (rate limits, 5xx, network) are raised once the SDK's own
+    retries with backoff are used up.
+    """
+    client = client or get_groq_client()
+    chat_completion = client.chat.completions.create(
+        **_batch_completion_request(user_messages)
+    )
+    return _batch_results_from_reply(chat_completion.choices[0].message.content,
+                                     len(user_messages))
+
+
+def parse_natural_language_batch(messages, batch_size=None, client=None):
+    """
+    Extract many messages with as few Groq requests as possible.
+
+    Messages resolved locally or found in either cache are not sent. The rest
+    are packed GROQ_BATCH_SIZE (or batch_size) at a time into one completion
+    that returns a JSON array keyed by message index. Elements that fail
+    validation are re-issued in halves, and a message that still fails on
+    its own is sent with the single-message prompt, whose reply is validated
+    the same way. A request error (raised once the SDK's retries are used
+    up) fails only the batch that was sent; the other batches still go out.
+    Returns one result dict (as from parse_natural_language) per message,
+    in input order.
+    """
+    _load_env()
+    batch_size = batch_size or GROQ_BATCH_SIZE
+    cache = get_llm_cache()
+    semantic = _semantic_cache()
+    results = [None] * len(messages)
+    pending = []
+
+    for position, message in enumerate(messages):
+        local = _extract_locally(message)
+        if local is not None:
+            _count_source('local')
+            results[position] = local
+            continue
+        if cache is not None:
+            cached = cache.get(message, PROMPT_VERSION, MODEL_NAME)
+            if cached is not None:
+                _count_source('cache')
+                cached['cached'] = True
+                results[position] = cached
+                continue
+        if semantic is not None:
+            similar = semantic.get(message)
+            if similar is not None:
+                _count_source('semantic')
+                similar['cached'] = True
+                results[position] = similar
+                continue
+        pending.append(position)
+
+    batches = [pending[start:start + batch_size]
+               for start in range(0, len(pending), batch_size)]
+    while batches:
+        positions = batches.pop()
+        if len(positions) == 1:
+            outcome = _extract_with_groq(messages[positions[0]], client)
+            error = outcome['success'] and _validate_extraction(outcome['data'])
+            if error:
+                outcome = {'success': False, 'error': error, 'data': None}
+            outcomes = [outcome]
+        else:
+            try:
+                outcomes = _extract_batch_with_groq([messages[p] for p in positions], client)
+            except Exception as e:
+                for position in positions:
+                    _count_source('llm')
+                    results[position] = {'success': False, 'error': str(e), 'data': None}
+                continue
+
+        failed = []
+        for position, result in zip(positions, outcomes):
+            if result['success'] or len(positions) == 1:
+                _count_source('llm')
+                results[position] = result
+                if result['success']:
+                    if cache is not None:
+                        cache.put(messages[position], PROMPT_VERSION, MODEL_NAME, result)
+                    if semantic is not None:
+                        semantic.put(messages[position], result)
+            else:
+                failed.append(position)
+
+        if failed:
+            # Smaller batches are more likely to come back well-formed
+            middle = (len(failed) + 1) // 2
+            batches.extend(half for half in (failed[:middle], failed[middle:]) if half)
+
+    return results
+
+
+# ==================== FOLLOW-UP MESSAGES ====================
+
+def _delta_from_data(data, state):
+    """Keep known fields with valid values that differ from the state"""
+    if not isinstance(data, dict):
+        raise ValueError(f'expected a JSON object, got {type(data).__name__}')
+    delta = {}
+    for field, value in data.items():
+        if field not in DEFAULTS or _field_error(field, value) is not None:
+            continue
+        # 8 and 8.0 compare equal but render differently in reason texts
+        if field not in state or type(state[field]) is not type(value) or state[field] != value:
+            delta[field] = value
+    return delta
+
+
+def parse_delta(user_message, state, client=None):
+    """
+    Extract only the fields a follow-up message changes, e.g. "actually I
+    slept 8 hours" -> {"sleep_hours": 8}, given the state extracted so far.
+
+    Explicit cues are read locally; otherwise a short delta prompt carrying
+    the current state is sent instead of the full extraction prompt.
+    Returns a result dict whose 'data' holds the changed fields only.
+    """
+    _load_env()
+    with tracing.span("parse", delta=True) as stage:
+        return _parse_delta(user_message, state, client, stage)
+
+
+def _parse_delta(user_message, state, client, stage):
+    if LOCAL_EXTRACTION:
+        local = extract_locally(user_message)
+        if local['mentioned'] and not local['ambiguous']:
+            _count_source('local')
+            stage.set(source='local')
+            delta = _delta_from_data({field: local['data'][field]
+                                      for field in local['mentioned']}, state)
+            return {
+                'success': True,
+                'data': delta,
+                'raw_response': json.dumps(delta),
+                'model_used': LOCAL_MODEL_LABEL
+            }
+
+    _count_source('llm')
+    stage.set(source='llm')
+    prompt = DELTA_EXTRACTION_PROMPT.format(
+        state=json.dumps(state, separators=(",", ":")), user_message=user_message)
+    try:
+        client = client or get_groq_client()
+        with tracing.span("llm.call", model=MODEL_NAME):
+            chat_completion = client.chat.completions.create(
+                messages=[{"role": "user", "content": prompt}],
+                model=MODEL_NAME,
+                temperature=0.1,
+                max_tokens=256,
+            )
+        with tracing.span("llm.json_cleanup"):
+            response_text = _strip_code_fences(chat_completion.choices[0].message.content)
+            delta = _delta_from_data(json.loads(response_text), state)
+    except Exception as e:
         return {
             'success': False,
-            'error': f'Failed to parse JSON: {str(e)}. Response was: {response_text[:200]}',
+            'error': str(e),
+            'data': None
+        }
+
+    return {
+        'success': True,
+        'data': delta,
+        'raw_response': response_text,
+        'model_used': MODEL_LABEL
+    }
+
+
+# ==================== ASYNC API ====================
+
+# httpx async clients are bound to the event loop they were created on
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def create_async_groq_client(api_key=None, base_url=None):
+    """
+    Build an AsyncGroq client on a keep-alive connection pool. The SDK's
+    own retries are disabled because parse_natural_language_async retries
+    with jittered backoff itself.
+    """
+    import httpx
+    from groq import AsyncGroq
+
+    _load_env()
+    http_client = httpx.AsyncClient(
+        timeout=httpx.Timeout(GROQ_TIMEOUT, connect=GROQ_CONNECT_TIMEOUT),
+        limits=httpx.Limits(
+            max_connections=GROQ_MAX_CONNECTIONS,
+            max_keepalive_connections=GROQ_MAX_KEEPALIVE,
+            keepalive_expiry=GROQ_KEEPALIVE_EXPIRY,
+        ),
+    )
+    return AsyncGroq(
+        api_key=api_key or os.environ.get("GROQ_API_KEY"),
+        base_url=base_url,
+        http_client=http_client,
+        max_retries=0,
+    )
+
+
+def get_async_groq_client():
+    """Return the AsyncGroq client of the running event loop"""
+    import asyncio
+
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = _async_clients[loop] = create_async_groq_client()
+    return client
+
+
+def _is_retryable(error):
+    """Rate limits and server errors are worth retrying"""
+    from groq import APIStatusError
+
+    return isinstance(error, APIStatusError) and (
+        error.status_code == 429 or error.status_code >= 500)
+
+
+def _retry_delay(attempt, error):
+    """Full-jitter exponential backoff, never shorter than a Retry-After header"""
+    delay = random.uniform(0, min(GROQ_BACKOFF_MAX, GROQ_BACKOFF_BASE * 2 ** attempt))
+    try:
+        retry_after = float(error.response.headers.get("retry-after", 0))
+    except (AttributeError, ValueError):
+        retry_after = 0
+    return max(delay, min(retry_after, GROQ_BACKOFF_MAX))
+
+
+async def _extract_with_groq_async(user_message, client):
+    """Call Groq, retrying rate-limit and 5xx responses with backoff"""
+    import asyncio
+
+    attempt = 0
+    while True:
+        try:
+            chat_completion = await client.chat.completions.create(
+                **_completion_request(user_message)
+            )
+        except Exception as e:
+            attempt += 1
+            if not _is_retryable(e) or attempt >= GROQ_RETRY_ATTEMPTS:
+                raise
+            await asyncio.sleep(_retry_delay(attempt - 1, e))
+        else:
+            result = _result_from_reply(chat_completion.choices[0].message.content)
+            result['attempts'] = attempt + 1
+            return result
+
+
+async def parse_natural_language_async(user_message, deadline=None, client=None):
+    """
+    Async version of parse_natural_language with a deadline and retries.
+
+    Rate-limit (429) and 5xx responses are retried with jittered exponential
+    backoff until the deadline (GROQ_DEADLINE seconds by default) expires.
+    Returns the same result dict as parse_natural_language.
+    """
+    import asyncio
+
+    _load_env()
+    local = _extract_locally(user_message)
+    if local is not None:
+        _count_source('local')
+        return local
+
+    cache = get_llm_cache()
+    if cache is not None:
+        cached = cache.get(user_message, PROMPT_VERSION, MODEL_NAME)
+        if cached is not None:
+            _count_source('cache')
+            cached['cached'] = True
+            return cached
+
+    semantic = _semantic_cache()
+    if semantic is not None:
+        similar = semantic.get(user_message)
+        if similar is not None:
+            _count_source('semantic')
+            similar['cached'] = True
+            return similar
+
+    _count_source('llm')
+    deadline = GROQ_DEADLINE if deadline is None else deadline
+    try:
+        result = await asyncio.wait_for(
+            _extract_with_groq_async(user_message, client or get_async_groq_client()),
+            timeout=deadline)
+    except asyncio.TimeoutError:
+        return {
+            'success': False,
+            'error': f'No response from Groq within {deadline:g}s',
             'data': None
         }
     except Exception as e:
@@ -102,6 +846,30 @@ Return ONLY the JSON object, no explanation or markdown formatting."""
             'data': None
         }
 
+    if result['success']:
+        if cache is not None:
+            cache.put(user_message, PROMPT_VERSION, MODEL_NAME, result)
+        if semantic is not None:
+            semantic.put(user_message, result)
+    return result
+
+
+async def parse_many_async(messages, concurrency=None, deadline=None, client=None):
+    """
+    Extract many messages concurrently, at most `concurrency` (GROQ_CONCURRENCY
+    by default) in flight at once. Results are returned in input order.
+    """
+    import asyncio
+
+    _load_env()
+    semaphore = asyncio.Semaphore(concurrency or GROQ_CONCURRENCY)
+
+    async def extract(message):
+        async with semaphore:
+            return await parse_natural_language_async(message, deadline, client)
+
+    return await asyncio.gather(*(extract(message) for message in messages))
+
 
 def get_extraction_explanation(user_message, extracted_data):
     """
@@ -163,6 +931,183 @@ def test_parser():
             print(f"Error: {result['error']}")
 
 
+@contextlib.contextmanager
+def _llm_cache_disabled():
+    """Keep benchmark messages out of (and unserved by) the extraction caches"""
+    import llm_cache
+    import semantic_cache
+
+    enabled, llm_cache.ENABLED = llm_cache.ENABLED, False
+    semantic_enabled, semantic_cache.ENABLED = semantic_cache.ENABLED, False
+    try:
+        yield
+    finally:
+        llm_cache.ENABLED = enabled
+        semantic_cache.ENABLED = semantic_enabled
+
+
+def benchmark_client_reuse(calls=200, threads=8, latency=0.005):
+    """
+    Compare a new Groq client per call (the old behaviour) with the shared
+    pooled client, against a local stub server, sequentially and concurrently
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    from groq_stub import StubGroqServer
+
+    with StubGroqServer(latency=latency) as stub:
+        def fresh_client(message):
+            # Built like the shared client (a bare Groq() fails on httpx >= 0.28),
+            # but with a connection pool of its own for each call
+            client = create_groq_client(api_key="stub", base_url=stub.base_url)
+            try:
+                return _extract_with_groq(message, client)
+            finally:
+                client.close()
+
+        pooled = create_groq_client(api_key="stub", base_url=stub.base_url)
+
+        def pooled_client(message):
+            return _extract_with_groq(message, pooled)
+
+        for name, call in (("new client per call", fresh_client),
+                           ("shared pooled client", pooled_client)):
+            for workers in (1, threads):
+                connections = stub.connections
+                start = time.perf_counter()
+                with ThreadPoolExecutor(workers) as pool:
+                    results = list(pool.map(call, ["benchmark"] * calls))
+                elapsed = time.perf_counter() - start
+                assert all(result['success'] for result in results)
+                print(f"{name:22} {workers:2} thread(s): "
+                      f"{elapsed / calls * 1000:6.2f} ms per call, "
+                      f"{stub.connections - connections} connections opened")
+
+
+def benchmark_async_burst(messages=200, concurrency=16, latency=0.05, error_rate=0.2):
+    """
+    Simulate an exam-week burst against a local stub that answers a share of
+    requests with 429/503, and compare sequential and concurrent extraction
+    """
+    import asyncio
+
+    from groq_stub import StubGroqServer
+
+    rng = random.Random(0)
+    errors = [rng.choice([429, 503]) for _ in range(int(messages * error_rate))]
+    texts = [f"burst message {i}" for i in range(messages)]
+
+    with StubGroqServer(latency=latency) as stub:
+        pooled = create_groq_client(api_key="stub", base_url=stub.base_url)
+        start = time.perf_counter()
+        for text in texts[:20]:
+            _extract_with_groq(text, pooled)
+        sequential = (time.perf_counter() - start) / 20
+
+        stub.errors = list(errors)
+
+        async def burst():
+            client = create_async_groq_client(api_key="stub", base_url=stub.base_url)
+            return await parse_many_async(texts, concurrency, client=client)
+
+        start = time.perf_counter()
+        with _llm_cache_disabled():
+            results = asyncio.run(burst())
+        elapsed = time.perf_counter() - start
+
+    succeeded = sum(result['success'] for result in results)
+    retried = sum(result.get('attempts', 1) > 1 for result in results)
+    print(f"sequential:               {sequential * 1000:7.1f} ms per message")
+    print(f"async, {concurrency} in flight:      {elapsed / messages * 1000:7.1f} ms per message")
+    print(f"{succeeded}/{messages} succeeded, {retried} after retrying "
+          f"{len(errors)} injected 429/503 responses")
+
+
+def benchmark_batch(messages=200, batch_size=20, latency=0.2, malformed=0.05):
+    """
+    Compare one request per message with parse_natural_language_batch
+    against a local stub that answers batch prompts with a JSON array and
+    corrupts a share of the elements, which must be re-issued
+    """
+    from groq_stub import DEFAULT_EXTRACTION, StubGroqServer
+
+    rng = random.Random(0)
+    marker = "Each message below has an index:\n"
+    prompt_chars = [0]
+
+    def reply(payload):
+        prompt = payload["messages"][0]["content"]
+        prompt_chars[0] += len(prompt)
+        if marker not in prompt:
+            return json.dumps(DEFAULT_EXTRACTION)
+        batch = json.loads(prompt.split(marker, 1)[1].split("\n", 1)[0])
+        elements = []
+        for item in batch:
+            element = dict(DEFAULT_EXTRACTION, index=item["index"])
+            if rng.random() < malformed:
+                del element["sleep_hours"]
+            elements.append(element)
+        return json.dumps(elements)
+
+    texts = [f"check-in {i}: rough day" for i in range(messages)]
+
+    with StubGroqServer(latency=latency, content=reply) as stub, _llm_cache_disabled():
+        client = create_groq_client(api_key="stub", base_url=stub.base_url)
+        for name, extract in (
+                ("one request per message", lambda: [_extract_with_groq(text, client) for text in texts]),
+                (f"batches of {batch_size}", lambda: parse_natural_language_batch(texts, batch_size, client))):
+            requests, prompt_chars[0] = stub.requests, 0
+            start = time.perf_counter()
+            results = extract()
+            elapsed = time.perf_counter() - start
+            assert all(result['success'] for result in results)
+            print(f"{name:24} {stub.requests - requests:4} requests, "
+                  f"{prompt_chars[0] / messages:6.0f} prompt chars and "
+                  f"{elapsed / messages * 1000:6.1f} ms per message")
+
+
+def benchmark_streaming(calls=10, token_delay=0.004):
+    """
+    Time from request to recommendations with a blocking completion and
+    with streaming + early cancellation, against a stub that emits tokens
+    at `token_delay` seconds each (about 250 tokens/s)
+    """
+    from expert_system import run_expert_system
+    from groq_stub import DEFAULT_EXTRACTION, StubGroqServer, tokenize
+
+    replies = {
+        "compact JSON": json.dumps(DEFAULT_EXTRACTION),
+        "fenced JSON + note": "```json\n" + json.dumps(DEFAULT_EXTRACTION, indent=4) + "\n```\n\n"
+                              "Note: fields that were not mentioned use their default values.",
+    }
+
+    for name, content in replies.items():
+        with StubGroqServer(content=content, token_delay=token_delay) as stub:
+            client = create_groq_client(api_key="stub", base_url=stub.base_url)
+            for mode, extract in (("blocking", _extract_with_groq),
+                                  ("streaming", _extract_with_groq_stream)):
+                succeeded = 0
+                tokens = stub.tokens_sent
+                start = time.perf_counter()
+                for _ in range(calls):
+                    result = extract("benchmark", client)
+                    if result['success']:
+                        succeeded += 1
+                        run_expert_system(result['data'])
+                elapsed = (time.perf_counter() - start) / calls
+                streamed = (f", {(stub.tokens_sent - tokens) / calls:.0f}/{len(tokenize(content))} "
+                            f"tokens read" if mode == "streaming" else "")
+                print(f"{name:20} {mode:10} {elapsed * 1000:7.1f} ms to recommendations, "
+                      f"{succeeded}/{calls} parsed{streamed}")
+
+
 if __name__ == "__main__":
-    # Test the parser
-    test_parser()
\ No newline at end of file
+    import sys
+
+    if len(sys.argv) > 1 and sys.argv[1] == "benchmark":
+        benchmark_client_reuse()
+        benchmark_async_burst()
+        benchmark_batch()
+        benchmark_streaming()
+    else:
+        # Test the parser
+        test_parser()
\ No newline at end of file
@@ -0,0 +1,150 @@
+"""
+Multi-core evaluation of large cohorts
+Experta evaluation is pure Python and holds the GIL, so one process uses one
+core. This runner splits a cohort into chunks and evaluates them with
+run_expert_system in a pool of worker processes, each with its own warm engine,
+and returns the results in input order.
+
+Usage:
+    python parallel_engine.py [--students N] [--workers 1 2 4 8 16] [--chunk-size N]
+"""
+import argparse
+import math
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from compiled_engine import random_student_state
+from expert_system import engine_pool, run_expert_system
+
+PARALLEL_WORKERS = int(os.environ.get("ADVISOR_PARALLEL_WORKERS", os.cpu_count() or 1))
+
+# Students per task; None picks about four chunks per worker so that slow
+# chunks do not leave the other workers idle at the end of a run
+PARALLEL_CHUNK_SIZE = int(os.environ.get("ADVISOR_PARALLEL_CHUNK_SIZE", 0)) or None
+
+CHUNKS_PER_WORKER = 4
+
+
+def _init_worker():
+    # One warm engine per worker; the first chunk does not pay for the Rete build
+    engine_pool.warm(1)
+
+
+def _evaluate_chunk(states, mode):
+    return [run_expert_system(state, mode)[0] for state in states]
+
+
+class ParallelRunner:
+    """
+    Pool of worker processes evaluating chunks of student states.
+
+    Use as a context manager to keep the workers (and their warm engines)
+    across several run() calls; starting the pool costs far more than a
+    small cohort takes to evaluate.
+    """
+
+    def __init__(self, workers=None, chunk_size=None, mode=None):
+        self.workers = workers or PARALLEL_WORKERS
+        self.chunk_size = chunk_size or PARALLEL_CHUNK_SIZE
+        self.mode = mode
+        self._executor = None
+
+    def start(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(self.workers, initializer=_init_worker)
+        return self
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+
+    def chunk_size_for(self, count):
+        """Students per task for a cohort of `count`"""
+        if self.chunk_size:
+            return self.chunk_size
+        return max(1, math.ceil(count / (self.workers * CHUNKS_PER_WORKER)))
+
+    def run(self, user_inputs):
+        """One recommendation list per student, in input order"""
+        states = list(user_inputs)
+        if not states:
+            return []
+        size = self.chunk_size_for(len(states))
+        chunks = [states[start:start + size] for start in range(0, len(states), size)]
+
+        self.start()
+        results = []
+        for chunk_results in self._executor.map(
+                _evaluate_chunk, chunks, [self.mode] * len(chunks)):
+            results.extend(chunk_results)
+        return results
+
+
+def run_expert_system_parallel(user_inputs, workers=None, chunk_size=None, mode=None):
+    """
+    Run the expert system over a cohort on several cores
+
+    Args:
+        user_inputs: iterable of dicts, as run_expert_system takes
+        workers: worker processes (ADVISOR_PARALLEL_WORKERS, one per core by default)
+        chunk_size: students per task (ADVISOR_PARALLEL_CHUNK_SIZE, or about
+                    four chunks per worker)
+        mode: engine mode passed to run_expert_system
+
+    Returns:
+        One recommendation list per student, in input order
+    """
+    with ParallelRunner(workers, chunk_size, mode) as runner:
+        return runner.run(user_inputs)
+
+
+# ==================== BENCHMARK ====================
+
+def benchmark_scaling(students=20000, workers_options=(1, 2, 4, 8, 16), chunk_size=None,
+                      mode="experta", seed=0):
+    """
+    Print students/second and speedup over a single process for each worker
+    count, and check that every run matches the sequential results
+    """
+    rng = random.Random(seed)
+    states = [random_student_state(rng) for _ in range(students)]
+
+    start = time.perf_counter()
+    expected = [run_expert_system(state, mode)[0] for state in states]
+    sequential = time.perf_counter() - start
+    print(f"{os.cpu_count()} CPU(s), {students} students, {mode} engine")
+    print(f"sequential:  {students / sequential:10,.0f} students/s")
+
+    for workers in workers_options:
+        with ParallelRunner(workers, chunk_size, mode) as runner:
+            # Start the workers before timing, as a long-lived runner would
+            runner.run(states[:workers])
+            start = time.perf_counter()
+            results = runner.run(states)
+            elapsed = time.perf_counter() - start
+        mismatches = sum(1 for a, b in zip(results, expected) if a != b)
+        print(f"{workers:3} worker(s): {students / elapsed:10,.0f} students/s, "
+              f"speedup {sequential / elapsed:5.2f}x, {mismatches} mismatches")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark multi-core cohort evaluation")
+    parser.add_argument("--students", type=int, default=20000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--chunk-size", type=int, default=None)
+    parser.add_argument("--mode", choices=("experta", "compiled", "table"), default="experta")
+    args = parser.parse_args(argv)
+    benchmark_scaling(args.students, args.workers, args.chunk_size, args.mode)
+
+
+if __name__ == "__main__":
+    main()
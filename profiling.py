@@ -0,0 +1,237 @@
+"""
+On-demand profiling of the app and the engine
+Wraps one Streamlit rerun or one run_expert_system call in cProfile and a
+stack sampler, and writes both results to a local directory:
+
+    <stamp>-<label>.pstats     deterministic profile (pstats / snakeviz)
+    <stamp>-<label>.collapsed  sampled stacks, one "a;b;c count" line each,
+                               for flamegraph.pl, speedscope or inferno
+
+Nothing is profiled until asked: admins (ADVISOR_ADMIN=1, or ?admin=<token>
+with ADVISOR_ADMIN_TOKEN) get a profiling panel in the app, and ?profile=1
+profiles their reruns. Set
+ADVISOR_PROFILE_ENGINE_CALLS=N to profile the first N run_expert_system
+calls of a process, or call arm_engine().
+
+Usage:
+    python profiling.py [--calls N]     # profile engine calls, list profiles
+"""
+import cProfile
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+PROFILE_DIR = os.environ.get("ADVISOR_PROFILE_DIR", "profiles")
+
+# Seconds between stack samples
+SAMPLE_INTERVAL = float(os.environ.get("ADVISOR_PROFILE_INTERVAL", 0.001))
+
+# Deepest stack recorded per sample
+MAX_STACK_DEPTH = 200
+
+# Number of upcoming run_expert_system calls to profile
+engine_calls_armed = int(os.environ.get("ADVISOR_PROFILE_ENGINE_CALLS", 0))
+
+_arm_lock = threading.Lock()
+_local = threading.local()
+
+
+def arm_engine(calls=1):
+    """Profile the next `calls` run_expert_system calls (in any thread)"""
+    global engine_calls_armed
+    with _arm_lock:
+        engine_calls_armed = calls
+
+
+def take_engine_call():
+    """True for a call that should be profiled; counts it against the armed calls"""
+    global engine_calls_armed
+    with _arm_lock:
+        if engine_calls_armed <= 0 or getattr(_local, 'profiler', None) is not None:
+            return False
+        engine_calls_armed -= 1
+        return True
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """Samples one thread's Python stack on a timer and counts collapsed stacks"""
+
+    def __init__(self, thread_id, interval=SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, name="profile-sampler", daemon=True)
+
+    def start(self):
+        # The sampler needs the GIL to look at the stack; a shorter switch
+        # interval lets it in about every `interval` even in busy Python code
+        self._switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(min(self._switch_interval, self.interval))
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        sys.setswitchinterval(self._switch_interval)
+        return self.stacks
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if self._stop.is_set():
+                # The thread may already be waiting in stop()
+                break
+            if frame is None or frame.f_code.co_filename == __file__:
+                continue
+            labels = []
+            while frame is not None and len(labels) < MAX_STACK_DEPTH:
+                if frame.f_code.co_filename != __file__:
+                    labels.append(_frame_label(frame))
+                frame = frame.f_back
+            self.stacks[";".join(reversed(labels))] += 1
+
+
+class Profiler:
+    """
+    cProfile plus a StackSampler on the calling thread. Only one runs per
+    thread; starting a new one discards a profile that was never stopped
+    (e.g. a rerun interrupted by st.rerun()).
+    """
+
+    def __init__(self, label, directory=None):
+        self.label = label
+        self.directory = directory or PROFILE_DIR
+        self.paths = None
+        self._profile = None
+        self._sampler = None
+
+    def start(self):
+        stale = getattr(_local, 'profiler', None)
+        if stale is not None:
+            stale.discard()
+        _local.profiler = self
+        self._started = time.perf_counter()
+        self._sampler = StackSampler(threading.get_ident()).start()
+        self._profile = cProfile.Profile()
+        self._profile.enable()
+        return self
+
+    def _finish(self):
+        stacks = self._sampler.stop()
+        self._profile.disable()
+        if getattr(_local, 'profiler', None) is self:
+            _local.profiler = None
+        return stacks
+
+    def discard(self):
+        if self._profile is not None:
+            self._finish()
+            self._profile = None
+
+    def stop(self):
+        """Stop profiling and write both files; returns (pstats path, collapsed path)"""
+        if self._profile is None:
+            return self.paths
+        stacks = self._finish()
+        elapsed = time.perf_counter() - self._started
+
+        os.makedirs(self.directory, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S") + f"-{int(time.time() * 1000) % 1000:03d}"
+        base = os.path.join(self.directory, f"{stamp}-{self.label}")
+        self._profile.dump_stats(base + ".pstats")
+        with open(base + ".collapsed", "w") as f:
+            f.write(f"# {self.label}: {elapsed * 1000:.1f} ms, {sum(stacks.values())} samples "
+                    f"every {self._sampler.interval * 1000:g} ms\n")
+            for stack, count in stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        self._profile = None
+        self.paths = (base + ".pstats", base + ".collapsed")
+        return self.paths
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def profile_call(label, function, *args, **kwargs):
+    """Call `function` under a Profiler and return its result"""
+    with Profiler(label):
+        return function(*args, **kwargs)
+
+
+# ==================== READING PROFILES ====================
+
+def recent_profiles(directory=None, limit=10):
+    """Newest profiles first, as dicts with name, created, pstats and collapsed paths"""
+    directory = directory or PROFILE_DIR
+    try:
+        names = [name for name in os.listdir(directory) if name.endswith(".pstats")]
+    except FileNotFoundError:
+        return []
+    profiles = []
+    for name in names:
+        path = os.path.join(directory, name)
+        collapsed = path[:-len(".pstats")] + ".collapsed"
+        profiles.append({
+            'name': name[:-len(".pstats")],
+            'created': os.path.getmtime(path),
+            'pstats': path,
+            'collapsed': collapsed if os.path.exists(collapsed) else None,
+        })
+    profiles.sort(key=lambda profile: profile['created'], reverse=True)
+    return profiles[:limit]
+
+
+def top_functions(pstats_path, limit=15):
+    """The functions with the most cumulative time in a .pstats file"""
+    import pstats
+
+    stats = pstats.Stats(pstats_path)
+    rows = []
+    for (filename, line, name), (_, calls, own, cumulative, _) in stats.stats.items():
+        rows.append({
+            'function': f"{name} ({os.path.basename(filename)}:{line})",
+            'calls': calls,
+            'own ms': own * 1000,
+            'cumulative ms': cumulative * 1000,
+        })
+    rows.sort(key=lambda row: row['cumulative ms'], reverse=True)
+    return rows[:limit]
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Profile run_expert_system calls")
+    parser.add_argument("--calls", type=int, default=3, help="calls to profile")
+    parser.add_argument("--mode", choices=("experta", "compiled", "table"), default="experta")
+    args = parser.parse_args(argv)
+
+    import random
+    from compiled_engine import random_student_state
+    from expert_system import run_expert_system
+    # The module expert_system checks, not this __main__ copy of it
+    import profiling
+
+    rng = random.Random(0)
+    profiling.arm_engine(args.calls)
+    for _ in range(args.calls):
+        run_expert_system(random_student_state(rng), args.mode)
+    for profile in recent_profiles(limit=args.calls):
+        print(profile['pstats'])
+        print(profile['collapsed'])
+
+
+if __name__ == "__main__":
+    main()
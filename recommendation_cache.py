@@ -0,0 +1,133 @@
+"""
+Process-wide recommendation cache for the Activity Advisor
+Normalizes student states into canonical keys and keeps the resulting
+recommendations in a thread-safe LRU cache shared by all Streamlit sessions
+"""
+import os
+
+from lru_cache import LRUCache, MISSING
+from single_flight import SingleFlight
+from state_schema import (
+    STUDENT_STATE_FIELDS,
+    ENERGY_LEVELS,
+    STRESS_LEVELS,
+    DEADLINE_OPTIONS,
+    TASK_COMPLEXITIES,
+)
+
+# Known labels for categorical fields, matched ignoring case and spacing.
+# "Urgent" is the label the deadline rules test for.
+CANONICAL_LABELS = {
+    'energy_level': ENERGY_LEVELS,
+    'stress_level': STRESS_LEVELS,
+    'deadline_urgency': DEADLINE_OPTIONS + ("Urgent",),
+    'task_complexity': TASK_COMPLEXITIES,
+}
+
+_LABEL_LOOKUP = {
+    field: {" ".join(label.lower().split()): label for label in labels}
+    for field, labels in CANONICAL_LABELS.items()
+}
+
+def _canonical_value(field, value):
+    if hasattr(value, 'item') and not isinstance(value, (str, bytes)):
+        # NumPy scalar
+        value = value.item()
+
+    if isinstance(value, str):
+        value = " ".join(value.split())
+        return _LABEL_LOOKUP.get(field, {}).get(value.lower(), value)
+    return value
+
+
+def canonical_state(user_inputs):
+    """
+    Normalize a student state: StudentState fields first in a fixed order
+    and labels mapped to their canonical form.
+
+    Numbers are kept as they are: rounding them would move values across
+    rule thresholds (sleep_hours 4.9996 would become 5.0 and stop counting
+    as a critical deficit).
+    """
+    state = {}
+    for field in STUDENT_STATE_FIELDS:
+        if field in user_inputs:
+            state[field] = _canonical_value(field, user_inputs[field])
+    for field in sorted(set(user_inputs) - set(STUDENT_STATE_FIELDS)):
+        state[field] = _canonical_value(field, user_inputs[field])
+    return state
+
+
+def canonical_key(user_inputs):
+    """
+    Hashable cache key for a student state.
+
+    Values are tagged with their type because reason texts render 4 and 4.0
+    differently even though they compare equal. Floats are keyed by their
+    repr, so NaN (which equals nothing, itself included) can still hit and
+    -0.0 ("-0.0h") is not served 0.0's recommendations.
+    """
+    return _state_key(canonical_state(user_inputs))
+
+
+def _state_key(state):
+    return tuple((field, type(value).__name__,
+                  repr(value) if isinstance(value, float) else value)
+                 for field, value in state.items())
+
+
+_cache = LRUCache(
+    maxsize=int(os.environ.get("ADVISOR_CACHE_SIZE", 4096)),
+    ttl=float(os.environ.get("ADVISOR_CACHE_TTL", 0)) or None,
+)
+
+# Identical states evaluated concurrently share one engine run
+_inflight = SingleFlight()
+
+
+def get_recommendation_cache():
+    """The LRUCache shared by every session in this process"""
+    return _cache
+
+
+def cached_recommendations(user_inputs):
+    """
+    Recommendations for a student state, served from the process-wide cache
+    when an equivalent state was evaluated before.
+
+    The engine runs on the canonical state, so every state with the same key
+    gets the same recommendations, and concurrent misses for one key share
+    a single engine run. Callers get their own copies.
+    """
+    state = canonical_state(user_inputs)
+    try:
+        key = _state_key(state)
+        hash(key)
+    except TypeError:
+        # Unhashable values (e.g. lists from the LLM) cannot be cached
+        from expert_system import run_expert_system
+        return run_expert_system(state)[0]
+
+    recommendations = _cache.get(key)
+    if recommendations is MISSING:
+        recommendations = _inflight.do(key, lambda: _evaluate(key, state))
+
+    return [dict(recommendation) for recommendation in recommendations]
+
+
+def _evaluate(key, state):
+    # A run for this key may have finished between the miss and now
+    recommendations = _cache.get(key)
+    if recommendations is MISSING:
+        # Imported on the first miss, so loading the cache does not load experta
+        from expert_system import run_expert_system
+        recommendations, _ = run_expert_system(state)
+        _cache.put(key, recommendations)
+    return recommendations
+
+
+def cache_stats():
+    """Counters of the process-wide recommendation cache and coalesced misses"""
+    stats = _cache.stats()
+    stats['coalesced'] = _inflight.stats()['coalesced']
+    return stats
@@ -0,0 +1,128 @@
+"""
+Per-rule instrumentation of the experta engine
+Records, for each rule ID (R1_CRITICAL_SLEEP_DEFICIT ... R24_ACTIVE_LEARNING,
+as given with @rule_id), how often it fired, how long its right-hand side
+took and how many partial matches its join nodes held, plus per-request time
+spent in reset, declare, run and get_recommendations. Off by default: run_expert_system checks ENABLED once
+per request and takes the uninstrumented path when it is false.
+
+Enable with ADVISOR_RULE_METRICS=1 or rule_metrics.enable(); read the
+numbers with metrics.snapshot() (JSON) or metrics.prometheus() (text
+exposition format).
+"""
+import os
+import threading
+
+ENABLED = os.environ.get("ADVISOR_RULE_METRICS", "0") == "1"
+
+# Stages of one experta request, in order
+PHASES = ('reset', 'declare', 'run', 'get_recommendations')
+
+
+def enable():
+    global ENABLED
+    ENABLED = True
+
+
+def disable():
+    global ENABLED
+    ENABLED = False
+
+
+class RuleMetrics:
+    """Thread-safe totals over every instrumented request"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self.requests = 0
+            self.phase_seconds = dict.fromkeys(PHASES, 0.0)
+            self.rules = {}
+
+    def _rule(self, rule_id):
+        stats = self.rules.get(rule_id)
+        if stats is None:
+            stats = self.rules[rule_id] = {
+                'activations': 0,
+                'rhs_seconds': 0.0,
+                'rhs_max_seconds': 0.0,
+                'partial_matches': 0,
+            }
+        return stats
+
+    def record(self, phase_seconds, firings, partial_matches):
+        """
+        Add one request: seconds per phase, (rule ID, RHS seconds) per
+        firing, and partial matches per rule ID once the engine had run
+        """
+        with self._lock:
+            self.requests += 1
+            for phase, seconds in phase_seconds.items():
+                self.phase_seconds[phase] += seconds
+            for rule_id, seconds in firings:
+                stats = self._rule(rule_id)
+                stats['activations'] += 1
+                stats['rhs_seconds'] += seconds
+                stats['rhs_max_seconds'] = max(stats['rhs_max_seconds'], seconds)
+            for rule_id, count in partial_matches.items():
+                self._rule(rule_id)['partial_matches'] += count
+
+    def snapshot(self):
+        """JSON-serializable copy of the totals, with per-request averages"""
+        with self._lock:
+            requests = self.requests
+            rules = {rule_id: dict(stats) for rule_id, stats in self.rules.items()}
+            phases = dict(self.phase_seconds)
+
+        per_request = max(requests, 1)
+        for stats in rules.values():
+            stats['rhs_mean_seconds'] = stats['rhs_seconds'] / max(stats['activations'], 1)
+            stats['firing_rate'] = stats['activations'] / per_request
+            stats['partial_matches_per_request'] = stats['partial_matches'] / per_request
+        return {
+            'enabled': ENABLED,
+            'requests': requests,
+            'phases': {phase: {'seconds': seconds, 'mean_seconds': seconds / per_request}
+                       for phase, seconds in phases.items()},
+            'rules': dict(sorted(rules.items(), key=lambda item: _rule_sort_key(item[0]))),
+        }
+
+    def prometheus(self):
+        """The totals in the Prometheus text exposition format"""
+        snapshot = self.snapshot()
+        lines = [
+            "# HELP advisor_requests_total Instrumented experta requests.",
+            "# TYPE advisor_requests_total counter",
+            f"advisor_requests_total {snapshot['requests']}",
+            "# HELP advisor_phase_seconds_total Time spent in each request phase.",
+            "# TYPE advisor_phase_seconds_total counter",
+        ]
+        lines += [f'advisor_phase_seconds_total{{phase="{phase}"}} {phase_stats["seconds"]:.9f}'
+                  for phase, phase_stats in snapshot['phases'].items()]
+
+        series = (
+            ('advisor_rule_activations_total', 'counter', 'activations', 'Times each rule fired.'),
+            ('advisor_rule_rhs_seconds_total', 'counter', 'rhs_seconds',
+             'Time spent in each rule\'s right-hand side.'),
+            ('advisor_rule_rhs_max_seconds', 'gauge', 'rhs_max_seconds',
+             'Slowest right-hand side execution of each rule.'),
+            ('advisor_rule_partial_matches_total', 'counter', 'partial_matches',
+             'Tokens held by each rule\'s join nodes after run, summed over requests.'),
+        )
+        for name, kind, key, help_text in series:
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+            lines += [f'{name}{{rule="{rule_id}"}} {stats[key]:.9g}'
+                      for rule_id, stats in snapshot['rules'].items()]
+        return "\n".join(lines) + "\n"
+
+
+def _rule_sort_key(rule_id):
+    number = rule_id.split('_', 1)[0][1:]
+    return (0, int(number), rule_id) if number.isdigit() else (1, 0, rule_id)
+
+
+# Process-wide registry filled by run_expert_system while ENABLED
+metrics = RuleMetrics()
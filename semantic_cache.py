@@ -0,0 +1,330 @@
+"""
+Near-duplicate cache for LLM extractions
+Messages are embedded as hashed character n-gram vectors in a fixed-size
+NumPy matrix. A lookup probes the few index cells closest to the message and
+returns the stored extraction of the most similar message above a threshold,
+so paraphrases such as "barely slept, exam tomorrow" and "exam tmrw and I
+barely slept" share one Groq request
+
+Usage:
+    python semantic_cache.py [--entries N] [--queries N]
+"""
+import argparse
+import collections
+import copy
+import os
+import re
+import threading
+import time
+import zlib
+
+import numpy as np
+
+from heuristic_extractor import extract_locally
+
+ENABLED = os.environ.get("SEMANTIC_CACHE", "1") != "0"
+DEFAULT_THRESHOLD = float(os.environ.get("SEMANTIC_CACHE_THRESHOLD", 0.85))
+DEFAULT_MAX_ENTRIES = int(os.environ.get("SEMANTIC_CACHE_MAX_ENTRIES", 10000))
+DEFAULT_DIMENSIONS = 256
+DEFAULT_CELLS = int(os.environ.get("SEMANTIC_CACHE_CELLS", 256))
+DEFAULT_PROBES = int(os.environ.get("SEMANTIC_CACHE_PROBES", 8))
+
+# Character n-gram lengths taken from each word (padded with spaces)
+NGRAM_SIZES = (3, 4)
+
+# Lookup latencies kept for the percentiles in stats()
+LATENCY_SAMPLES = 10000
+
+ABBREVIATIONS = {
+    "tmrw": "tomorrow", "tmr": "tomorrow", "tmrrw": "tomorrow", "2moro": "tomorrow",
+    "tonite": "tonight", "tn": "tonight", "rn": "right now",
+    "hrs": "hours", "hr": "hour", "mins": "minutes", "min": "minutes",
+    "b4": "before", "bc": "because", "cuz": "because", "w/o": "without",
+}
+
+# Words that carry no information about the student's state
+STOPWORDS = frozenset(
+    "a an and the i i'm im my me to of is am was it its it's so just really "
+    "very that this but also".split())
+
+_WORD = re.compile(r"[a-z0-9'/]+")
+_NUMBER = re.compile(r"\d+(?:\.\d+)?")
+
+
+def normalize_words(message):
+    """Lowercased words with abbreviations expanded and stopwords removed"""
+    words = []
+    for word in _WORD.findall(message.casefold().replace("’", "'")):
+        for part in ABBREVIATIONS.get(word, word).split():
+            if part not in STOPWORDS:
+                words.append(part)
+    return words
+
+
+def embed(message, dimensions=DEFAULT_DIMENSIONS):
+    """
+    Unit-length hashed character n-gram vector of a message.
+
+    N-grams are taken inside words only, so word order does not matter.
+    Counts are dampened (1 + log count) and hashed with a sign bit so
+    collisions cancel out on average instead of accumulating.
+    """
+    counts = collections.Counter()
+    for word in normalize_words(message):
+        padded = f" {word} "
+        for size in NGRAM_SIZES:
+            for start in range(len(padded) - size + 1):
+                counts[padded[start:start + size]] += 1
+
+    vector = np.zeros(dimensions, dtype=np.float32)
+    for gram, count in counts.items():
+        digest = zlib.crc32(gram.encode())
+        sign = 1.0 if digest & 0x80000000 else -1.0
+        vector[digest % dimensions] += sign * (1.0 + np.log(count))
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def message_signature(message):
+    """
+    Numbers and recognized cues of a message.
+
+    Character n-grams cannot tell "stressed" from "relaxed" or 4 hours from
+    8, so two messages only share an extraction when the local extractor
+    reads the same cues from both and they mention the same numbers.
+    """
+    text = " ".join(normalize_words(message))
+    local = extract_locally(text)
+    cues = tuple((field, local['data'][field]) for field in local['mentioned'])
+    return cues, tuple(sorted(_NUMBER.findall(text)))
+
+
+class SemanticCache:
+    """
+    Bounded near-duplicate index over message vectors, safe to share between threads.
+
+    Vectors live in a preallocated (max_entries x dimensions) float32 matrix
+    used as a ring buffer, so memory does not grow past max_entries and the
+    oldest entries are overwritten first. The first `cells` messages seed
+    the cell centroids; every message is then filed under its closest cell
+    and a lookup compares it only with the rows of the `probes` closest cells.
+    """
+
+    def __init__(self, threshold=DEFAULT_THRESHOLD, max_entries=DEFAULT_MAX_ENTRIES,
+                 dimensions=DEFAULT_DIMENSIONS, cells=DEFAULT_CELLS, probes=DEFAULT_PROBES):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.dimensions = dimensions
+        self.probes = probes
+        self._vectors = np.zeros((max_entries, dimensions), dtype=np.float32)
+        self._centroids = np.zeros((cells, dimensions), dtype=np.float32)
+        self._cell_count = 0
+        self._members = [set() for _ in range(cells)]
+        self._row_cell = np.full(max_entries, -1, dtype=np.int32)
+        self._entries = [None] * max_entries
+        self._next_row = 0
+        self._size = 0
+        self._lock = threading.Lock()
+        self._latencies = collections.deque(maxlen=LATENCY_SAMPLES)
+        self.hits = 0
+        self.misses = 0
+        self.rejected = 0
+        self.evictions = 0
+
+    def _nearest_cells(self, vector, count):
+        scores = self._centroids[:self._cell_count] @ vector
+        if count >= self._cell_count:
+            return range(self._cell_count)
+        return np.argpartition(-scores, count - 1)[:count]
+
+    def get(self, message):
+        """Deep copy of the stored result of the closest similar message, or None"""
+        start = time.perf_counter()
+        vector = embed(message, self.dimensions)
+        signature = None
+        found = None
+
+        with self._lock:
+            rows = [row for cell in self._nearest_cells(vector, self.probes)
+                    for row in self._members[cell]]
+            if rows:
+                rows = np.fromiter(rows, dtype=np.int64, count=len(rows))
+                scores = self._vectors[rows] @ vector
+                close = np.flatnonzero(scores >= self.threshold)
+                for index in close[np.argsort(-scores[close])]:
+                    stored_message, stored_signature, result = self._entries[rows[index]]
+                    if signature is None:
+                        signature = message_signature(message)
+                    if stored_signature == signature:
+                        found = (stored_message, float(scores[index]), result)
+                        break
+                    self.rejected += 1
+
+            if found is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            self._latencies.append(time.perf_counter() - start)
+
+        if found is None:
+            return None
+        stored_message, similarity, result = found
+        result = copy.deepcopy(result)
+        result['similar_to'] = stored_message
+        result['similarity'] = round(similarity, 3)
+        return result
+
+    def put(self, message, result):
+        """Index a message and its extraction, overwriting the oldest entry when full"""
+        vector = embed(message, self.dimensions)
+        signature = message_signature(message)
+        result = copy.deepcopy(result)
+
+        with self._lock:
+            row = self._next_row
+            self._next_row = (row + 1) % self.max_entries
+            old_cell = self._row_cell[row]
+            if old_cell >= 0:
+                self._members[old_cell].discard(row)
+                self.evictions += 1
+            else:
+                self._size += 1
+
+            if self._cell_count < len(self._centroids):
+                cell = self._cell_count
+                self._centroids[cell] = vector
+                self._cell_count += 1
+            else:
+                cell = int(np.argmax(self._centroids @ vector))
+
+            self._vectors[row] = vector
+            self._row_cell[row] = cell
+            self._members[cell].add(row)
+            self._entries[row] = (message, signature, result)
+
+    def clear(self):
+        with self._lock:
+            self._cell_count = 0
+            self._members = [set() for _ in range(len(self._centroids))]
+            self._row_cell.fill(-1)
+            self._entries = [None] * self.max_entries
+            self._next_row = 0
+            self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def stats(self):
+        """Hit rate, lookup latency percentiles (ms), size and matrix memory"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            latencies = np.array(self._latencies) * 1000
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'rejected': self.rejected,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'size': self._size,
+                'max_entries': self.max_entries,
+                'cells': self._cell_count,
+                'matrix_bytes': self._vectors.nbytes + self._centroids.nbytes,
+                'lookup_ms_mean': float(latencies.mean()) if len(latencies) else 0.0,
+                'lookup_ms_p50': float(np.percentile(latencies, 50)) if len(latencies) else 0.0,
+                'lookup_ms_p99': float(np.percentile(latencies, 99)) if len(latencies) else 0.0,
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_semantic_cache():
+    """Return the process-wide SemanticCache, or None if it is disabled"""
+    global _cache
+    if not ENABLED:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = SemanticCache()
+    return _cache
+
+
+# ==================== BENCHMARK ====================
+
+_OPENINGS = ["had a rough night", "barely slept", "feeling off", "woke up late",
+             "skipped breakfast", "so behind on readings", "my roommate kept me up",
+             "group project is a mess", "lab report is dragging", "can't focus at all"]
+_TOPICS = ["midterm", "essay", "lab", "presentation", "problem set", "thesis chapter",
+           "group project", "coding assignment", "final", "quiz"]
+_SUBJECTS = ["calculus", "chemistry", "history", "physics", "economics", "biology",
+             "literature", "statistics", "philosophy", "programming", "psychology",
+             "accounting", "linguistics", "sociology", "geology", "music theory"]
+_CLOSINGS = ["coming up", "due soon", "on my mind", "next week", "looming",
+             "keeps me worried", "after the weekend", "before the break"]
+
+
+def _synthetic_message(rng):
+    return (f"{rng.choice(_OPENINGS)} and my {rng.choice(_SUBJECTS)} "
+            f"{rng.choice(_TOPICS)} is {rng.choice(_CLOSINGS)} "
+            f"(section {rng.integers(1, 60)})")
+
+
+def _paraphrase(message):
+    """Reorder the clauses and drop punctuation, as a student retyping it would"""
+    opening, rest = message.split(" and my ", 1)
+    return f"My {rest.replace('(', '').replace(')', '')}, {opening}!"
+
+
+def benchmark(entries=100_000, queries=2000):
+    """
+    Fill a cache with `entries` synthetic messages, then look up paraphrases
+    of stored messages and unseen messages. Reports insert rate, hit rate,
+    lookup latency and how often the probed cells found the same neighbour
+    as an exhaustive scan.
+    """
+    rng = np.random.default_rng(0)
+    cache = SemanticCache(max_entries=entries)
+    messages = list(dict.fromkeys(_synthetic_message(rng) for _ in range(entries)))
+
+    start = time.perf_counter()
+    for message in messages:
+        cache.put(message, {'success': True, 'data': {'message': message}})
+    elapsed = time.perf_counter() - start
+    print(f"inserted {len(messages)} messages in {elapsed:.1f}s "
+          f"({len(messages) / elapsed:,.0f}/s), "
+          f"{cache.stats()['matrix_bytes'] / 2 ** 20:.0f} MiB of vectors")
+
+    picks = rng.choice(len(messages), size=queries, replace=False)
+    paraphrases = [_paraphrase(messages[i]) for i in picks]
+    hits = [cache.get(message) for message in paraphrases]
+    stats = cache.stats()
+    correct = sum(hit is not None and hit['similar_to'] == messages[i]
+                  for hit, i in zip(hits, picks))
+    print(f"paraphrases: hit rate {stats['hit_rate']:.1%}, {correct}/{queries} matched "
+          f"their original, lookup p50 {stats['lookup_ms_p50']:.2f} ms, "
+          f"p99 {stats['lookup_ms_p99']:.2f} ms")
+
+    vectors = cache._vectors[:len(messages)]
+    agree = sum(int(np.argmax(vectors @ embed(message))) == i
+                for message, i in zip(paraphrases[:200], picks[:200]))
+    print(f"exhaustive scan finds the same original for {agree}/200 paraphrases")
+
+    unseen = ["pulled an all-nighter for my organic chemistry final",
+              "haven't eaten since noon and still have to revise"] * (queries // 2)
+    before = cache.stats()['hits']
+    for message in unseen:
+        cache.get(message)
+    print(f"unseen messages: {cache.stats()['hits'] - before}/{len(unseen)} false hits")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the near-duplicate extraction cache")
+    parser.add_argument("--entries", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=2000)
+    args = parser.parse_args(argv)
+    benchmark(args.entries, args.queries)
+
+
+if __name__ == "__main__":
+    main()
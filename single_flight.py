@@ -0,0 +1,121 @@
+"""
+Request coalescing for identical concurrent calls
+While a computation for a key is in flight, other callers with the same key
+wait for its result instead of starting their own
+"""
+import copy
+import threading
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Thread-safe single-flight group.
+
+    do(key, function) runs function once per key at a time; callers that
+    arrive while it runs get a deep copy of the same result (or the same
+    exception) without calling function themselves.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.executions = 0
+        self.coalesced = 0
+
+    def do(self, key, function):
+        with self._lock:
+            self.calls += 1
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = _Call()
+                self.executions += 1
+                leader = True
+            else:
+                self.coalesced += 1
+                leader = False
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return copy.deepcopy(call.result)
+
+        try:
+            call.result = function()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'calls': self.calls,
+                'executions': self.executions,
+                'coalesced': self.coalesced,
+                'in_flight': len(self._calls),
+            }
+
+
+# ==================== BENCHMARK ====================
+
+def benchmark_lecture_burst(sessions=40, latency=0.2):
+    """
+    A class told to try the tool: `sessions` threads submit the same example
+    text and the same default slider state at once. Reports how many
+    requests reached the stub Groq server and the engine.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    import llm_parser
+    import recommendation_cache
+    from groq_stub import StubGroqServer
+
+    message = "had a rough night and my midterm is coming up"
+    defaults = {
+        'sleep_hours': 7.0, 'energy_level': "Moderate", 'stress_level': "Moderate",
+        'study_hours_today': 2.0, 'deadline_urgency': "None", 'break_taken': False,
+        'task_complexity': "Medium", 'passive_learning_hours': 1.0,
+        'social_isolation_days': 1, 'sedentary_hours': 4.0, 'cramming': False,
+        'current_time': 14,
+    }
+
+    with StubGroqServer(latency=latency) as stub, llm_parser._llm_cache_disabled():
+        shared = llm_parser._client
+        llm_parser._client = llm_parser.create_groq_client(api_key="stub", base_url=stub.base_url)
+        try:
+            before = llm_parser._inflight.stats()['coalesced']
+            with ThreadPoolExecutor(sessions) as pool:
+                results = list(pool.map(llm_parser.parse_natural_language, [message] * sessions))
+            assert all(result['success'] for result in results)
+            coalesced = llm_parser._inflight.stats()['coalesced'] - before
+            print(f"parse_natural_language: {sessions} sessions, {stub.requests} Groq "
+                  f"request(s), {coalesced} coalesced")
+        finally:
+            llm_parser._client = shared
+
+    recommendation_cache.get_recommendation_cache().clear()
+    before = recommendation_cache._inflight.stats()
+    with ThreadPoolExecutor(sessions) as pool:
+        list(pool.map(recommendation_cache.cached_recommendations, [defaults] * sessions))
+    after = recommendation_cache._inflight.stats()
+    print(f"cached_recommendations: {sessions} sessions, "
+          f"{after['executions'] - before['executions']} engine run(s) after the cache "
+          f"was cleared, {after['coalesced'] - before['coalesced']} coalesced, "
+          f"the rest served from the cache")
+
+
+if __name__ == "__main__":
+    benchmark_lecture_burst()
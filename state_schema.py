@@ -0,0 +1,38 @@
+"""
+Fields and labels of student states and recommendations
+Kept apart from expert_system so code that only needs them does not load experta
+"""
+
+# Fields of a StudentState, in the order the UI collects them
+STUDENT_STATE_FIELDS = (
+    'sleep_hours',
+    'energy_level',
+    'stress_level',
+    'study_hours_today',
+    'deadline_urgency',
+    'break_taken',
+    'task_complexity',
+    'passive_learning_hours',
+    'social_isolation_days',
+    'sedentary_hours',
+    'cramming',
+    'current_time',
+)
+
+# Options offered by the UI for the categorical fields
+ENERGY_LEVELS = ("Very Low", "Low", "Moderate", "High")
+STRESS_LEVELS = ("Low", "Moderate", "High", "Very High")
+DEADLINE_OPTIONS = ("None", "This week", "Within 48 hours", "Urgent (within 24h)")
+TASK_COMPLEXITIES = ("Low", "Medium", "High")
+
+# Keys of a recommendation dict, in display order
+RECOMMENDATION_FIELDS = (
+    'activity',
+    'description',
+    'confidence',
+    'reason',
+    'priority',
+    'duration',
+    'category',
+    'rule_fired',
+)
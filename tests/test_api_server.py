@@ -0,0 +1,166 @@
+import http.client
+import json
+import os
+import random
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import api_server
+from api_server import AdvisorHTTPServer, AdvisorRequestHandler
+from groq_stub import DEFAULT_EXTRACTION
+from state_schema import DEADLINE_OPTIONS, ENERGY_LEVELS, STRESS_LEVELS, TASK_COMPLEXITIES
+
+API_SERVER = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                          "api_server.py")
+
+
+@pytest.fixture(scope="module")
+def server():
+    server = AdvisorHTTPServer(("127.0.0.1", 0), AdvisorRequestHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server.server_address[:2]
+    server.shutdown()
+    server.server_close()
+
+
+def post(address, path, body):
+    connection = http.client.HTTPConnection(*address, timeout=10)
+    connection.request("POST", path, json.dumps(body), {"Content-Type": "application/json"})
+    response = connection.getresponse()
+    return response.status, json.loads(response.read())
+
+
+def raw_request(address, content_length):
+    with socket.create_connection(address, timeout=10) as connection:
+        connection.sendall(
+            f"POST /recommend HTTP/1.1\r\nHost: test\r\n"
+            f"Content-Length: {content_length}\r\n\r\n{{}}".encode())
+        reply = connection.makefile("rb")
+        return int(reply.readline().split()[1])
+
+
+def test_recommend(server):
+    status, body = post(server, "/recommend", {"sleep_hours": 4, "energy_level": "Low"})
+    assert status == 200
+    assert body["count"] == len(body["recommendations"]) > 0
+
+
+@pytest.mark.parametrize("body", [
+    {"sleep_hours": "four"},
+    {"energy_level": "Sleepy"},
+    {"bedtime": 23},
+])
+def test_invalid_state_is_a_400(server, body):
+    assert post(server, "/recommend", body)[0] == 400
+
+
+@pytest.mark.parametrize("content_length", ["abc", "-1"])
+def test_invalid_content_length_is_a_400(server, content_length):
+    assert raw_request(server, content_length) == 400
+
+
+@pytest.mark.parametrize("extraction", [
+    dict(DEFAULT_EXTRACTION, mood="fine"),
+    dict(DEFAULT_EXTRACTION, sleep_hours=None),
+])
+def test_invalid_extraction_is_a_502(server, monkeypatch, extraction):
+    monkeypatch.setattr(api_server, "_parse",
+                        lambda message: {'success': True, 'data': extraction})
+    assert post(server, "/advise", {"message": "I slept 7 hours"})[0] == 502
+
+
+def sample_states(count, seed=0):
+    """Student states spread over the UI's widget ranges"""
+    rng = random.Random(seed)
+    return [{
+        'sleep_hours': rng.choice(range(0, 25)) / 2,
+        'energy_level': rng.choice(ENERGY_LEVELS),
+        'stress_level': rng.choice(STRESS_LEVELS),
+        'study_hours_today': rng.choice(range(0, 25)) / 2,
+        'deadline_urgency': rng.choice(DEADLINE_OPTIONS),
+        'break_taken': rng.random() < 0.5,
+        'task_complexity': rng.choice(TASK_COMPLEXITIES),
+        'passive_learning_hours': rng.choice(range(0, 17)) / 2,
+        'social_isolation_days': rng.randint(0, 7),
+        'sedentary_hours': rng.choice(range(0, 25)) / 2,
+        'cramming': rng.random() < 0.3,
+        'current_time': rng.randint(0, 23),
+    } for _ in range(count)]
+
+
+@pytest.fixture
+def forked_server():
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    process = subprocess.Popen(
+        [sys.executable, API_SERVER, "serve", "--host", "127.0.0.1",
+         "--port", str(port), "--workers", "2"],
+        stdout=subprocess.DEVNULL)
+    try:
+        deadline = time.monotonic() + 60
+        while True:
+            try:
+                connection = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+                connection.request("GET", "/health")
+                if connection.getresponse().status == 200:
+                    break
+            except OSError:
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(0.1)
+        yield "127.0.0.1", port
+    finally:
+        process.send_signal(signal.SIGINT)
+        process.wait(timeout=30)
+
+
+def test_load(forked_server):
+    # Random states, so most requests miss the per-process cache and run the engine
+    requests, concurrency = 1000, 16
+    bodies = [json.dumps(state) for state in sample_states(requests)]
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    local = threading.local()
+
+    def send(body):
+        if not hasattr(local, "connection"):
+            local.connection = http.client.HTTPConnection(*forked_server, timeout=60)
+        start = time.perf_counter()
+        try:
+            local.connection.request("POST", "/recommend", body,
+                                     {"Content-Type": "application/json"})
+            response = local.connection.getresponse()
+            reply = json.loads(response.read())
+            ok = response.status == 200 and reply["count"] == len(reply["recommendations"])
+        except (OSError, http.client.HTTPException, ValueError) as e:
+            local.connection.close()
+            del local.connection
+            ok, reply = False, repr(e)
+        elapsed = time.perf_counter() - start
+        with lock:
+            if ok:
+                latencies.append(elapsed)
+            else:
+                errors.append(reply)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        list(pool.map(send, bodies))
+    elapsed = time.perf_counter() - start
+
+    assert errors == []
+    latencies.sort()
+    print(f"\n2 workers /recommend: {requests / elapsed:.0f} req/s, "
+          f"p50 {latencies[len(latencies) // 2] * 1000:.1f} ms, "
+          f"p99 {latencies[int(0.99 * len(latencies))] * 1000:.1f} ms "
+          f"({requests} requests, {concurrency} concurrent)")
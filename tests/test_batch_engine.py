@@ -0,0 +1,33 @@
+import random
+
+import pandas as pd
+import pytest
+
+from batch_engine import run_expert_system_batch
+from compiled_engine import random_student_state
+from expert_system import STUDENT_STATE_FIELDS, run_expert_system
+
+
+def _formats(states, fields):
+    columns = {field: [state[field] for state in states] for field in fields}
+    return {
+        'list of dicts': states,
+        'dict of lists': columns,
+        'DataFrame': pd.DataFrame({field: pd.Series(values, dtype=object)
+                                   for field, values in columns.items()}),
+    }
+
+
+@pytest.mark.parametrize("dropped", ["energy_level", "sleep_hours", "current_time"])
+def test_missing_column_matches_experta(dropped):
+    rng = random.Random(1)
+    fields = [field for field in STUDENT_STATE_FIELDS if field != dropped]
+    states = []
+    while len(states) < 300:
+        state = random_student_state(rng)
+        if all(field in state for field in fields):
+            states.append({field: state[field] for field in fields})
+    expected = [run_expert_system(state, mode="experta")[0] for state in states]
+
+    for name, batch in _formats(states, fields).items():
+        assert run_expert_system_batch(batch) == expected, name
@@ -0,0 +1,43 @@
+import fix_experta
+
+from experta import MATCH, TEST, KnowledgeEngine, Rule
+
+from compiled_engine import compile_rules
+from decision_table import rules_fingerprint
+from expert_system import StudentState
+
+
+class Engine(KnowledgeEngine):
+    @Rule(StudentState(sleep_hours=MATCH.sleep), TEST(lambda sleep: sleep < 5))
+    def short_sleep(self, sleep):
+        self.recommend("R1", sleep=sleep)
+
+
+class Documented(KnowledgeEngine):
+    # Same condition, with a docstring, another body and different line numbers
+    @Rule(StudentState(sleep_hours=MATCH.sleep), TEST(lambda sleep: sleep < 5))
+    def short_sleep(self, sleep):
+        """Rule 1: sleep deficit"""
+        self.recommend("R1", sleep=sleep, note="changed")
+
+
+class Threshold(KnowledgeEngine):
+    @Rule(StudentState(sleep_hours=MATCH.sleep), TEST(lambda sleep: sleep < 6))
+    def short_sleep(self, sleep):
+        self.recommend("R1", sleep=sleep)
+
+
+def fingerprint(engine_class):
+    return rules_fingerprint(compile_rules(engine_class))
+
+
+def test_fingerprint_ignores_docstrings_and_right_hand_sides():
+    assert fingerprint(Documented) == fingerprint(Engine)
+
+
+def test_fingerprint_changes_with_a_threshold():
+    assert fingerprint(Threshold) != fingerprint(Engine)
+
+
+def test_fingerprint_is_stable():
+    assert rules_fingerprint() == rules_fingerprint()
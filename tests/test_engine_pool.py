@@ -0,0 +1,104 @@
+import queue
+import random
+import threading
+import time
+
+import pytest
+
+from compiled_engine import random_student_state
+from expert_system import ActivityAdvisorES, EnginePool, StudentState
+
+
+def test_discard_wakes_a_blocked_acquire():
+    pool = EnginePool(size=1)
+    acquired = []
+
+    def failing_request():
+        with pool.engine() as engine:
+            waiter.start()
+            # Wait until the second thread is blocked on the full pool
+            while not pool._available._waiters:
+                time.sleep(0.001)
+            engine.declare(StudentState(sleep_hours=None, energy_level="Low"))
+            engine.run()
+
+    def waiting_request():
+        with pool.engine(timeout=10) as engine:
+            acquired.append(engine)
+
+    waiter = threading.Thread(target=waiting_request)
+    with pytest.raises(TypeError):
+        failing_request()
+    waiter.join(timeout=10)
+
+    assert not waiter.is_alive()
+    assert len(acquired) == 1
+    assert pool.created == 1
+
+
+def test_acquire_times_out_when_every_engine_is_checked_out():
+    pool = EnginePool(size=1)
+    engine = pool.acquire()
+    with pytest.raises(queue.Empty):
+        pool.acquire(timeout=0.01)
+    pool.release(engine)
+    assert pool.acquire(timeout=0.01) is engine
+
+
+def test_failed_construction_frees_its_slot():
+    calls = []
+
+    def factory():
+        calls.append(None)
+        if len(calls) == 1:
+            raise RuntimeError("broken")
+        return EnginePool().factory()
+
+    pool = EnginePool(size=1, factory=factory)
+    with pytest.raises(RuntimeError):
+        pool.acquire()
+    assert pool.created == 0
+    pool.release(pool.acquire(timeout=1))
+    assert pool.created == 1
+
+
+def test_concurrent_requests_get_clean_engines():
+    # 16 threads share 8 engines; every request must see a freshly reset
+    # engine and get what a newly built engine returns for the same state
+    rng = random.Random(0)
+    states = [random_student_state(rng) for _ in range(200)]
+    expected = []
+    for state in states:
+        engine = ActivityAdvisorES()
+        engine.reset()
+        engine.declare(StudentState(**state))
+        engine.run()
+        expected.append(engine.get_recommendations())
+
+    pool = EnginePool(size=8)
+    failures = []
+
+    def worker(offset):
+        for i in range(200):
+            index = (offset + i) % len(states)
+            with pool.engine() as engine:
+                leftovers = [fact for fact in engine.facts.values()
+                             if isinstance(fact, StudentState)]
+                if leftovers or engine.recommendations:
+                    failures.append((index, "dirty engine"))
+                    continue
+                engine.declare(StudentState(**states[index]))
+                time.sleep(0)  # let other threads interleave mid-request
+                engine.run()
+                result = engine.get_recommendations()
+            if result != expected[index]:
+                failures.append((index, "wrong recommendations"))
+
+    workers = [threading.Thread(target=worker, args=(n * 7,)) for n in range(16)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+
+    assert failures == []
+    assert pool.created <= 8
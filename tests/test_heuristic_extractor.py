@@ -0,0 +1,40 @@
+import pytest
+
+from heuristic_extractor import extract_locally
+
+
+@pytest.mark.parametrize("message, field", [
+    ("I need 8 hours of sleep but only got 5", "sleep_hours"),
+    ("I usually sleep 8 hours but last night only 3", "sleep_hours"),
+    ("I slept at 2 am", "sleep_hours"),
+    ("so tired of this class", "energy_level"),
+])
+def test_misleading_cues_go_to_the_llm(message, field):
+    assert field in extract_locally(message)['ambiguous']
+
+
+def test_bedtime_is_not_the_current_time():
+    result = extract_locally("went to bed at 2 am, it is 10 am now")
+    assert result['data']['current_time'] == 10
+
+
+@pytest.mark.parametrize("message", [
+    "I got 2 hours of studying done",
+    "had 3 hours of lectures today",
+])
+def test_hours_without_a_sleep_cue_are_not_sleep(message):
+    assert 'sleep_hours' not in extract_locally(message)['mentioned']
+
+
+@pytest.mark.parametrize("message, expected", [
+    ("I slept 4 hours, feeling exhausted, have exam tomorrow",
+     {'sleep_hours': 4, 'energy_level': "Very Low",
+      'deadline_urgency': "Urgent (within 24h)"}),
+    ("I slept only 5 hours, feeling tired, have an exam in 2 days, and studied for 3 hours already",
+     {'sleep_hours': 5, 'energy_level': "Low", 'study_hours_today': 3,
+      'deadline_urgency': "Within 48 hours"}),
+])
+def test_clear_messages_resolve_locally(message, expected):
+    result = extract_locally(message)
+    assert result['ambiguous'] == []
+    assert {field: result['data'][field] for field in expected} == expected
@@ -0,0 +1,13 @@
+import os
+
+import pytest
+
+from import_budget import BUDGETS, problems
+
+SCALE = float(os.environ.get("IMPORT_BUDGET_SCALE", 1.0))
+
+
+@pytest.mark.parametrize("module", BUDGETS)
+def test_import_budget(module):
+    elapsed, failed = problems(module, scale=SCALE)
+    assert not failed, f"{module} ({elapsed:.1f} ms): {'; '.join(failed)}"
@@ -0,0 +1,78 @@
+import json
+import re
+
+import pytest
+
+import llm_cache
+import llm_parser
+import semantic_cache
+from groq_stub import DEFAULT_EXTRACTION, StubGroqServer
+
+MESSAGES = [f"message number {index}" for index in range(6)]
+
+
+@pytest.fixture(autouse=True)
+def llm_only(monkeypatch):
+    # Every message goes to the stub: no local extraction and no caches
+    monkeypatch.setattr(llm_parser, "LOCAL_EXTRACTION", False)
+    monkeypatch.setattr(llm_cache, "ENABLED", False)
+    monkeypatch.setattr(semantic_cache, "ENABLED", False)
+
+
+def batch_reply(payload):
+    prompt = payload["messages"][0]["content"]
+    indices = re.findall(r'\{"index": (\d+), "message"', prompt)
+    return json.dumps([dict(DEFAULT_EXTRACTION, index=int(index)) for index in indices])
+
+
+def test_request_error_fails_only_its_batch():
+    # Three 500s use up the first request and the SDK's two retries
+    with StubGroqServer(content=batch_reply, errors=[500, 500, 500]) as stub:
+        client = llm_parser.create_groq_client(api_key="stub", base_url=stub.base_url)
+        try:
+            results = llm_parser.parse_natural_language_batch(MESSAGES, batch_size=2,
+                                                              client=client)
+        finally:
+            client.close()
+
+    assert [result['success'] for result in results].count(False) == 2
+    assert [result['success'] for result in results].count(True) == 4
+    assert stub.requests == 3 + 2
+
+
+def test_single_message_fallback_is_validated():
+    # Every reply lacks a field, so the messages end up sent one at a time
+    incomplete = {field: value for field, value in DEFAULT_EXTRACTION.items()
+                  if field != "current_time"}
+
+    def reply(payload):
+        if "several students" in payload["messages"][0]["content"]:
+            return json.dumps([dict(incomplete, index=index) for index in range(2)])
+        return json.dumps(incomplete)
+
+    with StubGroqServer(content=reply) as stub:
+        client = llm_parser.create_groq_client(api_key="stub", base_url=stub.base_url)
+        try:
+            results = llm_parser.parse_natural_language_batch(MESSAGES[:2], client=client)
+        finally:
+            client.close()
+
+    assert [result['success'] for result in results] == [False, False]
+    assert all("current_time" in result['error'] for result in results)
+
+
+def test_dotenv_settings_apply_on_first_use(monkeypatch):
+    import dotenv
+
+    # load_dotenv runs on first use, after the settings were read at import
+    monkeypatch.setattr(llm_parser, "_env_loaded", False)
+    monkeypatch.setattr(dotenv, "load_dotenv",
+                        lambda: monkeypatch.setenv("GROQ_BATCH_SIZE", "7"))
+    monkeypatch.setattr(llm_parser, "GROQ_BATCH_SIZE",
+                        llm_parser._import_settings['GROQ_BATCH_SIZE'])
+
+    llm_parser._load_env()
+
+    assert llm_parser.GROQ_BATCH_SIZE == 7
+    # Reassigned by the llm_only fixture, so .env does not override it
+    assert llm_parser.LOCAL_EXTRACTION is False
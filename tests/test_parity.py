@@ -0,0 +1,64 @@
+"""
+The compiled evaluator, the batch API and the decision table must return
+exactly what the experta engine returns for the same student state
+"""
+import random
+
+import pandas as pd
+import pytest
+
+from batch_engine import run_expert_system_batch
+from compiled_engine import CompiledAdvisor, random_student_state
+from decision_table import DecisionTable, build_decision_table, random_grid_state
+from expert_system import STUDENT_STATE_FIELDS, run_expert_system
+
+
+def experta(state):
+    return run_expert_system(state, mode="experta")[0]
+
+
+def test_compiled_matches_experta():
+    rng = random.Random(0)
+    advisor = CompiledAdvisor()
+    for _ in range(3000):
+        state = random_student_state(rng)
+        assert advisor.get_recommendations(state) == experta(state), state
+
+
+@pytest.fixture(scope="module")
+def cohort():
+    rng = random.Random(0)
+    states = [random_student_state(rng) for _ in range(2000)]
+    return states, [experta(state) for state in states]
+
+
+def test_batch_of_dicts_matches_experta(cohort):
+    states, expected = cohort
+    assert run_expert_system_batch(states) == expected
+
+
+@pytest.mark.parametrize("as_dataframe", [False, True])
+def test_columnar_batch_matches_experta(cohort, as_dataframe):
+    states, expected = cohort
+    complete = [i for i, state in enumerate(states) if len(state) == len(STUDENT_STATE_FIELDS)]
+    columns = {field: [states[i][field] for i in complete] for field in STUDENT_STATE_FIELDS}
+    if as_dataframe:
+        columns = pd.DataFrame({field: pd.Series(values, dtype=object)
+                                for field, values in columns.items()})
+    assert run_expert_system_batch(columns) == [expected[i] for i in complete]
+
+
+def test_decision_table_matches_experta(tmp_path):
+    path = str(tmp_path / "decision_table")
+    build_decision_table(path)
+    table = DecisionTable(path)
+
+    rng = random.Random(0)
+    hits = 0
+    for i in range(3000):
+        state = random_grid_state(rng) if i % 2 else random_student_state(rng)
+        if table.lookup(state) is not None:
+            hits += 1
+        assert table.get_recommendations(state) == experta(state), state
+    # Every grid state (half the cases) must be served from the table
+    assert hits >= 1500
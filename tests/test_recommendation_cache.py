@@ -0,0 +1,38 @@
+import pytest
+
+from expert_system import run_expert_system
+from recommendation_cache import cache_stats, cached_recommendations, canonical_key
+
+
+def rules(recommendations):
+    return [recommendation['rule_fired'] for recommendation in recommendations]
+
+
+@pytest.mark.parametrize("sleep_hours", [4.9996, 5.0, 6.4999, 6.5])
+def test_values_next_to_a_threshold_are_not_rounded(sleep_hours):
+    state = {'sleep_hours': sleep_hours, 'energy_level': "Low",
+             'deadline_urgency': "None", 'current_time': 22}
+    assert cached_recommendations(state) == run_expert_system(state)[0]
+
+
+def test_critical_sleep_deficit_just_below_five_hours():
+    fired = rules(cached_recommendations({'sleep_hours': 4.9996, 'deadline_urgency': "None"}))
+    assert "R1_CRITICAL_SLEEP_DEFICIT" in fired
+
+
+def test_nan_states_hit_the_cache():
+    state = {'sleep_hours': float("nan"), 'energy_level': "Low"}
+    cached_recommendations(dict(state))
+    hits = cache_stats()['hits']
+    cached_recommendations({'sleep_hours': float("nan"), 'energy_level': "Low"})
+    assert cache_stats()['hits'] == hits + 1
+
+
+def test_labels_are_matched_ignoring_case_and_spacing():
+    assert (canonical_key({'energy_level': " very  low", 'sleep_hours': 4})
+            == canonical_key({'sleep_hours': 4, 'energy_level': "Very Low"}))
+
+
+@pytest.mark.parametrize("a, b", [(4, 4.0), (0.0, -0.0), (7.0, 7.0000001)])
+def test_numbers_that_render_differently_get_different_keys(a, b):
+    assert canonical_key({'sleep_hours': a}) != canonical_key({'sleep_hours': b})
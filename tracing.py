@@ -0,0 +1,254 @@
+"""
+Lightweight request tracing
+Spans with a shared request (trace) ID around each stage of a request:
+extraction, LLM call, JSON cleanup, engine reset/run, recommendation sort
+and rendering. Finished spans are appended to a local file as OTLP/JSON
+lines (one ExportTraceServiceRequest per line, as the OpenTelemetry
+collector's file exporter writes them), so latency histograms can be built
+offline without a collector.
+
+Tracing is off unless ADVISOR_TRACE_FILE is set (or configure() is called);
+spans are then no-ops that cost a function call.
+
+Usage:
+    ADVISOR_TRACE_FILE=traces.jsonl streamlit run app.py
+    python tracing.py traces.jsonl      # latency histogram per span name
+"""
+import contextvars
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+SERVICE_NAME = "student-activity-advisor"
+
+# OTLP span kinds and status codes
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+_current = contextvars.ContextVar("advisor_current_span", default=None)
+
+
+def _attribute_value(value):
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+
+class JSONLinesExporter:
+    """Appends each finished span to a file as one OTLP/JSON line"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._resource = {'attributes': [
+            {'key': 'service.name', 'value': {'stringValue': SERVICE_NAME}},
+            {'key': 'process.pid', 'value': {'intValue': str(os.getpid())}},
+        ]}
+
+    def export(self, span):
+        line = json.dumps({'resourceSpans': [{
+            'resource': self._resource,
+            'scopeSpans': [{'scope': {'name': "advisor"}, 'spans': [span.to_otlp()]}],
+        }]}, separators=(",", ":")) + "\n"
+        with self._lock:
+            # Reopened per span so pre-forked server workers can share the file
+            with open(self.path, "a") as f:
+                f.write(line)
+
+
+class Span:
+    """One timed stage; end() exports it and restores the parent as current"""
+
+    def __init__(self, name, trace_id, parent_id, kind, attributes):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.kind = kind
+        self.attributes = attributes
+        self.status = STATUS_OK
+        self.error = None
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self._token = _current.set(self)
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def fail(self, error):
+        self.status = STATUS_ERROR
+        self.error = repr(error)
+
+    def end(self):
+        if self.end_ns is not None:
+            return
+        self.end_ns = time.time_ns()
+        try:
+            _current.reset(self._token)
+        except ValueError:
+            # Ended in another context than it started in
+            _current.set(None)
+        exporter = _exporter
+        if exporter is not None:
+            exporter.export(self)
+
+    @property
+    def duration_ms(self):
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e6
+
+    def to_otlp(self):
+        span = {
+            'traceId': self.trace_id,
+            'spanId': self.span_id,
+            'name': self.name,
+            'kind': self.kind,
+            'startTimeUnixNano': str(self.start_ns),
+            'endTimeUnixNano': str(self.end_ns),
+            'attributes': [{'key': key, 'value': _attribute_value(value)}
+                           for key, value in self.attributes.items()],
+            'status': {'code': self.status},
+        }
+        if self.parent_id:
+            span['parentSpanId'] = self.parent_id
+        if self.error:
+            span['status']['message'] = self.error
+        return span
+
+
+class _NoSpan:
+    """Stands in for a span while tracing is off"""
+    trace_id = None
+    duration_ms = 0.0
+
+    def set(self, **attributes):
+        pass
+
+    def fail(self, error):
+        pass
+
+    def end(self):
+        pass
+
+
+NO_SPAN = _NoSpan()
+
+_exporter = None
+
+
+def configure(path):
+    """Export spans to `path` (None turns tracing off)"""
+    global _exporter
+    _exporter = JSONLinesExporter(path) if path else None
+
+
+def enabled():
+    return _exporter is not None
+
+
+def new_request_id():
+    """A 32-hex-digit request ID, usable as an OTLP trace ID"""
+    return os.urandom(16).hex()
+
+
+def current_request_id():
+    span = _current.get()
+    return span.trace_id if span is not None else None
+
+
+def start_span(name, request_id=None, kind=SPAN_KIND_INTERNAL, **attributes):
+    """
+    Start a span as a child of the current one, or as the root of a new
+    request if there is none (or `request_id` is given). Call end() on it.
+    """
+    if _exporter is None:
+        return NO_SPAN
+    parent = _current.get()
+    if request_id is not None or parent is None:
+        trace_id, parent_id = request_id or new_request_id(), None
+    else:
+        trace_id, parent_id = parent.trace_id, parent.span_id
+    return Span(name, trace_id, parent_id, kind, attributes)
+
+
+@contextmanager
+def span(name, request_id=None, kind=SPAN_KIND_INTERNAL, **attributes):
+    """Context manager around start_span() that marks the span failed on exceptions"""
+    if _exporter is None:
+        yield NO_SPAN
+        return
+    current = start_span(name, request_id, kind, **attributes)
+    try:
+        yield current
+    except BaseException as e:
+        current.fail(e)
+        raise
+    finally:
+        current.end()
+
+
+configure(os.environ.get("ADVISOR_TRACE_FILE"))
+
+
+# ==================== OFFLINE ANALYSIS ====================
+
+# Upper bounds of the histogram buckets, in ms
+HISTOGRAM_BUCKETS_MS = (0.1, 0.5, 1, 5, 10, 50, 100, 500, 1000, 5000, float("inf"))
+
+
+def read_spans(path):
+    """Yield the OTLP span dicts of a JSON-lines trace file"""
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            for resource in json.loads(line).get('resourceSpans', ()):
+                for scope in resource.get('scopeSpans', ()):
+                    yield from scope.get('spans', ())
+
+
+def latency_summary(spans):
+    """Span name -> sorted durations in ms"""
+    durations = {}
+    for span in spans:
+        elapsed = (int(span['endTimeUnixNano']) - int(span['startTimeUnixNano'])) / 1e6
+        durations.setdefault(span['name'], []).append(elapsed)
+    for values in durations.values():
+        values.sort()
+    return durations
+
+
+def print_histograms(path):
+    durations = latency_summary(read_spans(path))
+    for name, values in sorted(durations.items()):
+        count = len(values)
+        percentile = lambda q: values[min(count - 1, int(q * count))]
+        print(f"\n{name}: {count} span(s), p50 {percentile(0.5):.2f} ms, "
+              f"p95 {percentile(0.95):.2f} ms, p99 {percentile(0.99):.2f} ms")
+        lower = 0
+        for bound in HISTOGRAM_BUCKETS_MS:
+            in_bucket = sum(1 for value in values if lower <= value < bound)
+            if in_bucket:
+                label = f"< {bound:g} ms" if bound != float("inf") else f">= {lower:g} ms"
+                print(f"  {label:>12} {in_bucket:6} {'#' * max(1, 40 * in_bucket // count)}")
+            lower = bound
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Latency histograms from a trace file")
+    parser.add_argument("path", help="JSON-lines file written with ADVISOR_TRACE_FILE")
+    args = parser.parse_args(argv)
+    print_histograms(args.path)
+
+
+if __name__ == "__main__":
+    main()